@@ -0,0 +1,206 @@
+"""In-memory course shared by the API server.
+
+The server keeps one Course in memory instead of loading the database on every
+request. Submissions are put on a queue and applied by a single writer task, a
+batch at a time: the batch is written to the database in one transaction, then
+applied to the course in memory, and every submission of the batch is acked with
+its sequence number. The database generation counter tells when another process
+(the CLI) changed the data, and only then is the course reloaded.
+
+Every course has its own CourseCache, so courses are loaded, written and locked
+independently.
+"""
+
+import asyncio
+import time
+
+from ATA import instrumentation, pickle_ops
+from ATA.http_cache import PayloadCache
+from ATA.models import Course, Student, Team
+from ATA.notifications import ResultNotifier
+
+
+class CourseCache:
+    """Course held in memory, changed only by a single writer task.
+
+    Reads never wait on the lock: the course is only mutated on the event loop,
+    between awaits, and a reload swaps in a new Course object at once.
+    """
+
+    # Maximum number of submissions applied and written together
+    MAX_BATCH = 512
+
+    # Minimum seconds between two checks of the database generation
+    RELOAD_CHECK_INTERVAL = 1.0
+
+    def __init__(self, path: str = None):
+        """Initialize an empty CourseCache instance, the course is loaded on first use.
+
+        Args:
+            path: Database file path of the course, pickle_ops.DATA_FILEPATH when None.
+        """
+        self.path = path  # database of the course, None for the default course
+        self.course = None  # Course in memory, None until loaded
+        self.generation = None  # database generation the course in memory reflects
+        self.epoch = None  # database generation the course in memory was loaded at
+        self.lock = asyncio.Lock()  # guards loading the course and applying batches
+        self.sequence = 0  # sequence number of the last queued submission
+        self._queue = asyncio.Queue()  # (sequence, students, future) of submissions to apply
+        self._writer = None  # writer task, started by the first submission
+        self._checked_at = 0.0  # time.monotonic() of the last generation check
+        self.notifier = ResultNotifier(self.get)  # students waiting for their team
+        self.payloads = PayloadCache()  # serialized team results of the current result version
+
+    async def get(self) -> Course:
+        """Return the course, reloading it first if the database was changed by another process.
+
+        Returns:
+            Course object in memory.
+        """
+        if self.__check_due():
+            async with self.lock:
+                if self.__check_due():
+                    await self.__refresh()
+        return self.course
+
+    @property
+    def result_version(self) -> str:
+        """Version of the team results in memory, changes whenever any student's result may change.
+
+        Combines the database generation the course was loaded at with the course's
+        matching generation, bumped by every change to the teams in memory. A reload
+        always happens at a newer database generation, so a version is never reused
+        for different results. Call after get(), None while the course isn't loaded.
+        """
+        if self.course is None:
+            return None
+        return f"{self.epoch}.{self.course.matching_generation}"
+
+    async def submit(self, student: Student) -> int:
+        """Queue a student to add or update, and wait until it is saved.
+
+        Args:
+            student: Student object to save.
+
+        Returns:
+            Sequence number of the submission, increasing in the order submissions are applied.
+        """
+        return await self.submit_many([student])
+
+    async def submit_many(self, students: list[Student]) -> int:
+        """Queue students to add or update together, e.g. an imported roster, and wait until they are saved.
+
+        Args:
+            students: Student objects to save.
+
+        Returns:
+            Sequence number of the submission.
+        """
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self.__write_batches())
+        self.sequence += 1
+        sequence, future = self.sequence, asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((sequence, students, future))
+        await future
+        return sequence
+
+    async def commit_teams(self, teams: list[list[str]]) -> int:
+        """Replace the team assignment, e.g. with the result of a matching job.
+
+        The teams are applied to the course in memory without an await in between, and
+        saved in one transaction, so readers never see a partial assignment. Students
+        removed since the matching started are skipped, students added since then stay
+        unassigned.
+
+        Args:
+            teams: Teams in order, each a list of student emails.
+
+        Returns:
+            Number of teams saved.
+        """
+        async with self.lock:
+            if self.__check_due():
+                await self.__refresh()
+            course = self.course
+            course.clear_team_assignments()
+            for emails in teams:
+                students = []
+                for email in emails:
+                    try:
+                        students.append(course.get_student_by_email(email))
+                    except ValueError:
+                        pass  # removed since the matching started
+                if students:
+                    course.add_team(Team(str(len(course.teams) + 1), students))
+            try:
+                generation = await asyncio.to_thread(pickle_ops.save_teams, course, self.path)
+            except Exception:
+                self.course = None  # the database still has the old teams, reload them on next access
+                raise
+            if generation == self.generation + 1:
+                self.generation = generation
+            else:
+                self._checked_at = 0.0  # another process wrote too, reload on next access
+            self.notifier.publish(course)  # saved, tell the waiting students
+            return len(course.teams)
+
+    async def close(self):
+        """Wait for the queued submissions to be saved, stop the writer and drop the subscriptions, e.g. at shutdown."""
+        await self.notifier.close()
+        if self._writer is None:
+            return
+        await self._queue.join()
+        self._writer.cancel()
+        self._writer = None
+
+    def __check_due(self) -> bool:
+        """Whether the course must be loaded or the database generation checked again."""
+        return self.course is None or time.monotonic() - self._checked_at >= self.RELOAD_CHECK_INTERVAL
+
+    async def __refresh(self):
+        """Reload the course if it isn't loaded or the database generation changed. Lock must be held."""
+        self._checked_at = time.monotonic()
+        generation = await asyncio.to_thread(pickle_ops.load_generation, self.path)
+        if self.course is not None and generation == self.generation:
+            return
+        try:
+            course = await asyncio.to_thread(pickle_ops.load_data, self.path)
+        except FileNotFoundError:
+            course = Course([])
+        self.course, self.generation, self.epoch = course, generation, generation
+        self.notifier.publish(course)  # e.g. teams saved by the CLI
+
+    async def __write_batches(self):
+        """Writer task: take everything queued, up to MAX_BATCH, and apply it as one batch."""
+        instrumentation.detach_request()  # started by a request, but works for all of them
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.MAX_BATCH and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self.__apply(batch)
+            except Exception as error:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+            else:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def __apply(self, batch: list[tuple]):
+        """Write a batch of submissions to the database, then to the course in memory."""
+        # same email submitted twice in one batch: the later submission wins
+        students = list({student.email: student for _, submitted, _ in batch for student in submitted}.values())
+        async with self.lock:
+            if self.__check_due():
+                await self.__refresh()
+            generation = await asyncio.to_thread(pickle_ops.write_students, students, self.path)
+            self.course.add_students(students)
+            if generation == self.generation + 1:
+                self.generation = generation  # nobody else wrote since the course was loaded
+            else:
+                self._checked_at = 0.0  # another process wrote too, reload on next access
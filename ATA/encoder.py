@@ -0,0 +1,154 @@
+"""Batch encoder turning student attributes into have/want vectors.
+
+The block layout (offset, width and normalized weight of every attribute) is
+compiled from CONFIG once. Whole batches of students are then encoded straight
+into preallocated have/want matrices with vectorized fancy indexing.
+"""
+
+import math
+
+import numpy as np
+
+from ATA.config import CONFIG
+
+# Value of a single-choice column for None (no preference)
+NO_CHOICE = -1
+
+# Single-choice attributes, stored as integer columns (NO_CHOICE for None)
+CHOICE_COLUMNS = ("skill_level", "ambition", "role", "teamwork_style", "pace", "backgrounds_preference")
+
+# Single-choice attributes that may be None (no preference, or no backgrounds to prefer),
+# skill_level is always answered
+OPTIONAL_CHOICE_COLUMNS = ("ambition", "role", "teamwork_style", "pace", "backgrounds_preference")
+
+# Multiple-choice attributes, stored as bitmask columns (bit k set when choice k is selected)
+BITMASK_COLUMNS = ("backgrounds", "hobbies")
+
+# How the want block of each attribute is derived from its have block:
+# - "diversity": want the other choices (skill level: best case 1 pro 1 ok 1 noob; role)
+# - "similarity": want the same choices, or any choice when the student has none
+# - "preference": same or different backgrounds, chosen by backgrounds_preference (1=different)
+STRATEGIES = {
+    "skill_level": "diversity",
+    "ambition": "similarity",
+    "role": "diversity",
+    "teamwork_style": "similarity",
+    "pace": "similarity",
+    "backgrounds": "preference",
+    "hobbies": "similarity",
+}
+
+
+def to_bitmask(choices: set[int]) -> int:
+    """Convert a set of choice indices to a bitmask.
+
+    Args:
+        choices: Set of choice indices.
+
+    Returns:
+        Integer with bit k set for every index k in choices.
+    """
+    mask = 0
+    for choice in choices:
+        mask |= 1 << choice
+    return mask
+
+
+def student_columns(students: list) -> tuple[dict, dict]:
+    """Gather the categorical attributes of a batch of students into columns.
+
+    Args:
+        students: List of Student objects.
+
+    Returns:
+        Tuple of (choice columns, bitmask columns), dictionaries of numpy arrays keyed by attribute name.
+    """
+    choices = {
+        name: np.array([NO_CHOICE if getattr(student, name) is None else getattr(student, name)
+                        for student in students], dtype=np.int8)
+        for name in CHOICE_COLUMNS
+    }
+    bitmasks = {
+        name: np.array([to_bitmask(getattr(student, name) or ()) for student in students], dtype=np.int64)
+        for name in BITMASK_COLUMNS
+    }
+    return choices, bitmasks
+
+
+class VectorEncoder:
+    """Compiled have/want vector layout for a CONFIG.
+
+    Each attribute owns a block of the vectors, one slot per choice. A selected choice
+    has the value weight / sqrt(number of choices) in the have vector, and the want
+    block is derived from the have block according to the attribute's strategy.
+    """
+
+    def __init__(self, config: dict = CONFIG):
+        """Initialize a VectorEncoder instance.
+
+        Args:
+            config: Attribute configuration, same shape as CONFIG.
+        """
+        self.blocks = []  # (name, offset, width, normalized weight) of every attribute, in CONFIG order
+        offset = 0
+        for name, attribute in config.items():
+            width = len(attribute["choices"])  # cardinality of the attribute
+            weight = attribute["weight"] / math.sqrt(width)  # weight, normalized by sqrt(cardinality)
+            self.blocks.append((name, offset, width, weight))
+            offset += width
+        self.dim = offset  # length of the have/want vectors
+
+    def encode_into(self, choices: dict, bitmasks: dict, have: np.ndarray, want: np.ndarray):
+        """Encode a batch of students from their attribute columns.
+
+        Args:
+            choices: Single-choice columns (n,), NO_CHOICE for None.
+            bitmasks: Bitmask columns (n,) of the multiple-choice attributes.
+            have: Output have matrix (n x dim), overwritten.
+            want: Output want matrix (n x dim), overwritten.
+        """
+        for name, offset, width, weight in self.blocks:
+            if name in bitmasks:
+                # multi-hot: bit k of the mask -> slot k of the block
+                have_block = ((bitmasks[name][:, None] >> np.arange(width)) & 1) * weight
+                chosen = bitmasks[name] != 0
+            else:
+                # one-hot: set slot column[i] of row i, rows without a choice stay 0
+                column = choices[name]
+                chosen = column != NO_CHOICE
+                have_block = np.zeros((len(column), width))
+                have_block[np.flatnonzero(chosen), column[chosen]] = weight
+
+            strategy = STRATEGIES[name]
+            if strategy == "diversity":
+                want_block = weight - have_block  # swap 1 and 0, want the other choices
+            elif strategy == "preference":
+                # 1=different backgrounds is handled like diversity, 0=same like similarity
+                different = (choices["backgrounds_preference"] == 1)[:, None]
+                want_block = np.where(different, weight - have_block, have_block)
+                want_block[~chosen] = weight  # no backgrounds, wants any kind
+            else:
+                want_block = have_block.copy()
+                want_block[~chosen] = weight  # no preference, wants any kind
+
+            have[:, offset:offset + width] = have_block
+            want[:, offset:offset + width] = want_block
+
+    def encode(self, students: list, dtype=np.float64) -> tuple[np.ndarray, np.ndarray]:
+        """Encode a batch of students into new have/want matrices.
+
+        Args:
+            students: List of Student objects.
+            dtype: Data type of the matrices.
+
+        Returns:
+            Tuple of (have, want) matrices, one row per student.
+        """
+        have = np.empty((len(students), self.dim), dtype=dtype)
+        want = np.empty((len(students), self.dim), dtype=dtype)
+        self.encode_into(*student_columns(students), have, want)
+        return have, want
+
+
+# Encoder for the application CONFIG, compiled once at import
+DEFAULT_ENCODER = VectorEncoder()
@@ -0,0 +1,78 @@
+"""Export of team results as JSON.
+
+Result payloads follow fixed schemas holding only what clients read: a student's
+result page gets its teammates' names, emails and project summaries, a bulk
+export gets every team with its students' records. Vectors are left out unless
+requested.
+
+Payloads are encoded with orjson when it is installed (pip install orjson), and
+with the standard json module otherwise; both give the same bytes for the same
+payload up to whitespace. GET /teams streams the teams as NDJSON, one team per
+line, a chunk of teams at a time, so an export never holds more than one chunk
+of encoded teams in memory.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # optional, the standard json module is used instead
+    orjson = None
+
+from ATA.models import Team
+
+# Number of teams encoded per chunk of an NDJSON export
+EXPORT_CHUNK_TEAMS = 64
+
+
+def dumps(payload) -> bytes:
+    """Encode a payload as compact UTF-8 JSON.
+
+    Args:
+        payload: JSON-serializable payload (dicts, lists, strings, numbers, None).
+
+    Returns:
+        Encoded JSON.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def result_payload(team: Team) -> dict:
+    """Build the result shown to every member of a team (GET /result).
+
+    Args:
+        team: Team of the student.
+
+    Returns:
+        Dictionary with status, the teammates' names, emails and project summaries
+        (in team order) and the AI suggestion.
+    """
+    names, emails, summaries = [], [], []
+    for teammate in team.students:  # one pass over the team
+        names.append(teammate.first_name)
+        emails.append(teammate.email)
+        summaries.append(teammate.project_summary)
+    return {
+        "status": "ok",
+        "teammates_name": names,
+        "teammates_email": emails,
+        "teammates_proj_summary": summaries,
+        "ai_suggestion": getattr(team, "AI_suggestion", None) or "",
+    }
+
+
+def iter_teams_ndjson(teams: list[Team], vectors: bool = False):
+    """Encode teams as NDJSON, EXPORT_CHUNK_TEAMS teams at a time.
+
+    Args:
+        teams: Teams to export, in order.
+        vectors: Whether to include the vectors (see Team.get_json).
+
+    Yields:
+        Encoded chunks, each a whole number of lines ending with a newline.
+    """
+    for start in range(0, len(teams), EXPORT_CHUNK_TEAMS):
+        lines = [dumps(team.get_json(vectors)) for team in teams[start:start + EXPORT_CHUNK_TEAMS]]
+        yield b"\n".join(lines) + b"\n"
@@ -0,0 +1,109 @@
+"""Conditional GET and cached result payloads for the API server.
+
+A student's result only changes when the team assignment (or a teammate's data)
+changes, so the result endpoints send a strong ETag derived from the course's
+result version (see CourseCache.result_version) and the student's email. A client
+sending it back in If-None-Match gets 304 Not Modified without a body.
+
+Serialized result payloads are kept per team in a PayloadCache, so a repeat view
+by another member of the same team costs a dictionary lookup. The cache is tied to
+one result version and is emptied as soon as a newer version is asked for.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+from fastapi import Request
+
+
+def etag(version: str, email: str) -> str:
+    """Build the strong ETag of a student's result.
+
+    Args:
+        version: Result version of the course, see CourseCache.result_version.
+        email: Email address of the student.
+
+    Returns:
+        Quoted entity tag, e.g. '"12.3-5f1c2e0a9b8d7c6e"'. The email is hashed, so it
+        isn't exposed in the header.
+    """
+    digest = hashlib.blake2b(email.encode("utf-8"), digest_size=8).hexdigest()
+    return f'"{version}-{digest}"'
+
+
+def not_modified(request: Request, tag: str) -> bool:
+    """Whether the If-None-Match header of a request matches an ETag.
+
+    Args:
+        request: FastAPI request object.
+        tag: Current ETag of the resource.
+
+    Returns:
+        True if the client's copy is current and 304 Not Modified can be sent.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # If-None-Match uses the weak comparison, a W/ prefix is ignored
+    return any(candidate.strip() in ("*", tag, "W/" + tag) for candidate in header.split(","))
+
+
+class PayloadCache:
+    """Least recently used serialized payloads of one result version."""
+
+    # Maximum number of payloads kept, the least recently used are dropped
+    MAX_ENTRIES = 1024
+
+    def __init__(self, max_entries: int = None):
+        """Initialize an empty PayloadCache instance.
+
+        Args:
+            max_entries: Maximum number of payloads, MAX_ENTRIES when None.
+        """
+        self.max_entries = max_entries or self.MAX_ENTRIES
+        self.version = None  # result version the payloads belong to
+        self._payloads = OrderedDict()  # key -> serialized payload, least recently used first
+
+    def __len__(self):
+        """Number of payloads kept."""
+        return len(self._payloads)
+
+    def get(self, version: str, key) -> bytes:
+        """Find a payload, forgetting every payload of an older version.
+
+        Args:
+            version: Current result version of the course.
+            key: Payload key, e.g. a team_id.
+
+        Returns:
+            Serialized payload, or None if it isn't cached.
+        """
+        if version != self.version:
+            self._payloads.clear()
+            self.version = version
+            return None
+        payload = self._payloads.get(key)
+        if payload is not None:
+            self._payloads.move_to_end(key)
+        return payload
+
+    def put(self, version: str, key, payload: bytes):
+        """Keep a payload of the current version.
+
+        Args:
+            version: Result version the payload was built from.
+            key: Payload key, e.g. a team_id.
+            payload: Serialized payload.
+        """
+        if version != self.version:
+            self._payloads.clear()
+            self.version = version
+        self._payloads[key] = payload
+        self._payloads.move_to_end(key)
+        while len(self._payloads) > self.max_entries:
+            self._payloads.popitem(last=False)
+
+    def clear(self):
+        """Forget every payload."""
+        self._payloads.clear()
+        self.version = None
@@ -0,0 +1,233 @@
+"""Lightweight timing instrumentation of the course stages, persistence and API.
+
+Stages are wrapped with the timed decorator or the span context manager. While
+instrumentation is off (the default) a wrapped call costs one flag check, and
+span returns a shared no-op context. When on, every span adds its duration to a
+process-wide total, and to the totals of the API request it ran in, which the
+middleware returns in a Server-Timing header. render_metrics writes all totals in
+the Prometheus text format, for the /metrics endpoint.
+
+Environment variables:
+    ATA_METRICS: "1" to turn instrumentation on at startup.
+    ATA_PROFILE: Path of an API route (e.g. "/student_submit"), the next request to it
+                 is run under cProfile and the stats are dumped to PROFILE_DIR.
+
+Spans nest, the time of an inner span is included in the outer one.
+"""
+
+import contextlib
+import contextvars
+import cProfile
+import functools
+import os
+import threading
+import time
+
+# Directory the cProfile stats of a profiled request are written to
+PROFILE_DIR = "data/profiles"
+
+# Whether spans are recorded
+_enabled = os.environ.get("ATA_METRICS", "") not in ("", "0")
+
+# Route path whose next request is profiled, None when profiling is off
+_profile_path = os.environ.get("ATA_PROFILE") or None
+
+_lock = threading.Lock()  # guards the totals, spans also run in worker threads
+_span_totals = {}  # span name -> [count, seconds]
+_request_totals = {}  # (method, route, status) -> [count, seconds]
+_request_spans = contextvars.ContextVar("request_spans", default=None)  # span name -> seconds, of the request
+
+_NO_SPAN = contextlib.nullcontext()
+
+
+def enable(flag: bool = True):
+    """Turn recording of spans and requests on or off.
+
+    Args:
+        flag: True to record, False to stop recording.
+    """
+    global _enabled
+    _enabled = flag
+
+
+def enabled() -> bool:
+    """Whether spans are recorded."""
+    return _enabled
+
+
+def profile_next(path: str):
+    """Profile the next API request to a route with cProfile.
+
+    Args:
+        path: Route path, e.g. "/result", None to cancel.
+    """
+    global _profile_path
+    _profile_path = path
+
+
+def detach_request():
+    """Stop adding spans to the totals of the current request, e.g. in a task started by a request.
+
+    Only the current context is changed, the request keeps its own totals.
+    """
+    _request_spans.set(None)
+
+
+def reset():
+    """Forget all recorded totals."""
+    with _lock:
+        _span_totals.clear()
+        _request_totals.clear()
+
+
+def record(name: str, seconds: float):
+    """Add the duration of a span to the totals.
+
+    Args:
+        name: Span name, e.g. "course.prepare".
+        seconds: Duration of the span.
+    """
+    with _lock:
+        total = _span_totals.setdefault(name, [0, 0.0])
+        total[0] += 1
+        total[1] += seconds
+    spans = _request_spans.get()
+    if spans is not None:
+        spans[name] = spans.get(name, 0.0) + seconds
+
+
+@contextlib.contextmanager
+def _span(name: str):
+    """Record the duration of the block as a span."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def span(name: str):
+    """Context manager timing a block, a no-op while instrumentation is off.
+
+    Args:
+        name: Span name.
+    """
+    return _span(name) if _enabled else _NO_SPAN
+
+
+def timed(name: str):
+    """Decorator timing every call of a function as a span.
+
+    Args:
+        name: Span name.
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def snapshot() -> dict:
+    """Return a copy of the span totals.
+
+    Returns:
+        Dictionary of span name -> (count, seconds).
+    """
+    with _lock:
+        return {name: tuple(total) for name, total in _span_totals.items()}
+
+
+def _label(value) -> str:
+    """Escape a Prometheus label value."""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def render_metrics() -> str:
+    """Write the recorded totals in the Prometheus text exposition format.
+
+    Returns:
+        Metrics text, one summary (sum and count) per span and per request route.
+    """
+    with _lock:
+        spans = sorted(_span_totals.items())
+        requests = sorted(_request_totals.items())
+    lines = ["# HELP ata_span_seconds Time spent in instrumented stages.",
+             "# TYPE ata_span_seconds summary"]
+    for name, (count, seconds) in spans:
+        lines.append(f'ata_span_seconds_sum{{span="{_label(name)}"}} {seconds:.6f}')
+        lines.append(f'ata_span_seconds_count{{span="{_label(name)}"}} {count}')
+    lines += ["# HELP ata_http_request_seconds Time spent handling API requests.",
+              "# TYPE ata_http_request_seconds summary"]
+    for (method, route, status), (count, seconds) in requests:
+        labels = f'method="{_label(method)}",route="{_label(route)}",status="{status}"'
+        lines.append(f"ata_http_request_seconds_sum{{{labels}}} {seconds:.6f}")
+        lines.append(f"ata_http_request_seconds_count{{{labels}}} {count}")
+    lines.append(f"ata_instrumentation_enabled {int(_enabled)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the duration of every request and the spans it ran.
+
+    The span totals of a request are added to its response as a Server-Timing header
+    (milliseconds). Requests are recorded by route template, not by raw path, so the
+    number of series stays bounded. While instrumentation and profiling are off,
+    requests are passed straight through.
+    """
+
+    def __init__(self, app):
+        """Initialize a MetricsMiddleware instance.
+
+        Args:
+            app: ASGI application to wrap.
+        """
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (_enabled or _profile_path):
+            return await self.app(scope, receive, send)
+
+        profiler = None
+        if _profile_path is not None and scope["path"] == _profile_path:
+            profile_next(None)  # one request only
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        spans = {}
+        token = _request_spans.set(spans)
+        status = [500]  # reported when the app fails before starting a response
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if spans:
+                    timing = ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in spans.items())
+                    message = dict(message, headers=list(message.get("headers", [])) +
+                                   [(b"server-timing", timing.encode("latin-1"))])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            seconds = time.perf_counter() - start
+            _request_spans.reset(token)
+            if profiler is not None:
+                profiler.disable()
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+                name = scope["path"].strip("/").replace("/", "_") or "root"
+                profiler.dump_stats(os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}.prof"))
+            if _enabled:
+                route = getattr(scope.get("route"), "path", "unmatched")
+                with _lock:
+                    total = _request_totals.setdefault((scope["method"], route, status[0]), [0, 0.0])
+                    total[0] += 1
+                    total[1] += seconds
@@ -0,0 +1,247 @@
+"""Team matching jobs, run in background worker processes.
+
+The API server starts a matching job and returns at once. The job runs
+Course.team_matching in a process pool, on the course loaded from its database,
+so the event loop stays free to serve requests. Workers report their phase and
+progress through a queue, read by a listener thread that updates the jobs. The
+finished assignment is sent back as lists of emails and committed to the course
+cache, in memory and in the database, in one step (see CourseCache.commit_teams).
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from ATA import instrumentation, pickle_ops
+from ATA.course_cache import CourseCache
+
+# Range of the overall percentage covered by each phase of a job, as (start, end)
+PHASE_PERCENT = {
+    "queued": (0, 0),
+    "loading": (0, 5),
+    "scoring": (5, 30),
+    "seeding": (30, 35),
+    "growth": (35, 85),
+    "restarts": (30, 85),  # instead of seeding and growth, with several restarts
+    "refinement": (85, 95),
+    "committing": (95, 100),
+    "done": (100, 100),
+}
+
+# Minimum seconds between two progress reports of a worker within the same phase
+PROGRESS_INTERVAL = 0.1
+
+# Progress queue of a worker process, set by _init_worker
+_progress_queue = None
+
+
+def _init_worker(queue):
+    """Worker initializer: keep the progress queue."""
+    global _progress_queue
+    _progress_queue = queue
+
+
+def _reporter(job_id: str):
+    """Return a progress callback sending (job_id, phase, fraction) to the parent, throttled."""
+    last = {"phase": None, "time": 0.0}
+
+    def report(phase: str, fraction: float):
+        now = time.monotonic()
+        if phase == last["phase"] and now - last["time"] < PROGRESS_INTERVAL:
+            return
+        last["phase"], last["time"] = phase, now
+        _progress_queue.put((job_id, phase, fraction))
+    return report
+
+
+def _run_job(job_id: str, path: str, options: dict) -> list[list[str]]:
+    """Worker task: load a course, run team matching and return the teams.
+
+    Args:
+        job_id: ID of the job, sent with the progress reports.
+        path: Database file path of the course.
+        options: Keyword arguments of Course.team_matching.
+
+    Returns:
+        Teams in order, each a list of student emails.
+    """
+    report = _reporter(job_id)
+    report("loading", 0.0)
+    try:
+        course = pickle_ops.load_data(path)
+    except FileNotFoundError:
+        raise ValueError("No students to match")
+    course.team_matching(progress=report, **options)
+    return [[student.email for student in team.students] for team in course.teams]
+
+
+class MatchingJob:
+    """State of one matching job, updated by the JobManager."""
+
+    def __init__(self, job_id: str, path: str, options: dict):
+        """Initialize a queued MatchingJob instance.
+
+        Args:
+            job_id: Unique job ID.
+            path: Database file path of the course, None for the default course.
+            options: Keyword arguments of Course.team_matching.
+        """
+        self.job_id = job_id  # unique identifier of this job
+        self.path = path  # course the job matches
+        self.options = options  # team_matching arguments
+        self.status = "queued"  # queued, running, done or failed
+        self.phase = "queued"  # current phase, see PHASE_PERCENT
+        self.fraction = 0.0  # fraction of the current phase done
+        self.teams = None  # number of teams formed, once done
+        self.error = None  # error message, if failed
+        self.created_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def percent(self) -> float:
+        """Overall progress in percent, estimated from the phase."""
+        start, end = PHASE_PERCENT.get(self.phase, (0, 0))
+        return round(start + min(max(self.fraction, 0.0), 1.0) * (end - start), 1)
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the job was started, until it finished."""
+        return round((self.finished_at or time.monotonic()) - self.created_at, 3)
+
+    def get_json(self):
+        """Convert job state to JSON-serializable dictionary.
+
+        Returns:
+            Dictionary containing job ID, status, phase, percent, elapsed seconds, and
+            the number of teams or the error once finished.
+        """
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "phase": self.phase,
+            "percent": self.percent,
+            "elapsed": self.elapsed,
+            "teams": self.teams,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Runs matching jobs in a process pool, at most one running job per course.
+
+    Jobs of different courses run at the same time, on different workers.
+    """
+
+    # Number of finished jobs kept for status requests, the oldest are forgotten
+    MAX_FINISHED_JOBS = 100
+
+    def __init__(self, workers: int = None):
+        """Initialize a JobManager instance, the pool is started by the first job.
+
+        Args:
+            workers: Number of worker processes, the CPU count when None.
+        """
+        self.workers = workers or os.cpu_count() or 1  # size of the process pool
+        self.jobs = {}  # job_id -> MatchingJob, in submission order
+        self._running = {}  # course path -> its queued or running MatchingJob
+        self._tasks = set()  # asyncio tasks of the running jobs
+        self._pool = None  # ProcessPoolExecutor, started on first use
+        self._queue = None  # progress queue shared with the workers
+        self._listener = None  # thread applying the progress reports
+
+    def get(self, job_id: str) -> MatchingJob:
+        """Find a job by its ID.
+
+        Args:
+            job_id: Job ID to search for.
+
+        Returns:
+            MatchingJob object, or None if no job has this ID.
+        """
+        return self.jobs.get(job_id)
+
+    def submit(self, cache: CourseCache, options: dict) -> MatchingJob:
+        """Start a matching job for the course of a cache.
+
+        Args:
+            cache: CourseCache of the course, the teams are committed to it.
+            options: Keyword arguments of Course.team_matching (max_size, restarts, ...).
+
+        Returns:
+            MatchingJob, queued.
+
+        Raises:
+            ValueError: If a job is already running for this course.
+        """
+        if cache.path in self._running:
+            raise ValueError(f"Matching job {self._running[cache.path].job_id} is already running for this course")
+        job = MatchingJob(uuid.uuid4().hex, cache.path, options)
+        self.jobs[job.job_id] = job
+        self._running[cache.path] = job
+        self.__forget_finished()
+        task = asyncio.create_task(self.__run(job, cache))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def close(self):
+        """Stop the running jobs and the worker processes, e.g. at shutdown."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._queue.put(None)  # stop the listener
+            await asyncio.to_thread(self._listener.join)
+            self._pool = None
+
+    def __start_pool(self):
+        """Start the process pool and the progress listener."""
+        # spawn: forking a process that runs an event loop and threads is not safe
+        context = multiprocessing.get_context("spawn")
+        self._queue = context.Queue()
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                         initializer=_init_worker, initargs=(self._queue,))
+        self._listener = threading.Thread(target=self.__listen, name="matching-progress", daemon=True)
+        self._listener.start()
+
+    def __listen(self):
+        """Listener thread: apply the progress reports of the workers to their jobs."""
+        while True:
+            report = self._queue.get()
+            if report is None:
+                return
+            job_id, phase, fraction = report
+            job = self.jobs.get(job_id)
+            if job is not None and job.status == "running" and job.phase != "committing":
+                job.phase, job.fraction = phase, fraction
+
+    async def __run(self, job: MatchingJob, cache: CourseCache):
+        """Run a job in the pool, then commit its teams."""
+        instrumentation.detach_request()  # started by a request, but outlives it
+        try:
+            if self._pool is None:
+                self.__start_pool()
+            job.status, job.phase = "running", "loading"
+            path = cache.path or pickle_ops.DATA_FILEPATH
+            teams = await asyncio.wrap_future(self._pool.submit(_run_job, job.job_id, path, job.options))
+            job.phase, job.fraction = "committing", 0.0
+            job.teams = await cache.commit_teams(teams)
+            job.status, job.phase = "done", "done"
+        except asyncio.CancelledError:
+            job.status, job.error = "failed", "Cancelled"
+            raise
+        except Exception as error:
+            job.status, job.error = "failed", str(error) or type(error).__name__
+        finally:
+            job.finished_at = time.monotonic()
+            self._running.pop(job.path, None)
+
+    def __forget_finished(self):
+        """Drop the oldest finished jobs beyond MAX_FINISHED_JOBS."""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - self.MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
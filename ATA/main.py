@@ -1,9 +1,17 @@
 import ATA.pickle_ops as pickle_ops
-from ATA.models import Course, Student
+from ATA import roster_io
+from ATA.models import Course
 from ATA.config import VERSION
-import json
+from concurrent.futures import ProcessPoolExecutor
 import os
 import platform
+import sqlite3
+
+# Score matrices of previous team matching runs, reused while the students don't change
+SCORE_CACHE_DIR = "data/score_cache"
+
+# Database of the course the CLI works on, None for the default course (see select_course_cli)
+course_path = None
 
 
 def clear_screen():
@@ -41,9 +49,82 @@ def proceed_team_matching(max_size: int) -> None:
     print()  # blank line for formatting
     
     # Load course data and run matching algorithm
-    course = pickle_ops.load_data()  # load existing course data
+    course = pickle_ops.load_data(course_path)  # load existing course data
+    course.SCORE_CACHE_DIR = SCORE_CACHE_DIR  # reuse the score matrix if the students didn't change
     course.team_matching(max_size)  # run team matching with specified max team size
-    pickle_ops.save_data(course)  # save updated course data with team assignments
+    pickle_ops.save_teams(course, course_path)  # save the new team assignments, students did not change
+
+
+def _match_course(path: str, max_size: int, score_cache_dir: str) -> int:
+    """Run team matching on one stored course and save its teams, in a worker process.
+
+    Args:
+        path: Database file path of the course.
+        max_size: Maximum number of students per team.
+        score_cache_dir: Score matrix cache directory, shared by all courses.
+
+    Returns:
+        Number of teams formed.
+    """
+    course = pickle_ops.load_data(path)
+    course.SCORE_CACHE_DIR = score_cache_dir
+    course.team_matching(max_size)
+    pickle_ops.save_teams(course, path)
+    return len(course.teams)
+
+
+def match_courses(course_ids: list[str], max_size: int, workers: int = None) -> dict:
+    """Run team matching on several courses at once, each in its own worker process.
+
+    Every course is loaded from, matched and saved to its own database, so the cost
+    of a course only depends on its own size, and courses don't wait on each other.
+
+    Args:
+        course_ids: IDs of the courses to match.
+        max_size: Maximum number of students per team.
+        workers: Number of worker processes, one per course (up to the CPU count) when None.
+
+    Returns:
+        Dictionary of course ID -> number of teams formed, or the error message if it failed.
+    """
+    if not course_ids:
+        return {}
+    workers = workers or min(len(course_ids), os.cpu_count() or 1)
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {course_id: pool.submit(_match_course, pickle_ops.course_path(course_id), max_size,
+                                             SCORE_CACHE_DIR)
+                   for course_id in course_ids}
+        for course_id, future in futures.items():
+            try:
+                results[course_id] = future.result()
+            except (OSError, ValueError, sqlite3.Error) as error:  # missing or corrupted course, or no students
+                results[course_id] = str(error)
+    return results
+
+
+def print_assignment_quality(course: Course):
+    """Print the quality report of the current team assignment.
+    
+    Args:
+        course: Course whose teams are evaluated.
+    """
+    report = course.evaluate_assignment()  # per-team cohesion and aggregates
+    summary = report["summary"]
+    if summary["teams"] == 0:
+        return  # nothing matched yet
+    print("----------------------------------------")
+    print("Matching quality:")
+    for team in report["teams"]:
+        if team["mean_score"] is not None:  # a team of one has no pairs
+            print(f"    Team {team['team_id']}".ljust(14) + f" | size {team['size']}"
+                  + f" | mean {team['mean_score']:.3f} | worst pair {team['worst_pair_score']:.3f}")
+    print()
+    print(f"    Teams: {summary['teams']}, students: {summary['students']}, unassigned: {summary['unassigned']}")
+    if summary["mean_pair_score"] is not None:
+        print(f"    Mean pair score: {summary['mean_pair_score']:.3f}, lowest team mean: "
+              f"{summary['min_team_score']:.3f}, worst pair: {summary['worst_pair_score']:.3f}")
+    print(f"    Team sizes: {summary['min_size']} to {summary['max_size']} (std {summary['size_std']:.2f})")
 
 
 def return_all_students_name() -> list[str]:
@@ -54,7 +135,7 @@ def return_all_students_name() -> list[str]:
     Returns:
         List of student first names.
     """
-    course = pickle_ops.load_data()  # load course data
+    course = pickle_ops.load_data(course_path)  # load course data
     return [student.first_name for student in course.students]  # extract and return list of student names
 
 
@@ -63,7 +144,7 @@ def display_all_students():
     
     Prints formatted output showing each student's information and current team assignment.
     """
-    course = pickle_ops.load_data()  # load course data
+    course = pickle_ops.load_data(course_path)  # load course data
     
     # Display total number of students
     print(f"Number of students: {len(course.students)}")
@@ -80,40 +161,78 @@ def display_all_students():
         print(f"{student.first_name}".ljust(20) + " | " + f"{student.email}".ljust(30) + " | " + f"Team: {team_id}".ljust(10))  # formatted output
 
 
+def import_roster(path: str) -> int:
+    """Import a roster file (JSON, JSONL or CSV) into the current course.
+    
+    Existing students (by email) are updated and new ones are added, all in one transaction.
+    Their team assignments are kept, and the matching scores are recomputed once, the
+    next time team matching runs.
+    
+    Args:
+        path: Path of the roster file, the format is guessed from the extension.
+        
+    Returns:
+        Number of imported students.
+    """
+    students = roster_io.load_roster(path)  # parse, validate and dedupe by email
+    pickle_ops.write_students(students, course_path)  # upsert by email, existing students are updated, not duplicated
+    return len(students)
+
+
 def upload_test_data():
     """Load test users from JSON and update/add them to the current course.
     
     Reads test/test_user.json and updates existing students (by email) or adds new ones.
-    Uses update_student() to prevent duplicates.
     """
-    # Load test data from JSON file
-    with open("test/test_user.json", "r") as f:
-        data = json.load(f)  # parse JSON file
+    import_roster("test/test_user.json")
+
+
+def import_roster_cli():
+    """CLI helper to import a roster file.
+    
+    Prompts user for the file path and imports the students in it.
+    """
+    path = input("Enter the path of the roster file (.json, .jsonl or .csv): ").strip()  # get and clean input
+    try:
+        count = import_roster(path)
+        print(f"{count} students have been imported.")  # confirm success
+    except (OSError, ValueError) as error:
+        # Handle missing file, unsupported format or invalid records
+        print(f"Import failed: {error}")
+
+
+def select_course_cli():
+    """CLI helper to choose the course the other commands work on.
+    
+    Prompts user for a course ID, empty for the default course.
+    """
+    global course_path
+    courses = pickle_ops.list_courses()
+    print("Stored courses: " + (", ".join(courses) if courses else "none"))
+    course_id = input("Enter the course ID (empty for the default course): ").strip()  # get and clean input
+    try:
+        course_path = pickle_ops.course_path(course_id) if course_id else None
+        print(f"Working on course {course_id or '(default)'}.")  # confirm success
+    except ValueError as error:
+        # Handle IDs that can't be used as file names
+        print(error)
+
+
+def match_all_courses_cli():
+    """CLI helper to run team matching on every stored course at once.
     
-    course = pickle_ops.load_data()  # load existing course data
-
-    # Process each student from test data
-    for student_data in data["students"].values():
-        # Create Student object from JSON data
-        student = Student(
-            first_name=student_data["first_name"],
-            email=student_data["email"],
-            skill_level=student_data["skill_level"],
-            ambition=student_data["ambition"],
-            role=student_data["role"],
-            teamwork_style=student_data["teamwork_style"],
-            pace=student_data["pace"],
-            backgrounds=set(student_data["backgrounds"]),  # convert list to set
-            backgrounds_preference=student_data["backgrounds_preference"],
-            hobbies=set(student_data["hobbies"]),  # convert list to set
-            project_summary=student_data["project_summary"],
-        )
-        # Use update_student to ensure existing students are updated, not duplicated
-        # if student with same email exists, update their info; otherwise add as new
-        course.update_student(student)
-
-    # Save updated course data
-    pickle_ops.save_data(course)
+    Prompts user for the team size, then matches the courses in parallel worker processes.
+    """
+    try:
+        team_size = int(input("Enter team size: "))  # prompt for max team size
+    except ValueError:
+        print("Invalid input, please enter a valid integer.")
+        return
+    if team_size <= 1:
+        print("Invalid input, please enter a valid integer greater than 1.")
+        return
+    for course_id, result in match_courses(pickle_ops.list_courses(), team_size).items():
+        print(f"{course_id}".ljust(20) + " | " + (f"{result} teams" if isinstance(result, int) else f"failed: {result}"))
 
 
 def clear_team_assignments_cli():
@@ -122,26 +241,23 @@ def clear_team_assignments_cli():
     Removes all team assignments and resets students to not-in-team status,
     but preserves all student data.
     """
-    course = pickle_ops.load_data()  # load existing course data
+    course = pickle_ops.load_data(course_path)  # load existing course data
     course.clear_team_assignments()  # remove all team assignments but keep students
-    pickle_ops.save_data(course)  # save updated course data
+    pickle_ops.save_data(course, course_path)  # save updated course data
     print("All team assignments have been cleared (students kept).")  # confirm operation
 
 
 def remove_student_cli():
     """CLI helper to remove a single student by email.
     
-    Prompts user for email and removes all students with that email from the course.
+    Prompts user for email and removes the student with that email from the course.
+    Only the student's rows are deleted, the course is not loaded.
     """
     # Prompt user for student email
     email = input("Enter the email of the student to remove: ").strip()  # get and clean input
-    course = pickle_ops.load_data()  # load existing course data
-    
-    try:
-        course.remove_student_by_email(email)  # attempt to remove student
-        pickle_ops.save_data(course)  # save updated course data
+    if pickle_ops.delete_student(email, course_path):  # also drops its team if it was the last member
         print(f"Student with email {email} has been removed.")  # confirm success
-    except ValueError:
+    else:
         # Handle case where student doesn't exist
         print(f"No student found with email {email}.")  # show error message
 
@@ -157,6 +273,9 @@ P - print results
 R - reset system (delete all students)
 U - clear all team assignments (keep students)
 D - delete a student by email
+I - import students from a roster file
+C - select course
+M - team matching for all courses
 test - input test data
 
 INPUT: """
@@ -176,13 +295,13 @@ def main():
     # Initialize course data
     # Try to load existing course; if not found, create a new empty course
     try:
-        course = pickle_ops.load_data()  # attempt to load existing course data
+        course = pickle_ops.load_data(course_path)  # attempt to load existing course data
         if not isinstance(course, Course):  # verify loaded data is a Course instance
             raise Exception("Loaded data is not a Course instance")
     except Exception:
         # If loading fails (file doesn't exist or is corrupted), create new empty course
         course = Course([])  # create empty course
-        pickle_ops.save_data(course)  # save empty course to initialize data file
+        pickle_ops.save_data(course, course_path)  # save empty course to initialize data file
         clear_screen()
         print_header()
         print("Initialized new empty course data file.")
@@ -224,8 +343,9 @@ def main():
             clear_screen()
             print_header()
             print(p)  # print result printing header
-            course = pickle_ops.load_data()  # reload course data to get latest results
+            course = pickle_ops.load_data(course_path)  # reload course data to get latest results
             course.print_result()  # display formatted team results
+            print_assignment_quality(course)  # cohesion of every team and overall
             input("\nPress Enter to continue...")
         
         # Command: R - Reset system (delete all students)
@@ -237,7 +357,7 @@ def main():
             confirm = input("Are you sure you want to reset the system (delete all students)? (y/n): ")
             if confirm.lower() in ("y", "yes"):  # check if user confirmed
                 course = Course([])  # create empty course (deletes all students)
-                pickle_ops.save_data(course)  # save empty course
+                pickle_ops.save_data(course, course_path)  # save empty course
                 print("System has been fully reset (all students deleted).")
             input("\nPress Enter to continue...")
             # If user says no, silently continue (no action taken)
@@ -263,6 +383,30 @@ def main():
             remove_student_cli()  # prompt for email and remove student
             input("\nPress Enter to continue...")
         
+        # Command: I - Import students from a roster file
+        elif inp.lower() == "i":
+            clear_screen()
+            print_header()
+            print(p)  # print result printing header
+            import_roster_cli()  # prompt for file path and import students
+            input("\nPress Enter to continue...")
+        
+        # Command: C - Select the course the other commands work on
+        elif inp.lower() == "c":
+            clear_screen()
+            print_header()
+            print(p)  # print result printing header
+            select_course_cli()  # prompt for course ID
+            input("\nPress Enter to continue...")
+        
+        # Command: M - Run team matching on every course in parallel
+        elif inp.lower() == "m":
+            clear_screen()
+            print_header()
+            print(p)  # print result printing header
+            match_all_courses_cli()  # prompt for team size and match all courses
+            input("\nPress Enter to continue...")
+        
         # Command: test - Upload test data from JSON file
         elif inp.lower() == "test":
             clear_screen()
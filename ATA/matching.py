@@ -0,0 +1,433 @@
+"""Team matching core, on student indices only.
+
+The greedy matching works on the have/want arrays and a PairRanking, without
+Student or Course objects, so the same code runs in Course.team_matching and in
+worker processes. Restarts rerun the greedy with small random perturbations of
+the scores and keep the assignment with the best team objective; with several
+workers, the read-only arrays are shared with the worker processes through
+shared memory instead of being pickled for every run.
+"""
+
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ATA.scoring import PairRanking
+
+# Number of teams whose scores against the unassigned students are computed in one matrix multiplication
+GROWTH_BLOCK_TEAMS = 256
+
+# Largest random amount added to a normalized score by a perturbed restart
+RESTART_NOISE = 0.01
+
+
+def seed_team_cores(ranking: PairRanking, num_of_group: int, unassigned: np.ndarray) -> list[list[int]]:
+    """Form the team cores from the best mutual crush score pairs.
+
+    Pairs are read chunk by chunk from the pair ranking. Pairs with an already assigned
+    student are dropped from each chunk with one vectorized mask, so only pairs that
+    were fully unassigned at the start of the chunk are checked one by one.
+
+    Args:
+        ranking: Ranking of the candidate pairs, all pairs or a sparse subset.
+        num_of_group: Number of teams to form.
+        unassigned: Boolean mask of students not in team, updated in place.
+
+    Returns:
+        List of team cores, each a list of student indices (two, or one for the leftovers).
+    """
+    cores = []  # list of team cores, as student indices
+    remaining = len(unassigned)  # number of students not in team
+    for chunk in ranking.iter_chunks():
+        rows, cols = ranking.rows[chunk], ranking.cols[chunk]
+        valid = unassigned[rows] & unassigned[cols]  # skip every pair with an assigned student at once
+        for i, j in zip(rows[valid].tolist(), cols[valid].tolist()):
+            if len(cores) == num_of_group:  # all team cores are formed
+                return cores
+            if remaining + len(cores) == num_of_group:
+                # meaning we have enough teams, however there are still single students left.
+                # it is because number of teams is smaller than 2x number of students.
+                # so there are partial students formed team, the rest students form as a team as single
+                break
+            # if both students are still not in team (an earlier pair of this chunk may
+            # have taken one of them), then they become a team core
+            if unassigned[i] and unassigned[j]:
+                unassigned[i] = unassigned[j] = False
+                remaining -= 2
+                cores.append([i, j])
+        else:
+            continue  # chunk used up, read the next one
+        break
+
+    # the rest students form as a team as single
+    # (a sparse ranking can run out of pairs with more students left than missing cores)
+    if len(cores) < num_of_group:
+        for slot in np.flatnonzero(unassigned)[::-1][:num_of_group - len(cores)].tolist():
+            unassigned[slot] = False
+            cores.append([slot])
+    return cores
+
+
+def grow_teams(have: np.ndarray, want: np.ndarray, teams: list[list[int]], unassigned: np.ndarray,
+               max_size: int, block_teams: int = GROWTH_BLOCK_TEAMS, rng: np.random.Generator = None,
+               noise: float = 0.0, progress=None) -> list[list[int]]:
+    """Add the remaining students to the teams, one student per team per round.
+
+    Each team's have/want vector is the average of its members, kept as a row of
+    running sums (T x d), so an assignment only updates one row; the sums are added up
+    in member order and divided by the size, like the mean of the original Team. The
+    scores of a block of teams against all unassigned students are computed with two
+    matrix multiplications: score = (team_have . student_want + team_want . student_have) / 2,
+    and each team takes its best available student with a masked argmax, ties going to the
+    highest index. Full teams are skipped, which only happens when a sparse candidate
+    ranking left more single-student cores than usual.
+
+    The results are not bit-for-bit identical to the original per-student np.dot loop:
+    a matrix product can round the last bit of a score differently, so candidates whose
+    scores are equal up to that bit may be picked in another order (a few percent of
+    random rosters end up with different teams). Exact ties are broken the same way.
+
+    Args:
+        have: Have vectors (n x d).
+        want: Want vectors (n x d).
+        teams: Team cores as lists of student indices, extended in place.
+        unassigned: Boolean mask of students not in team, updated in place.
+        max_size: Maximum number of students per team.
+        block_teams: Number of teams scored in one matrix multiplication.
+        rng: Random generator of a perturbed run, None for the deterministic greedy.
+        noise: Largest random amount added to the scores of a perturbed run.
+        progress: Called as progress("growth", fraction of the students assigned) after every block.
+
+    Returns:
+        The same list of teams with every student assigned.
+    """
+    team_have = np.array([have[members].sum(axis=0) for members in teams])  # T x d sums of have vectors
+    team_want = np.array([want[members].sum(axis=0) for members in teams])  # T x d sums of want vectors
+    sizes = np.array([len(members) for members in teams], dtype=float)  # divide sums by size to get averages
+    left = int(unassigned.sum())  # students to assign, for progress
+
+    while unassigned.any():  # until all students are matched
+        # roll through the teams, one block of teams at a time
+        for start in range(0, len(teams), block_teams):
+            rest = np.flatnonzero(unassigned)  # indices of students not in team
+            if len(rest) == 0:  # students drained out during this round
+                break
+            block = np.arange(start, min(start + block_teams, len(teams)))
+
+            # team-vs-unassigned mutual scores for the whole block, from the team averages
+            mean_have, mean_want = team_have[block] / sizes[block, None], team_want[block] / sizes[block, None]
+            scores = (mean_have @ want[rest].T + mean_want @ have[rest].T) / 2
+            if rng is not None:
+                scores += rng.uniform(0, noise * max(float(scores.max()), 0.0), scores.shape)
+            available = np.ones(len(rest), dtype=bool)  # students of rest not taken by this block yet
+
+            for row, team in enumerate(block.tolist()):
+                if not available.any():
+                    break
+                if sizes[team] >= max_size:
+                    continue
+                # best available student, ties go to the last one (rest is in index order), like
+                # popping from the end of a list stable sorted by ascending score
+                best = len(rest) - 1 - int(np.argmax(np.where(available, scores[row], -np.inf)[::-1]))
+                slot = int(rest[best])
+                available[best] = False
+                unassigned[slot] = False
+
+                # only this team's row changes
+                teams[team].append(slot)
+                team_have[team] += have[slot]
+                team_want[team] += want[slot]
+                sizes[team] += 1
+            if progress is not None:
+                progress("growth", 1 - int(unassigned.sum()) / left)
+    return teams
+
+
+def match_teams(have: np.ndarray, want: np.ndarray, ranking: PairRanking, max_size: int,
+                block_teams: int = GROWTH_BLOCK_TEAMS, rng: np.random.Generator = None,
+                noise: float = RESTART_NOISE, progress=None) -> list[list[int]]:
+    """Run the greedy matching: seed team cores from the best pairs, then grow the teams.
+
+    Args:
+        have: Have vectors (n x d).
+        want: Want vectors (n x d).
+        ranking: Ranking of the candidate pairs.
+        max_size: Maximum number of students per team.
+        block_teams: Number of teams scored in one matrix multiplication while growing.
+        rng: Random generator of a perturbed run, None for the deterministic greedy.
+        noise: Largest random amount added to the normalized scores of a perturbed run.
+        progress: Called as progress(phase, fraction) with phase "seeding", then "growth".
+
+    Returns:
+        List of teams, each a list of student indices.
+    """
+    n = have.shape[0]
+    num_of_group = math.ceil(n / max_size)
+    if rng is not None:
+        # same pairs, shuffled a little: close pairs may swap places in the ranking
+        ranking = PairRanking.from_pairs(ranking.rows, ranking.cols,
+                                         ranking.scores + rng.uniform(0, noise, len(ranking)).astype(ranking.scores.dtype))
+
+    # Track assignment by student index: unassigned[i] is True while student i has no team
+    unassigned = np.ones(n, dtype=bool)
+
+    # First round of matching, just match two students a team at a time as team's core
+    if progress is not None:
+        progress("seeding", 0.0)
+    cores = seed_team_cores(ranking, num_of_group, unassigned)
+
+    # rest rounds of matching, each team takes its best matching student in turn
+    if progress is not None:
+        progress("growth", 0.0)
+    return grow_teams(have, want, cores, unassigned, max_size, block_teams, rng, noise, progress)
+
+
+def team_objective(have: np.ndarray, want: np.ndarray, teams: list[list[int]]) -> float:
+    """Score a whole assignment: the sum of have_i . want_j over every ordered pair of teammates.
+
+    With per-team sums H and W, a team scores H . W - sum(have_i . want_i), so the
+    whole assignment is scored in O(n * d).
+
+    Args:
+        have: Have vectors (n x d).
+        want: Want vectors (n x d).
+        teams: List of teams, each a list of student indices.
+
+    Returns:
+        Total intra-team compatibility, higher is better.
+    """
+    members = np.concatenate([np.asarray(team, dtype=np.int64) for team in teams])  # students in team order
+    labels = np.repeat(np.arange(len(teams)), [len(team) for team in teams])  # team of every member
+    team_have = np.zeros((len(teams), have.shape[1]))
+    team_want = np.zeros((len(teams), have.shape[1]))
+    np.add.at(team_have, labels, have[members])
+    np.add.at(team_want, labels, want[members])
+    # a student is not its own teammate
+    self_scores = np.einsum("ij,ij->", have[members], want[members], dtype=np.float64)
+    return float(np.einsum("ij,ij->", team_have, team_want) - self_scores)
+
+
+def assignment_quality(have: np.ndarray, want: np.ndarray, teams: list[list[int]], max_score: float) -> dict:
+    """Measure the cohesion of every team from the mutual scores of its pairs of members.
+
+    Every intra-team pair (i < j in team order) is gathered in one fancy-indexing pass, the
+    pairs of a team being contiguous, and only these pairs are scored, straight from the
+    have/want vectors: (have_i . want_j + have_j . want_i) / 2 / max_score, like the mutual
+    score of the normalized score matrix. The per-team sums are computed with np.add.reduceat
+    over the pair offsets of the teams, and the worst pairs with a single lexsort.
+
+    Args:
+        have: Have vectors (n x d).
+        want: Want vectors (n x d).
+        teams: List of teams, each a list of student indices.
+        max_score: Normalization factor of the score matrix (see scoring.max_crush_score),
+                   the scores are left raw if it is 0.
+
+    Returns:
+        Dictionary of per-team arrays: "sizes", "pairs" (number of pairs), "mean" and "worst"
+        (NaN for teams of one), "worst_pair" (k x 2 student indices, -1 for teams of one), and
+        the per-pair "scores" in team order.
+    """
+    sizes = np.array([len(team) for team in teams], dtype=np.int64)
+    members = np.concatenate([np.asarray(team, dtype=np.int64) for team in teams]) if teams else \
+        np.empty(0, dtype=np.int64)
+    starts = np.cumsum(sizes) - sizes  # offset of every team in members
+
+    # pair every member with the members after it in its team: position p of a team of size s has s - 1 - p partners
+    position = np.arange(len(members)) - np.repeat(starts, sizes)
+    partners = np.repeat(sizes, sizes) - 1 - position
+    first = np.repeat(np.arange(len(members)), partners)
+    second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(partners) - partners, partners)
+    i, j = members[first], members[second]
+    have, want = np.asarray(have, dtype=np.float64), np.asarray(want, dtype=np.float64)
+    scores = (np.einsum("ij,ij->i", have[i], want[j]) + np.einsum("ij,ij->i", have[j], want[i])) / 2
+    if max_score > 0:
+        scores /= max_score
+
+    pairs = sizes * (sizes - 1) // 2
+    pair_starts = np.cumsum(pairs) - pairs
+    has_pairs = pairs > 0  # reduceat can't reduce an empty segment
+    mean = np.full(len(teams), np.nan)
+    worst = np.full(len(teams), np.nan)
+    worst_pair = np.full((len(teams), 2), -1, dtype=np.int64)
+    if has_pairs.any():
+        mean[has_pairs] = np.add.reduceat(scores, pair_starts[has_pairs]) / pairs[has_pairs]
+        # lowest pair of every team: sort by (team, score) and take the first pair of each team
+        order = np.lexsort((scores, np.repeat(np.arange(len(teams)), pairs)))
+        lowest = order[pair_starts[has_pairs]]
+        worst[has_pairs] = scores[lowest]
+        worst_pair[has_pairs] = np.stack([i[lowest], j[lowest]], axis=1)
+    return {"sizes": sizes, "pairs": pairs, "mean": mean, "worst": worst, "worst_pair": worst_pair, "scores": scores}
+
+
+def refine_teams(have: np.ndarray, want: np.ndarray, teams: list[list[int]], max_size: int, budget_ms: float,
+                 rng: np.random.Generator = None, progress=None) -> list[list[int]]:
+    """Improve an assignment by hill climbing on team_objective, with swaps and moves of students.
+
+    With per-team sums H, W and self scores s_i = have_i . want_i, a team scores
+    H . W - sum(s_i), so the gain of swapping a (team A) with b (team B) is
+    H_A . dw + dh . W_A - H_B . dw - dh . W_B + 2 dh . dw, with dh = have_b - have_a and
+    dw = want_b - want_a: O(d) per candidate. For each student in turn, the gains of
+    swapping with every student of another team and of moving to every other team are
+    computed at once, and the best positive one is applied. Moves keep every team size
+    between the smallest initial size and max_size. Stops after a pass without any
+    improvement or when the time budget is used up.
+
+    Args:
+        have: Have vectors (n x d).
+        want: Want vectors (n x d).
+        teams: List of teams, each a list of student indices, changed in place.
+        max_size: Maximum number of students per team.
+        budget_ms: Time budget in milliseconds.
+        rng: Random generator for the order students are visited in, None for index order.
+        progress: Called as progress("refinement", fraction of the time budget used) after every pass.
+
+    Returns:
+        The same list of teams, refined.
+    """
+    started = time.perf_counter()
+    deadline = started + budget_ms / 1000
+    have, want = have.astype(np.float64), want.astype(np.float64)
+    self_scores = np.einsum("ij,ij->i", have, want)
+    labels = np.full(have.shape[0], -1, dtype=np.int64)  # team of every student, -1 if none
+    for team, members in enumerate(teams):
+        labels[members] = team
+    team_have = np.array([have[members].sum(axis=0) for members in teams])  # T x d
+    team_want = np.array([want[members].sum(axis=0) for members in teams])  # T x d
+    sizes = np.array([len(members) for members in teams])
+    min_size = int(sizes.min())
+    students = np.flatnonzero(labels >= 0)
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        if progress is not None:
+            progress("refinement", min(1.0, (time.perf_counter() - started) * 1000 / budget_ms))
+        improved = False
+        order = students if rng is None else rng.permutation(students)
+        for a in order.tolist():
+            if time.perf_counter() >= deadline:
+                break
+            team_a = labels[a]
+
+            # swap a with every student of another team
+            dh, dw = have[students] - have[a], want[students] - want[a]
+            other_have, other_want = team_have[labels[students]], team_want[labels[students]]
+            swap_gains = (dw @ team_have[team_a] + dh @ team_want[team_a]
+                          - np.einsum("ij,ij->i", other_have, dw) - np.einsum("ij,ij->i", dh, other_want)
+                          + 2 * np.einsum("ij,ij->i", dh, dw))
+            swap_gains[labels[students] == team_a] = -np.inf
+            best_swap = int(np.argmax(swap_gains))
+
+            # move a to every other team with room, if its team can shrink
+            move_gains = np.full(len(teams), -np.inf)
+            if sizes[team_a] > min_size:
+                open_teams = sizes < max_size
+                open_teams[team_a] = False
+                leave = 2 * self_scores[a] - have[a] @ team_want[team_a] - team_have[team_a] @ want[a]
+                move_gains[open_teams] = (team_want[open_teams] @ have[a] + team_have[open_teams] @ want[a]
+                                          + leave)
+            best_move = int(np.argmax(move_gains))
+
+            if max(swap_gains[best_swap], move_gains[best_move]) <= 1e-9:
+                continue  # no improving change for a
+            improved = True
+            if swap_gains[best_swap] >= move_gains[best_move]:
+                b = int(students[best_swap])
+                team_b = labels[b]
+                teams[team_a][teams[team_a].index(a)] = b
+                teams[team_b][teams[team_b].index(b)] = a
+                labels[a], labels[b] = team_b, team_a
+                team_have[team_a] += have[b] - have[a]
+                team_want[team_a] += want[b] - want[a]
+                team_have[team_b] += have[a] - have[b]
+                team_want[team_b] += want[a] - want[b]
+            else:
+                team_b = best_move
+                teams[team_a].remove(a)
+                teams[team_b].append(a)
+                labels[a] = team_b
+                team_have[team_a] -= have[a]
+                team_want[team_a] -= want[a]
+                team_have[team_b] += have[a]
+                team_want[team_b] += want[a]
+                sizes[team_a] -= 1
+                sizes[team_b] += 1
+    return teams
+
+
+def best_of_restarts(have: np.ndarray, want: np.ndarray, ranking: PairRanking, max_size: int, restarts: int,
+                     workers: int = None, seed: int = None,
+                     block_teams: int = GROWTH_BLOCK_TEAMS, progress=None) -> list[list[int]]:
+    """Run the deterministic greedy and restarts - 1 perturbed ones, and keep the best by team_objective.
+
+    Args:
+        have: Have vectors (n x d).
+        want: Want vectors (n x d).
+        ranking: Ranking of the candidate pairs.
+        max_size: Maximum number of students per team.
+        restarts: Total number of runs, the first one is the deterministic greedy.
+        workers: Number of worker processes, None or 1 to run everything in this process.
+        seed: Seed of the perturbations, None for a random one.
+        block_teams: Number of teams scored in one matrix multiplication while growing.
+        progress: Called as progress("restarts", fraction of the runs done) after every run.
+
+    Returns:
+        Best list of teams, each a list of student indices.
+    """
+    seeds = [None] + np.random.SeedSequence(seed).spawn(restarts - 1)  # None: deterministic run
+    arrays = {"have": have, "want": want, "rows": ranking.rows, "cols": ranking.cols, "scores": ranking.scores}
+    results = []
+    if not workers or workers <= 1 or restarts <= 1:
+        for run_seed in seeds:
+            results.append(_run(arrays, max_size, block_teams, run_seed))
+            if progress is not None:
+                progress("restarts", len(results) / restarts)
+    else:
+        blocks = []  # shared memory blocks, unlinked once every run is done
+        try:
+            specs = {}
+            for name, array in arrays.items():
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                blocks.append(block)
+                np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+                specs[name] = (block.name, array.shape, array.dtype.str)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(specs,)) as pool:
+                for result in pool.map(_run_shared, [(max_size, block_teams, run_seed) for run_seed in seeds]):
+                    results.append(result)
+                    if progress is not None:
+                        progress("restarts", len(results) / restarts)
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+    # first best wins a tie, so the deterministic run is kept unless a restart does better
+    return max(results, key=lambda result: result[0])[1]
+
+
+def _run(arrays: dict, max_size: int, block_teams: int, run_seed) -> tuple[float, list[list[int]]]:
+    """Run one greedy matching and score it."""
+    ranking = PairRanking.from_pairs(arrays["rows"], arrays["cols"], arrays["scores"])
+    rng = None if run_seed is None else np.random.default_rng(run_seed)
+    teams = match_teams(arrays["have"], arrays["want"], ranking, max_size, block_teams, rng)
+    return team_objective(arrays["have"], arrays["want"], teams), teams
+
+
+# Arrays of a worker process, views of the parent's shared memory (see _attach)
+_shared_arrays = {}
+_shared_blocks = []
+
+
+def _attach(specs: dict):
+    """Worker initializer: map the shared arrays."""
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _shared_blocks.append(block)  # keep the mapping alive
+        _shared_arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+
+
+def _run_shared(task: tuple) -> tuple[float, list[list[int]]]:
+    """Worker task: run one greedy matching on the shared arrays."""
+    return _run(_shared_arrays, *task)
@@ -1,4 +1,11 @@
 from ATA.config import CONFIG
+from ATA import instrumentation
+from ATA.encoder import DEFAULT_ENCODER, VectorEncoder, CHOICE_COLUMNS, OPTIONAL_CHOICE_COLUMNS, BITMASK_COLUMNS
+from ATA.scoring import PairRanking, candidate_pair_ranking, allocate_score_matrix, crush_score_matrix, \
+    scale_score_matrix, max_crush_score
+from ATA.store import StudentStore
+from ATA import score_cache
+from ATA.matching import GROWTH_BLOCK_TEAMS, match_teams, best_of_restarts, refine_teams, assignment_quality
 import numpy as np
 import math
 
@@ -8,7 +15,18 @@ class Student:
     
     Each student has various attributes (skill level, ambition, role, etc.) that are
     converted into vector representations for matching with other students.
+
+    Once the student is added to a Course, its vectors live in a row of the course's
+    StudentStore and vector_have / vector_want are views of that row. A student that
+    is not in a store computes its vectors on first use.
     """
+    __slots__ = ("team_id", "first_name", "email", "skill_level", "ambition", "role", "teamwork_style",
+                 "pace", "backgrounds", "backgrounds_preference", "hobbies", "project_summary",
+                 "_store", "_row", "_vectors")
+
+    # attributes kept when pickling, the vectors are rebuilt from them
+    _FIELDS = __slots__[:12]
+
     def __init__(self,
                  first_name: str,
                  email: str,
@@ -51,10 +69,112 @@ class Student:
         self.backgrounds_preference = backgrounds_preference
         self.hobbies = hobbies
         self.project_summary = project_summary
-        self.vector_have, self.vector_want = self.construct_vector()
+        self._store, self._row = None, None  # StudentStore and row, set when added to a course
+        self._vectors = None  # own (vector_have, vector_want) while not in a store
 
-    def get_json(self):
-        return {
+    def __getstate__(self):
+        """Pickle only the attributes, the vectors are rebuilt on demand."""
+        return {name: getattr(self, name) for name in self._FIELDS}
+
+    def __setstate__(self, state: dict):
+        """Restore a pickled student.
+
+        Args:
+            state: Pickled attribute dictionary (older pickles also contain the vectors, which are ignored).
+        """
+        if isinstance(state, tuple):  # (dict state, slots state) of the default slots pickling
+            state = {**(state[0] or {}), **state[1]}
+        for name in self._FIELDS:
+            setattr(self, name, state.get(name))
+        self._store, self._row, self._vectors = None, None, None
+
+    @property
+    def vector_have(self) -> np.ndarray:
+        """Vector describing this student's attributes."""
+        if self._store is not None:
+            return self._store.have[self._row]
+        return self.__own_vectors()[0]
+
+    @property
+    def vector_want(self) -> np.ndarray:
+        """Vector describing what this student wants from teammates."""
+        if self._store is not None:
+            return self._store.want[self._row]
+        return self.__own_vectors()[1]
+
+    def __own_vectors(self) -> tuple[np.ndarray, np.ndarray]:
+        """Construct the vectors once for a student that is not in a store."""
+        if self._vectors is None:
+            self._vectors = self.construct_vector()
+        return self._vectors
+
+    def _bind(self, store: StudentStore, row: int):
+        """Read the vectors from a store row from now on.
+
+        Args:
+            store: StudentStore holding the student.
+            row: Row of the student in the store.
+        """
+        self._store, self._row, self._vectors = store, row, None
+
+    def _detach(self):
+        """Stop reading from the store, keeping a copy of the current vectors."""
+        if self._store is not None:
+            self._vectors = (self.vector_have.copy(), self.vector_want.copy())
+            self._store, self._row = None, None
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Student":
+        """Create a student from submitted data, the same shape as get_json without team_id.
+
+        Args:
+            data: Dictionary of student attributes, choices given as indices.
+
+        Returns:
+            Student object.
+
+        Raises:
+            ValueError: If data is not a dictionary, an attribute is missing, a required choice
+                        is None or a choice index is out of range.
+        """
+        def choices(name: str) -> range:
+            return range(2) if name == "backgrounds_preference" else range(len(CONFIG[name]["choices"]))
+
+        def valid(value, values) -> bool:
+            return isinstance(value, int) and not isinstance(value, bool) and value in values
+
+        if not isinstance(data, dict):
+            raise ValueError(f"Invalid student data: expected an object, got {type(data).__name__}")
+        try:
+            fields = {name: data[name] for name in cls._FIELDS[1:]}
+        except KeyError as error:
+            raise ValueError(f"Missing student attribute {error}")
+        for name in ("first_name", "email", "project_summary"):
+            if not isinstance(fields[name], str):
+                raise ValueError(f"Invalid {name}: {fields[name]!r}")
+        if not fields["email"]:
+            raise ValueError("Invalid email: ''")
+        for name in CHOICE_COLUMNS:
+            if fields[name] is None and name in OPTIONAL_CHOICE_COLUMNS:
+                continue  # no preference
+            if not valid(fields[name], choices(name)):
+                raise ValueError(f"Invalid {name}: {fields[name]!r}")
+        for name in BITMASK_COLUMNS:
+            if not isinstance(fields[name], list) or not all(valid(value, choices(name)) for value in fields[name]):
+                raise ValueError(f"Invalid {name}: {fields[name]!r}")
+            fields[name] = set(fields[name])
+        return cls(**fields)
+
+    def get_json(self, vectors: bool = False):
+        """Convert student data to a JSON-serializable dictionary, the record read by from_json.
+
+        Args:
+            vectors: Whether to include vector_have and vector_want, as lists.
+
+        Returns:
+            Dictionary of the student's attributes, choices given as indices.
+        """
+        data = {
             "team_id": self.team_id,
             "first_name": self.first_name,
             "email": self.email,
@@ -68,6 +188,10 @@ class Student:
             "hobbies": list(self.hobbies),
             "project_summary": self.project_summary
         }
+        if vectors:
+            data["vector_have"] = self.vector_have.tolist()
+            data["vector_want"] = self.vector_want.tolist()
+        return data
 
 
     def construct_vector(self) -> tuple[np.ndarray, np.ndarray]:
@@ -91,108 +215,9 @@ class Student:
             Tuple of (vector_have, vector_want) as numpy arrays.
         """
 
-        vector_have = np.array([])  # init a vector describe this student's property
-        vector_want = np.array([])  # init a vector describe what we want from this student
-
-        # to handle skill level
-        # handling skill level, we need to consider the diversity of skill level.
-        # best case: 1 pro 1 ok 1 noob
-        l_skill_level = len(CONFIG["skill_level"]["choices"])  # cardinality of skill level
-        w_skill_level = CONFIG["skill_level"]["weight"] / math.sqrt(l_skill_level)  # weight of skill level, normalized
-        vector = np.zeros(l_skill_level)  # init a vector with all 0
-        vector[self.skill_level] = w_skill_level  # apply value to the index of skill level
-        vector_have = np.concatenate((vector_have, vector))  # append to vector_have
-        vector_want = np.concatenate((vector_want,
-                                      w_skill_level - vector))  # append to vector_want, swap 1 and 0 because that we want diversity of skill level
-
-        # to handle ambition,
-        # ambition should match, just_pass matches just_pass, normal matches normal, ambitious matches ambitious
-        l_ambition = len(CONFIG["ambition"]["choices"])  # cardinality of ambition choice
-        w_ambition = CONFIG["ambition"]["weight"] / math.sqrt(l_ambition)  # weight of ambition, normalized
-        vector = np.zeros(l_ambition)  # init a vector with all 0
-        if self.ambition is not None:  # if ambition has value, meaning NOT no preference
-            vector[self.ambition] = w_ambition  # apply value to the index of ambition
-            vector_want = np.concatenate((vector_want, vector))  # append to vector_want
-        else:  # if ambition is None, meaning no preference
-            vector_want = np.concatenate((vector_want,
-                                          w_ambition - vector))  # when no preference, we assume the student wants any kind. so all values are True
-        vector_have = np.concatenate((vector_have, vector))  # append to vector_have
-
-        # handle role
-        # we want diversity of role
-        # and here we allow students to choose "no preference"
-        # when student choose "no preference", then the property of student is [0, 0]
-        # but also assume the student want any kind, so the want vector is [1, 1]
-        l_role = len(CONFIG["role"]["choices"])
-        w_role = CONFIG["role"]["weight"] / math.sqrt(l_role)
-        vector = np.zeros(l_role)
-        if self.role is not None:  # if role has value, meaning NOT no preference
-            vector[self.role] = w_role  # apply value to the index of role
-        vector_have = np.concatenate((vector_have, vector))  # append to vector_have
-        vector_want = np.concatenate((vector_want, w_role - vector))  # append to vector_want
-        # NOTE: when has preference, we set student like [1,0] or [0,1], and the want vector is reversed type [0,1] or [1,0]
-        #       when no preference, we assume the student wants any kind. so have is [0, 0] and want is [1, 1]
-
-        # handle teamwork style
-        # similar to the ambition, we want their style match within team
-        l_teamwork_style = len(CONFIG["teamwork_style"]["choices"])
-        w_teamwork_style = CONFIG["teamwork_style"]["weight"] / math.sqrt(l_teamwork_style)
-        vector = np.zeros(l_teamwork_style)
-        if self.teamwork_style is not None:
-            vector[self.teamwork_style] = w_teamwork_style
-            vector_want = np.concatenate((vector_want, vector))
-        else:
-            vector_want = np.concatenate((vector_want, w_teamwork_style - vector))
-        vector_have = np.concatenate((vector_have, vector))
-
-        # handle pace preference
-        # similar to teamwork style, we want their pace match within team
-        l_pace = len(CONFIG["pace"]["choices"])
-        w_pace = CONFIG["pace"]["weight"] / math.sqrt(l_pace)
-        vector = np.zeros(l_pace)
-        if self.pace is not None:
-            vector[self.pace] = w_pace
-            vector_want = np.concatenate((vector_want, vector))
-        else:
-            vector_want = np.concatenate((vector_want, w_pace - vector))
-        vector_have = np.concatenate((vector_have, vector))
-
-        # handle backgrounds
-        # backgrounds should match
-        # notice, the backgrounds are in a list, so we need a forloop to handle
-        # in addition, we allowed student to choose if they want different backgrounds or same backgrounds
-        l_backgrounds = len(CONFIG["backgrounds"]["choices"])
-        w_backgrounds = CONFIG["backgrounds"]["weight"] / math.sqrt(l_backgrounds)
-        vector = np.zeros(l_backgrounds)
-        if self.backgrounds:  # the student choose backgrounds
-            for background in self.backgrounds:  # use the forloop to handle applying value to the index of backgrounds
-                vector[background] = w_backgrounds
-            if self.backgrounds_preference == 1:  # 1=different, means the student want different backgrounds
-                vector_want = np.concatenate((vector_want, w_backgrounds - vector))  # swap 1 and 0
-            else:  # 0=same, means the student want the same backgrounds
-                vector_want = np.concatenate((vector_want, vector))  # apply same as the student's property
-        else:  # the student choose no backgrounds
-            vector_want = np.concatenate((vector_want,
-                                          w_backgrounds - vector))  # when no preference, we assume the student wants any kind. so all values are 1
-        vector_have = np.concatenate((vector_have, vector))  # append to vector_have
-
-        # handle hobby
-        # similar to backgrounds, we want their hobby match
-        # and hobbies are in a list, so we need a forloop to handle
-        # students are allowed to choose no hobbies, so we need to handle that case
-        # however, we directly assume students want same hobby.
-        l_hobbies = len(CONFIG["hobbies"]["choices"])
-        w_hobbies = CONFIG["hobbies"]["weight"] / math.sqrt(l_hobbies)
-        vector = np.zeros(l_hobbies)
-        if self.hobbies:
-            for hobby in self.hobbies:
-                vector[hobby] = w_hobbies
-            vector_want = np.concatenate((vector_want, vector))
-        else:
-            vector_want = np.concatenate((vector_want, w_hobbies - vector))
-        vector_have = np.concatenate((vector_have, vector))
-
-        return vector_have, vector_want  # return
+        # the block layout is compiled from CONFIG once, see ATA.encoder
+        have, want = DEFAULT_ENCODER.encode([self])  # a batch of one student
+        return have[0], want[0]
 
 
 class Team:
@@ -230,21 +255,29 @@ class Team:
         self.mutual_crush_score_with_rest_of_students(self.students)
         self.AI_suggestion = ""  # placeholder for future AI-generated team suggestions
 
-    def get_json(self):
+    def get_json(self, vectors: bool = False):
         """Convert team data to JSON-serializable dictionary.
-        
+
+        The scores against the rest of the students are working state of the matching
+        and are not exported.
+
+        Args:
+            vectors: Whether to include the team's and its students' vectors, as lists.
+
         Returns:
-            Dictionary containing team ID, students, vectors, and scores.
+            Dictionary containing team ID, size, students and AI suggestion, and the
+            team vectors if requested.
         """
-        return {
+        data = {
             "team_id": self.team_id,  # team identifier
-            "students": [student.get_json() for student in self.students],  # list of student dictionaries
-            "vector_have": self.vector_have.tolist(),  # convert numpy array to list for JSON
-            "vector_want": self.vector_want.tolist(),  # convert numpy array to list for JSON
-            "score_matrix_with_rest_of_students": self.score_matrix_with_rest_of_students.tolist(),  # compatibility scores matrix
-            "list_mutual_crush_score_with_rest_of_students": self.list_mutual_crush_score_with_rest_of_students,  # sorted list of (student, score) tuples
+            "size": len(self.students),
+            "students": [student.get_json(vectors) for student in self.students],  # list of student dictionaries
             "AI_suggestion": self.AI_suggestion  # AI-generated team analysis
         }
+        if vectors:
+            data["vector_have"] = self.vector_have.tolist()  # convert numpy array to list for JSON
+            data["vector_want"] = self.vector_want.tolist()
+        return data
 
     def add_student(self, student: Student):
         """Add a student to the team.
@@ -267,6 +300,22 @@ class Team:
         # pass current students list (will filter internally)
         self.mutual_crush_score_with_rest_of_students(self.students)  # recalculate the mutual crush score
 
+    def replace_student(self, old_student: Student, new_student: Student):
+        """Replace a student of the team by an updated version of the same student.
+
+        Args:
+            old_student: Student object currently in the team.
+            new_student: Student object taking its place.
+        """
+        if old_student in self.students:
+            self.students[self.students.index(old_student)] = new_student  # keep the position in the team
+        else:
+            self.students.append(new_student)
+        new_student.team_id = self.team_id
+
+        # Recalculate team vectors since team composition changed
+        self.__generate_have_want()
+
     def __generate_have_want(self):
         """Generate aggregate have and want vectors for the team.
         
@@ -285,7 +334,7 @@ class Team:
             self.vector_have = np.add.reduce(list_of_have) / len(list_of_have)  # average have vector
             
             # Calculate average want vector (sum all vectors and divide by count)
-            self.want = np.add.reduce(list_of_want) / len(list_of_want)  # average want vector
+            self.vector_want = np.add.reduce(list_of_want) / len(list_of_want)  # average want vector
         else:  # handle the case when there is no student in the team
             # If team is empty, set vectors to empty arrays
             self.vector_have = np.array([])  # set have vector to be empty
@@ -313,7 +362,7 @@ class Team:
             score_be_like = np.dot(self.vector_have, student.vector_want)  # team attributes match student's preferences
             
             # Calculate how well this student matches what the team wants
-            score_like = np.dot(self.want, student.vector_have)  # student attributes match team's preferences
+            score_like = np.dot(self.vector_want, student.vector_have)  # student attributes match team's preferences
             
             # Final score is average of both directions (mutual compatibility)
             score = (score_be_like + score_like) / 2
@@ -330,7 +379,35 @@ class Course:
     
     The Course class handles student management, team formation, and matching algorithms.
     It maintains data structures for efficient team matching calculations.
+
+    Student vectors are kept in a StudentStore (preallocated float64 rows that grow by
+    doubling), and row i belongs to self.students[i]. The matching state (score matrix
+    and pair ranking) is derived from them lazily: mutations only mark it stale, and it
+    is built once by prepare(), which team_matching calls. When only a few students
+    changed, prepare() rescores just their rows and columns. Derived state is not pickled.
     """
+
+    # prepare() rescores only the changed students while they are fewer than this
+    # fraction of the course, otherwise the whole score matrix is recalculated
+    INCREMENTAL_RESCORE_FRACTION = 0.25
+
+    # number of teams whose scores against the unassigned students are computed
+    # in one matrix multiplication during the team growth phase
+    GROWTH_BLOCK_TEAMS = GROWTH_BLOCK_TEAMS
+
+    # number of score matrix rows computed at once, bounds the temporaries of prepare()
+    SCORE_BLOCK_ROWS = 1024
+
+    # directory of the file backing the score matrix as a np.memmap, None to keep it in memory
+    SCORE_MATRIX_DIR = None
+
+    # directory of the score matrix cache (see score_cache), None to always compute the matrix
+    SCORE_CACHE_DIR = None
+
+    # attributes rebuilt from self.students and self.teams, never pickled
+    _DERIVED_STATE = ("_store", "_score_buffer", "_max_score",
+                      "_pair_ranking", "_dirty_slots", "_scores_valid", "_prepared",
+                      "_slot_by_email", "_team_by_id", "_unassigned_slots")
     
     def __init__(self, students: list[Student]):
         """Initialize a Course instance.
@@ -341,15 +418,93 @@ class Course:
         # Initialize empty data structures
         self.students = []  # list of all Student objects in the course
         self.teams = []  # list of all Team objects formed
-        self.array_of_have, self.array_of_want = np.array([]), np.array([])  # numpy arrays for efficient matrix operations
-        self.score_matrix = np.array([])  # compatibility score matrix between all students
-        self.mutual_crush_score_list = []  # list of (student1, student2, score) tuples for all pairs
-        self.student_not_in_team = []  # pool of students not yet assigned to any team
+        self._slot_by_email = {}  # email -> index of the student in self.students
+        self._team_by_id = {}  # team_id -> Team object
+        self._unassigned_slots = set()  # indices of students not yet assigned to any team
+        self.matching_generation = 0  # bumped whenever a change can alter a student's team result
+        self.__reset_derived_state()  # empty buffers and matching state
         
         # Add initial students if provided
         if students:
             self.add_students(students)
 
+    def __getstate__(self):
+        """Pickle only the students and teams, indexes and matching state are rebuilt on load."""
+        state = self.__dict__.copy()
+        for key in self._DERIVED_STATE:
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state: dict):
+        """Restore a pickled course, rebuild the indexes and the student store.
+
+        Args:
+            state: Pickled attribute dictionary.
+        """
+        # courses pickled by older versions stored the matrices and pool as plain attributes
+        for key in ("array_of_have", "array_of_want", "score_matrix", "mutual_crush_score_list",
+                    "pair_ranking", "student_not_in_team"):
+            state.pop(key, None)
+        state.setdefault("matching_generation", 0)
+        self.__dict__.update(state)
+        self.__rebuild_indexes()
+        self.__reset_derived_state()
+        self._store.extend(self.students)  # encode every vector in one batch
+        self._dirty_slots = set(range(len(self.students)))
+
+    def __rebuild_indexes(self):
+        """Rebuild the email, team_id and not-in-team indexes from students and teams.
+
+        Older courses could hold several students with the same email, only the last one is kept.
+        """
+        latest = {student.email: student for student in self.students}  # last submission wins
+        self.students = [student for student in self.students if latest[student.email] is student]
+        for team in self.teams:
+            team.students = [student for student in team.students if latest[student.email] is student]
+        self.teams = [team for team in self.teams if team.students]
+
+        self._slot_by_email = {student.email: slot for slot, student in enumerate(self.students)}
+        self._team_by_id = {team.team_id: team for team in self.teams}
+        self._unassigned_slots = {slot for slot, student in enumerate(self.students) if student.team_id is None}
+
+    def __reset_derived_state(self):
+        """Drop the store and matching state, everything is recalculated by prepare()."""
+        self._store = StudentStore()  # vectors and categorical attributes of all students, one row each
+        self._score_buffer = allocate_score_matrix(0)  # preallocated normalized score matrix, top-left n x n in use
+        self._max_score = 0.0  # largest raw score, the scores in _score_buffer are divided by it
+        self._pair_ranking = None  # PairRanking of mutual crush scores for all student pairs, by index
+        self._dirty_slots = set()  # slots whose vectors changed since the last prepare()
+        self._scores_valid = False  # whether _score_buffer is valid outside the dirty slots
+        self._prepared = False  # whether score matrix and pair ranking are up to date
+
+    @property
+    def score_matrix(self) -> np.ndarray:
+        """Normalized compatibility score matrix between all students, built on demand."""
+        self.prepare()
+        n = len(self.students)
+        return self._score_buffer[:n, :n]
+
+    @property
+    def pair_ranking(self) -> PairRanking:
+        """PairRanking of mutual crush scores for all student pairs, built on demand."""
+        self.prepare()
+        return self._pair_ranking
+
+    @property
+    def array_of_have(self) -> np.ndarray:
+        """Have vectors of all students, one row per student (view of the store)."""
+        return self._store.have
+
+    @property
+    def array_of_want(self) -> np.ndarray:
+        """Want vectors of all students, one row per student (view of the store)."""
+        return self._store.want
+
+    @property
+    def student_not_in_team(self) -> list[Student]:
+        """Students not yet assigned to any team, in course order."""
+        return [self.students[slot] for slot in sorted(self._unassigned_slots)]
+
     def get_student_by_email(self, email: str) -> Student:
         """Find a student by their email address.
         
@@ -362,12 +517,10 @@ class Course:
         Raises:
             ValueError: If no student with the given email is found.
         """
-        # Search through all students to find matching email
-        for student in self.students:
-            if student.email == email:  # email is used as unique identifier
-                return student
-        else:
+        # email is used as unique identifier, look it up in the index
+        if email not in self._slot_by_email:
             raise ValueError("Student not found")  # no student with this email exists
+        return self.students[self._slot_by_email[email]]
 
     def get_team_by_team_id(self, team_id: str) -> Team:
         """Find a team by its team ID.
@@ -381,110 +534,79 @@ class Course:
         Raises:
             ValueError: If no team with the given ID is found.
         """
-        # Search through all teams to find matching team_id
-        for team in self.teams:
-            if team.team_id == team_id:  # team_id is unique identifier
-                return team
-        else:
+        # team_id is unique identifier, look it up in the index
+        if team_id not in self._team_by_id:
             raise ValueError("Team not found")  # no team with this ID exists
+        return self._team_by_id[team_id]
 
+    @instrumentation.timed("course.add_students")
     def add_students(self, students: list[Student]):
         """Add multiple students to the course.
         
         New students are added to the students list and the not-in-team pool.
-        After adding, all arrays and score matrices are recalculated.
+        Their vectors are appended to the store and the matching state is marked stale.
+        A student whose email is already in the course replaces the existing one.
         
         Args:
             students: List of Student objects to add.
         """
-        # Add each student to the course
+        new_students = {}  # email -> new Student object, in order
         for student in students:
-            self.students.append(student)  # add student obj to the students list
-            
+            if student.email in self._slot_by_email:
+                self.update_student(student)  # email is unique, never add a duplicate
+            else:
+                new_students[student.email] = student  # a later duplicate in the batch replaces the earlier one
+
+        # Encode all new vectors in one batch, scores are calculated later by prepare()
+        first_slot = len(self.students)  # store row of the first new student
+        self._store.extend(list(new_students.values()))
+        for slot, student in enumerate(new_students.values(), first_slot):
+            self._slot_by_email[student.email] = slot
             # Add student to not-in-team pool (new students are assumed not in any team)
-            self.student_not_in_team.append(
-                student)  # add student obj to the student_not_in_team list. Assuming new students are not in team.
-        
-        # Recalculate all matrices and scores after adding new students
-        self.__generate_have_want_arrays()  # generate array_of_have and array_of_want after each time new students are added
-        self.__crush_matrix()  # calculate the score matrix after each time new students are added
-        self.__mutual_crush_score()  # calculate the mutual crush score list after each time new students are added
+            self._unassigned_slots.add(slot)
+            self.students.append(student)  # add student obj to the students list
+            self._dirty_slots.add(slot)
+        self._prepared = False
 
+    @instrumentation.timed("course.update_student")
     def update_student(self, new_student: Student):
         """Update an existing student's information by email.
         
-        If a student with the same email exists, all duplicates are removed and
-        replaced with the updated student. If no student exists, the new student
-        is added. The student's team_id is preserved if they were already in a team.
+        If a student with the same email exists, it is replaced in place by the updated
+        student. If no student exists, the new student is added. The student's team_id
+        is preserved if they were already in a team.
         
         Args:
             new_student: Student object with updated information.
         """
-        # Find all students with this email (handle duplicates)
-        # search through all students to find matches by email
-        existing_students = [s for s in self.students if s.email == new_student.email]
-        
-        if not existing_students:
+        if new_student.email not in self._slot_by_email:
             # Student doesn't exist, add as new student
             # if no match found, treat as a new student addition
             self.add_students([new_student])
             return
-        
-        # If student exists, preserve team_id from the first existing student
-        # (assuming duplicates should have the same team_id)
-        # maintain team assignment if student was already in a team
-        first_existing = existing_students[0]
-        new_student.team_id = first_existing.team_id  # preserve team assignment
-        
-        # Remove all existing students with this email (including duplicates)
-        # clean up all duplicate entries before adding the updated one
-        for existing_student in existing_students:
-            # Remove from teams if in a team
-            # if student was assigned to a team, remove them from that team
-            if existing_student.team_id is not None:
-                try:
-                    team = self.get_team_by_team_id(existing_student.team_id)  # find the team
-                    if existing_student in team.students:
-                        team.students.remove(existing_student)  # remove from team's student list
-                        # Drop empty teams
-                        # if team becomes empty after removal, delete the team
-                        if not team.students and team in self.teams:
-                            self.teams.remove(team)
-                except ValueError:
-                    pass  # team not found, continue with removal from other lists
-            
-            # Remove from main students list and not-in-team list
-            # clean up from course's main data structures
-            if existing_student in self.students:
-                self.students.remove(existing_student)  # remove from students list
-            if existing_student in self.student_not_in_team:
-                self.student_not_in_team.remove(existing_student)  # remove from not-in-team pool
-        
-        # Add the updated student
-        self.students.append(new_student)  # add updated student to course
-        
-        # Add to not_in_team list if not in a team
-        # place student in appropriate pool based on team assignment
-        if new_student.team_id is None:
-            self.student_not_in_team.append(new_student)  # add to unassigned pool
-        else:
-            # If student is in a team, add to that team
+
+        # Replace the student in its own slot, so only its row and column are rescored
+        slot = self._slot_by_email[new_student.email]
+        existing = self.students[slot]
+        new_student.team_id = existing.team_id  # preserve team assignment
+        existing._detach()  # the old object keeps a copy of its vectors
+        self.students[slot] = new_student
+
+        # encode into the store row first, so the team is updated from the course's encoder
+        # (see reencode_vectors); only this student's row and column have to be rescored
+        self.__write_vectors(slot, new_student)
+
+        if new_student.team_id is not None:
             # restore student to their team if they had one
             try:
                 team = self.get_team_by_team_id(new_student.team_id)  # find the team
-                team.students.append(new_student)  # add student back to team
-                team.__generate_have_want()  # Recalculate team vectors
+                team.replace_student(existing, new_student)  # swap in and recalculate team vectors
             except ValueError:
                 # Team not found, clear team_id and add to not_in_team
                 # if team doesn't exist, clear assignment and add to unassigned pool
                 new_student.team_id = None
-                self.student_not_in_team.append(new_student)
-        
-        # Recalculate all arrays and matrices after update
-        # refresh all compatibility scores since student data changed
-        self.__generate_have_want_arrays()  # regenerate student vector arrays
-        self.__crush_matrix()  # recalculate compatibility matrix
-        self.__mutual_crush_score()  # recalculate mutual crush scores
+                self._unassigned_slots.add(slot)
+            self.matching_generation += 1  # the team's result shows the student's new data
 
     def add_team(self, team: Team):
         """Add a team to the course.
@@ -492,8 +614,12 @@ class Course:
         Args:
             team: Team object to add.
         """
-        # Simply add the team to the teams list
+        # Add the team to the teams list and the team_id index
         self.teams.append(team)  # add team to course's teams list
+        self._team_by_id[team.team_id] = team
+        for student in team.students:
+            self._unassigned_slots.discard(self._slot_by_email[student.email])
+        self.matching_generation += 1
 
     def add_student_to_team(self, student: Student, team: Team):
         """Add a student to a team.
@@ -508,12 +634,14 @@ class Course:
         team.add_student(student)
         
         # Remove student from not-in-team pool since they're now assigned
-        self.student_not_in_team.remove(student)  # remove student from student_not_in_team list
+        self._unassigned_slots.discard(self._slot_by_email[student.email])
+        self.matching_generation += 1
 
     def clear_team_assignments(self):
         """
         Clear all team assignments but keep all students.
         After this call, there will be no teams and all students will be considered 'not in team'.
+        Student vectors did not change, so no scores are recalculated.
         """
         # Clear team_id for every student
         # remove team assignment from all students
@@ -522,223 +650,280 @@ class Course:
 
         # Reset teams and not-in-team pool
         self.teams = []  # clear all teams
-        self.student_not_in_team = list(self.students)  # all students are now unassigned
-
-        # Recompute arrays and score matrix
-        # recalculate all compatibility scores since teams were cleared
-        if self.students:
-            self.__generate_have_want_arrays()  # regenerate student vector arrays
-            self.__crush_matrix()  # recalculate compatibility matrix
-            self.__mutual_crush_score()  # recalculate mutual crush scores
-        else:
-            # If no students, reset all arrays to empty
-            self.array_of_have = np.array([])
-            self.array_of_want = np.array([])
-            self.score_matrix = np.array([])
-            self.mutual_crush_score_list = []
+        self._team_by_id = {}
+        self._unassigned_slots = set(range(len(self.students)))  # all students are now unassigned
+        self.matching_generation += 1
 
     def remove_student_by_email(self, email: str):
-        """Completely remove all students with the given email from the course.
+        """Completely remove the student with the given email from the course.
         
-        Removes all students with matching email from students list, teams, and
-        not-in-team pool. Empty teams are automatically removed.
+        Removes the student from students list, teams, and not-in-team pool.
+        Empty teams are automatically removed.
         
         Args:
-            email: Email address of the student(s) to remove.
+            email: Email address of the student to remove.
             
         Raises:
             ValueError: If no student with the given email is found.
         """
-        # Find all students with this email (in case of duplicates)
-        # search through all students to find all matches
-        students_to_remove = [s for s in self.students if s.email == email]
-        
-        if not students_to_remove:
-            raise ValueError("Student not found")  # no students match this email
-        
-        # Remove each matching student
-        # iterate through all matches to handle duplicates
-        for student in students_to_remove:
-            # If the student is in a team, remove from that team
-            # clean up team assignment first
-            if student.team_id is not None:
-                try:
-                    team = self.get_team_by_team_id(student.team_id)  # find the team
-                    if student in team.students:
-                        team.students.remove(student)  # remove student from team
-                        # Drop empty teams
-                        # if team becomes empty, remove the team entirely
-                        if not team.students and team in self.teams:
-                            self.teams.remove(team)
-                except ValueError:
-                    # Team not found – ignore, we'll still remove the student from course lists
-                    # if team doesn't exist, continue with removal from other lists
-                    pass
-
-            # Remove from main students list and not-in-team list
-            # clean up from course's main data structures
-            if student in self.students:
-                self.students.remove(student)  # remove from students list
-            if student in self.student_not_in_team:
-                self.student_not_in_team.remove(student)  # remove from not-in-team pool
-
-        # Recompute arrays and score matrix
-        # refresh all compatibility scores after student removal
-        if self.students:
-            # If students remain, recalculate all scores
-            self.__generate_have_want_arrays()  # regenerate student vector arrays
-            self.__crush_matrix()  # recalculate compatibility matrix
-            self.__mutual_crush_score()  # recalculate mutual crush scores
+        student = self.get_student_by_email(email)  # raises ValueError if not found
+
+        # If the student is in a team, remove from that team
+        # clean up team assignment first
+        if student.team_id in self._team_by_id:
+            team = self._team_by_id[student.team_id]  # find the team
+            if student in team.students:
+                team.students.remove(student)  # remove student from team
+                # Drop empty teams
+                # if team becomes empty, remove the team entirely
+                if not team.students:
+                    self.teams.remove(team)
+                    del self._team_by_id[team.team_id]
+
+        self.__remove_slot(self._slot_by_email[email])
+        self.matching_generation += 1  # a removed student has no result anymore
+
+    def __remove_slot(self, slot: int):
+        """Remove the student in the given slot from the students list, indexes and store.
+
+        The last student is moved into the freed slot, so only one row (and one
+        column of the scores) is copied. The order of self.students changes.
+
+        Args:
+            slot: Index of the student in self.students.
+        """
+        del self._slot_by_email[self.students[slot].email]
+        self._unassigned_slots.discard(slot)
+        self.students[slot]._detach()  # the removed object keeps a copy of its vectors
+
+        # Move the last student into the freed slot, then drop the last slot
+        last = len(self.students) - 1
+        if slot != last:
+            moved = self.students[last]
+            self.students[slot] = moved
+            self._slot_by_email[moved.email] = slot
+            if last in self._unassigned_slots:
+                self._unassigned_slots.discard(last)
+                self._unassigned_slots.add(slot)
+            self._store.move(last, slot, moved)
+            if last in self._dirty_slots:
+                self._dirty_slots.add(slot)  # the moved student still has to be scored
+            else:
+                self._dirty_slots.discard(slot)
+                if self._scores_valid:
+                    self.__ensure_score_capacity(last + 1)  # writable
+                    self._score_buffer[slot, :last] = self._score_buffer[last, :last]  # move the row
+                    self._score_buffer[:last, slot] = self._score_buffer[:last, last]  # move the column
+                    self._score_buffer[slot, slot] = 0  # never match with self
+        self._dirty_slots.discard(last)
+        self._store.pop()
+        self.students.pop()
+        self._prepared = False
+
+    def __write_vectors(self, slot: int, student: Student):
+        """Write a student into its store row and mark it for rescoring.
+
+        Args:
+            slot: Index of the student in self.students.
+            student: Student object to store.
+        """
+        self._store.assign(slot, student)
+        self._dirty_slots.add(slot)
+        self._prepared = False
+
+    def reencode_vectors(self, encoder: VectorEncoder = None):
+        """Rebuild every student vector from the stored attributes, e.g. after a CONFIG change.
+
+        Args:
+            encoder: Encoder compiled from the new CONFIG, the current one when None.
+        """
+        self._store.reencode(encoder)
+        self._scores_valid = False  # every score changed
+        self._prepared = False
+
+    @instrumentation.timed("course.prepare")
+    def prepare(self):
+        """Build the matching state (score matrix and pair ranking) if it is stale.
+
+        Only the students changed since the last call are rescored when they are few,
+        otherwise the whole score matrix is recalculated. Calling this again without
+        any mutation in between does nothing.
+        """
+        if self._prepared:
+            return
+        n = len(self.students)
+
+        incremental = (self._scores_valid and self._max_score > 0
+                       and len(self._dirty_slots) < self.INCREMENTAL_RESCORE_FRACTION * n)
+        if incremental:
+            self.__ensure_score_capacity(n)
+            self.__update_scores(np.array(sorted(self._dirty_slots), dtype=int))
         else:
-            # If no students remain, reset all arrays to empty
-            self.array_of_have = np.array([])
-            self.array_of_want = np.array([])
-            self.score_matrix = np.array([])
-            self.mutual_crush_score_list = []
+            # too many changes, recalculate everything
+            self.__crush_matrix()
+        self._dirty_slots.clear()
+        self._scores_valid = True
 
-    def __generate_have_want_arrays(self):
-        """Generate arrays of have and want vectors for all students.
-        
-        Creates numpy arrays where each row represents a student's vector.
-        Used for efficient matrix operations in score calculations.
+        self.__mutual_crush_score()  # rank the pairs
+        self._prepared = True
+
+    def __ensure_score_capacity(self, n: int):
+        """Grow the score buffer so it can hold n students, keeping the valid scores.
+
+        The buffer is also copied if it is read-only (opened from the score cache).
+
+        Args:
+            n: Number of students the buffer must hold.
         """
-        # Build arrays where each row is a student's vector
-        # this allows efficient matrix operations for score calculations
-        array_have = []  # temporary list to collect have vectors
-        array_want = []  # temporary list to collect want vectors
-        
-        # Collect each student's vectors into lists
-        for student in self.students:
-            array_have.append(student.vector_have)  # add student's have vector
-            array_want.append(student.vector_want)  # add student's want vector
-        
-        # Convert lists to numpy arrays for matrix operations
-        self.array_of_have, self.array_of_want = np.array(array_have), np.array(array_want)
+        capacity = self._score_buffer.shape[0]
+        if n <= capacity and self._score_buffer.flags.writeable:
+            return
+        # grow, or copy a read-only matrix opened from the score cache before changing it
+        new_capacity = max(n, 2 * capacity) if n > capacity else capacity
+        score_buffer = allocate_score_matrix(new_capacity, self.SCORE_MATRIX_DIR)
+        score_buffer[:capacity, :capacity] = self._score_buffer
+        self._score_buffer = score_buffer
+
+    @instrumentation.timed("course.update_scores")
+    def __update_scores(self, slots: np.ndarray):
+        """Rescore the given students against everyone and renormalize.
 
+        Only the rows and columns of the given slots are computed, so the cost is
+        O(k * n * d) for k changed students instead of O(n^2 * d). The new scores are
+        written in units of the current max, and the whole matrix is rescaled in place
+        only if the largest score changed.
+
+        Args:
+            slots: Buffer rows of the students whose vectors changed.
+        """
+        n = len(self.students)
+        scores = self._score_buffer[:n, :n]
+        if len(slots) > 0:
+            have, want = self.array_of_have, self.array_of_want
+            # score_matrix[i, j] = how much i matches what j wants
+            scores[slots, :] = have[slots] @ want.T / self._max_score  # rows: changed students vs everyone
+            scores[:, slots] = have @ want[slots].T / self._max_score  # columns: everyone vs changed students
+            scores[slots, slots] = 0  # never match with self
+
+        # a changed or removed student may have held the largest score
+        max_score = float(scores.max()) if n else 0.0
+        if max_score > 0 and max_score != 1:
+            scale_score_matrix(scores, max_score, self.SCORE_BLOCK_ROWS)
+            self._max_score *= max_score
+
+    @instrumentation.timed("course.crush_matrix")
     def __crush_matrix(self):
-        """Calculate the compatibility score matrix between all students.
+        """Calculate the normalized compatibility score matrix between all students.
         
         The score matrix represents one-way compatibility: how much student A
-        matches what student B wants. The matrix is normalized and diagonal is set
-        to 0 (students don't match with themselves).
-        """
-        # Calculate compatibility score matrix using matrix multiplication
-        # @ operator performs matrix multiplication (dot product for each pair)
-        # .T transposes array_of_want so we get all pairwise combinations
-        score_matrix = self.array_of_have @ self.array_of_want.T
-        # AI prompt:
-        # I asked how to calculate the dot product of two vectors, AI suggests "@"
-        # Also asked why the second argument needs ".T"
-
-        # Set diagonal to 0 (students don't match with themselves)
-        np.fill_diagonal(score_matrix, 0)  # never match with self
+        matches what student B wants, normalized to [0, 1] by the largest score.
+        Diagonal is 0 (students don't match with themselves). The matrix is written
+        into the preallocated buffer one block of rows at a time (see
+        crush_score_matrix), so no n x n temporary is allocated.
 
-        # Normalize scores to range [0, 1] for easier comparison
-        max_score = score_matrix.max()  # normalize the value, find the largest value first
-        if max_score > 0:
-            score_matrix = score_matrix / max_score  # normalize each value
+        With a SCORE_CACHE_DIR, a matrix cached for the same vectors is opened
+        memory-mapped instead, and a computed matrix is added to the cache.
+        """
+        n = len(self.students)
+        key = None
+        if self.SCORE_CACHE_DIR is not None and n:
+            key = score_cache.fingerprint(self.array_of_have, self.array_of_want, self._store.encoder)
+            cached = score_cache.load(self.SCORE_CACHE_DIR, key)
+            if cached is not None:
+                self._score_buffer, self._max_score = cached  # read-only, copied before any change
+                return
 
-        self.score_matrix = score_matrix  # store the normalized score matrix
+        if self._score_buffer.shape[0] < n or not self._score_buffer.flags.writeable:
+            self._score_buffer = allocate_score_matrix(n, self.SCORE_MATRIX_DIR)
+        self._max_score = crush_score_matrix(self.array_of_have, self.array_of_want, self._score_buffer,
+                                             self.SCORE_BLOCK_ROWS)
+        if key is not None:
+            score_cache.save(self.SCORE_CACHE_DIR, key, self._score_buffer[:n, :n], self._max_score)
 
+    @instrumentation.timed("course.pair_ranking")
     def __mutual_crush_score(self):
         """Calculate mutual compatibility scores for all student pairs.
         
-        For each pair of students, calculates the average of their bidirectional
-        compatibility scores. Results are stored in mutual_crush_score_list,
-        sorted by score (lowest to highest).
+        For each pair of students, the mutual score is the average of their bidirectional
+        compatibility scores. The scores are kept as flat numpy arrays indexed by student
+        position in self.students (see PairRanking), and ranked lazily when matching.
         """
-        # Calculate mutual compatibility score for each unique pair of students
-        n = self.score_matrix.shape[0]  # number of students
-        mutual_crush_score_list = []  # list to store (student1, student2, score) tuples
-        
-        # Iterate through all unique pairs (avoid duplicates and self-pairs)
-        # here is the typical 2-forloop
-        for i in range(n):
-            for j in range(i + 1, n):  # j starts from i+1 to avoid duplicates
-                # Mutual score is average of bidirectional compatibility
-                # score_matrix[i, j] = how much i matches what j wants
-                # score_matrix[j, i] = how much j matches what i wants
-                mutual_score = (self.score_matrix[i, j] + self.score_matrix[j, i]) / 2
-                mutual_crush_score_list.append(
-                    (self.students[i], self.students[j], mutual_score))
-        
-        # Sort by score (lowest to highest) so best matches are at the end
-        # sort based on the score, we need to find the largest score, make it as team's core first
-        mutual_crush_score_list.sort(key=lambda x: x[2])  # sort by score (third element)
-        self.mutual_crush_score_list = mutual_crush_score_list
+        # (S + S.T) / 2 on the upper triangle gives every unique pair exactly once
+        n = len(self.students)
+        self._pair_ranking = PairRanking(self._score_buffer[:n, :n], self.SCORE_BLOCK_ROWS)
 
-    def team_matching(self, max_size: int = 3):
+    @instrumentation.timed("course.team_matching")
+    def team_matching(self, max_size: int = 3, candidates: int = None, restarts: int = 1,
+                      workers: int = None, seed: int = None, refine_ms: float = None, progress=None):
         """Run the team matching algorithm to form teams.
         
         The algorithm works in multiple rounds:
         1. Reset all team assignments and recalculate scores
         2. First round: Form team cores (pairs) based on highest mutual crush scores
         3. Subsequent rounds: Add remaining students to teams based on team-student compatibility
+
+        For large cohorts, candidates limits the first round to the pairs of every student
+        with its best partners (see candidate_pair_ranking), so the n x n score matrix is
+        never built and memory stays O(n * candidates). The growth rounds are the same.
+
+        With restarts > 1, the greedy is also run restarts - 1 times with slightly perturbed
+        scores, in up to workers processes, and the assignment with the best team objective
+        (see matching.team_objective) is kept. The plain greedy result is one of the candidates,
+        so restarts never make the result worse.
+
+        With refine_ms, the chosen assignment is then improved by swapping students between
+        teams and moving them (see matching.refine_teams) for at most refine_ms milliseconds.
         
         Args:
             max_size: Maximum number of students per team.
+            candidates: Number of best partners considered per student when forming the
+                        team cores, None for every pair (exact). Fewer is faster.
+            restarts: Number of greedy runs, 1 for the deterministic greedy only.
+            workers: Number of worker processes for the restarts, None to run them in this process.
+            seed: Seed of the perturbed restarts, None for a random one.
+            refine_ms: Time budget of the local search refinement in milliseconds, None to skip it.
+            progress: Called as progress(phase, fraction done) with phase "scoring", then "seeding"
+                      and "growth" (or "restarts"), then "refinement", e.g. to report a matching job.
             
         Raises:
-            ValueError: If there are no students to match, or if number of groups
-                        exceeds number of students.
+            ValueError: If there are no students to match, if number of groups
+                        exceeds number of students, or if restarts is smaller than 1.
         """
         if len(self.students) == 0:
             raise ValueError("No students to match")
+        if restarts < 1:
+            raise ValueError("restarts must be at least 1")
 
         # Always recompute from scratch:
         # 1) clear existing team assignments
         # 2) treat all students as not-in-team
-        for student in self.students:
-            student.team_id = None
-        self.teams = []
-        self.student_not_in_team = list(self.students)
+        self.clear_team_assignments()
 
-        # Recompute arrays and mutual crush scores for the full student set
-        self.__generate_have_want_arrays()
-        self.__crush_matrix()
-        self.__mutual_crush_score()
+        if progress is not None:
+            progress("scoring", 0.0)
+        if candidates is None:
+            # Build the matching state once, only if students changed since the last run
+            ranking = self.pair_ranking
+        else:
+            # Sparse candidate pairs, straight from the vectors
+            ranking = candidate_pair_ranking(self.array_of_have, self.array_of_want, candidates)
 
         num_of_group = math.ceil(len(self.students) / max_size)
         if num_of_group > len(self.students):  # handle the case when number of group is larger than number of students
             raise ValueError("Number of group is larger than number of students")
 
-        # First round of matching, just match two students a team at a time as team's core
-        k = 0  # init a counter
-        while k < num_of_group:  # while there are still teams left to be formed
-            if len(self.student_not_in_team) + len(self.teams) == num_of_group:
-                # meaning we have enough teams, however there are still single students left.
-                # it is because number of teams is smaller than 2x number of students.
-                # so there are partial students formed team, the rest students form as a team as single
-                while self.student_not_in_team:
-                    student = self.student_not_in_team.pop()
-                    self.teams.append(Team(str(len(self.teams) + 1), [student]))
-                break
-
-            # current team is a two-student pair
-            current_team = self.mutual_crush_score_list.pop()
-            # if both students are not in team, then add them to the team.
-            # else, start the next round of matching.
-            if current_team[0] in self.student_not_in_team and current_team[1] in self.student_not_in_team:
-                self.student_not_in_team.remove(current_team[0])
-                self.student_not_in_team.remove(current_team[1])
-                self.teams.append(Team(str(len(self.teams) + 1), [current_team[0], current_team[1]]))
-                k += 1
-
-        # rest rounds of matching, by forloop each team.
-        # the algorithm is to find best matching student for each team, then add the student to the team.
-        while self.student_not_in_team:  # until all students are matched
-            for team in self.teams:  # roll through each team
-                if not self.student_not_in_team:  # if there is no student left to be matched, then break the forloop, in case not in team students drain out during one round of matching
-                    break
-                team.mutual_crush_score_with_rest_of_students(self.student_not_in_team)  # recalculate the mutual crush score with the rest of students
-                like_list = team.list_mutual_crush_score_with_rest_of_students[:]  # copy the list
-                if like_list:  # if there is at least one student left to be matched, then add the student to the team
-                    most_matching_student = like_list.pop()[0]  # get the student with the highest mutual crush score. [0] is the student obj, [1] is the score. We only need the student obj.
-                    while like_list and most_matching_student not in self.student_not_in_team:  # until all students are matched, keep popping the student with the highest score. Also make sure the student is not in team.
-                        most_matching_student = like_list.pop()[0]  # get the student with the highest mutual crush score. This loop will run until we find a student who is not in team.
-                    if most_matching_student in self.student_not_in_team:  # if we find a student who is not in team, then add the student to the team
-                        team.add_student(most_matching_student)
-                        self.student_not_in_team.remove(most_matching_student)
+        have, want = self.array_of_have, self.array_of_want
+        with instrumentation.span("course.team_matching.greedy"):
+            if restarts == 1:
+                teams = match_teams(have, want, ranking, max_size, self.GROWTH_BLOCK_TEAMS, progress=progress)
+            else:
+                teams = best_of_restarts(have, want, ranking, max_size, restarts, workers, seed,
+                                         self.GROWTH_BLOCK_TEAMS, progress)
+        if refine_ms:
+            with instrumentation.span("course.team_matching.refine"):
+                teams = refine_teams(have, want, teams, max_size, refine_ms, progress=progress)
+        for members in teams:
+            self.add_team(Team(str(len(self.teams) + 1), [self.students[slot] for slot in members]))
 
         # Ensure all students have team_id set (in case of any missed assignments)
         for team in self.teams:
@@ -746,6 +931,98 @@ class Course:
                 if student.team_id != team.team_id:
                     student.team_id = team.team_id
 
+    @instrumentation.timed("course.evaluate_assignment")
+    def evaluate_assignment(self) -> dict:
+        """Measure the quality of the current team assignment.
+
+        A team's cohesion is measured on the mutual scores of its pairs of members,
+        normalized like the score matrix: their mean and the worst pair. Only the
+        intra-team pairs are scored, all teams in one vectorized pass (see
+        matching.assignment_quality), so the score matrix and pair ranking are not built.
+
+        Returns:
+            Quality report, see quality_report.
+        """
+        return self.quality_report(self.assignment_snapshot())
+
+    def assignment_snapshot(self) -> dict:
+        """Copy the current team assignment and student vectors, for quality_report.
+
+        The snapshot doesn't share anything with the course, so the report can be computed
+        in another thread while the course keeps changing.
+
+        Returns:
+            Dictionary with "team_ids" and "teams" (the student indices of every team), the
+            "emails", "have" and "want" vectors of the students by index, "max_score" (the
+            normalization factor of the last prepare() if still current, None otherwise) and
+            the number of "unassigned" students.
+        """
+        return {
+            "team_ids": [team.team_id for team in self.teams],
+            "teams": [[self._slot_by_email[student.email] for student in team.students] for team in self.teams],
+            "emails": [student.email for student in self.students],
+            "have": self.array_of_have.copy(),
+            "want": self.array_of_want.copy(),
+            "max_score": self._max_score if self._prepared else None,
+            "unassigned": len(self._unassigned_slots),
+        }
+
+    @classmethod
+    def quality_report(cls, snapshot: dict) -> dict:
+        """Measure the quality of a team assignment copied by assignment_snapshot.
+
+        The normalization factor is reused from the snapshot if it has one, otherwise it
+        is found one block of rows at a time.
+
+        Args:
+            snapshot: Team assignment and student vectors, see assignment_snapshot.
+
+        Returns:
+            Dictionary with "teams", one entry per team (team_id, size, mean_score,
+            worst_pair_score and worst_pair emails, scores None for a team of one), and
+            "summary", the aggregates over all teams: number of teams, students and
+            unassigned students, overall mean pair score, mean and lowest team mean,
+            worst pair score, and the smallest, largest and standard deviation of the sizes.
+        """
+        have, want, emails = snapshot["have"], snapshot["want"], snapshot["emails"]
+        max_score = snapshot["max_score"]
+        if max_score is None:
+            max_score = max_crush_score(have, want, cls.SCORE_BLOCK_ROWS)
+        quality = assignment_quality(have, want, snapshot["teams"], max_score)
+
+        def number(value) -> float:
+            return None if np.isnan(value) else round(float(value), 6)  # NaN is not valid JSON
+
+        sizes, means = quality["sizes"], quality["mean"]
+        has_pairs = quality["pairs"] > 0
+        summary = {
+            "teams": len(sizes),
+            "students": len(emails),
+            "unassigned": snapshot["unassigned"],
+            "pairs": int(quality["pairs"].sum()),
+            "mean_pair_score": number(quality["scores"].mean()) if len(quality["scores"]) else None,
+            "mean_team_score": number(means[has_pairs].mean()) if has_pairs.any() else None,
+            "min_team_score": number(means[has_pairs].min()) if has_pairs.any() else None,
+            "worst_pair_score": number(quality["worst"][has_pairs].min()) if has_pairs.any() else None,
+            "min_size": int(sizes.min()) if len(sizes) else 0,
+            "max_size": int(sizes.max()) if len(sizes) else 0,
+            "size_std": number(sizes.std()) if len(sizes) else 0.0,
+        }
+        return {
+            "teams": [
+                {
+                    "team_id": team_id,
+                    "size": int(size),
+                    "mean_score": number(mean),
+                    "worst_pair_score": number(worst),
+                    "worst_pair": [emails[slot] for slot in pair] if pair[0] >= 0 else [],
+                }
+                for team_id, size, mean, worst, pair in zip(snapshot["team_ids"], sizes, means, quality["worst"],
+                                                            quality["worst_pair"])
+            ],
+            "summary": summary,
+        }
+
     def print_result(self):
         """Print team matching results to console.
         
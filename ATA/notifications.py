@@ -0,0 +1,105 @@
+"""Notifications of team results to waiting students.
+
+Instead of polling /check_status, a student's page subscribes to its email and
+is told once the student has a team. A subscription is a future in a dict keyed
+by email, so it costs no database access while waiting. When a new team
+assignment reaches the course in memory (a matching job committed, or a reload
+after the CLI saved new teams), every subscription is resolved in one pass.
+
+While anyone is subscribed, a single watcher task per course checks the
+database generation, so teams saved by another process are noticed without any
+request coming in.
+"""
+
+import asyncio
+
+from ATA import instrumentation
+from ATA.models import Course
+
+
+class ResultNotifier:
+    """Per-email subscriptions to team results of one course."""
+
+    # Seconds between two checks for teams saved by another process, while anyone is subscribed
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, poll):
+        """Initialize a ResultNotifier instance.
+
+        Args:
+            poll: Coroutine function bringing the course in memory up to date, e.g. CourseCache.get.
+                  It publishes the course itself when it reloads it.
+        """
+        self._poll = poll
+        self._waiters = {}  # email -> list of futures, resolved with the team_id
+        self._watcher = None  # watcher task, runs while there are subscriptions
+
+    def __len__(self):
+        """Number of pending subscriptions."""
+        return sum(len(futures) for futures in self._waiters.values())
+
+    def subscribe(self, email: str) -> asyncio.Future:
+        """Subscribe to the team result of a student.
+
+        Args:
+            email: Email address of the student.
+
+        Returns:
+            Future resolved with the student's team_id once it has a team. Pass it to
+            unsubscribe when it is no longer awaited.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(email, []).append(future)
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self.__watch())
+        return future
+
+    def unsubscribe(self, email: str, future: asyncio.Future):
+        """Drop a subscription, e.g. when the client disconnected.
+
+        Args:
+            email: Email address the future was subscribed to.
+            future: Future returned by subscribe.
+        """
+        futures = self._waiters.get(email)
+        if futures and future in futures:
+            futures.remove(future)
+            if not futures:
+                del self._waiters[email]
+
+    def publish(self, course: Course):
+        """Resolve the subscriptions of every student who has a team, in one pass.
+
+        Args:
+            course: Course in memory, with its new team assignment.
+        """
+        for email in list(self._waiters):
+            try:
+                team_id = course.get_student_by_email(email).team_id
+            except ValueError:
+                continue  # not submitted yet
+            if team_id is None:
+                continue
+            for future in self._waiters.pop(email):
+                if not future.done():
+                    future.set_result(team_id)
+
+    async def close(self):
+        """Stop the watcher and cancel the pending subscriptions, e.g. at shutdown."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        for futures in self._waiters.values():
+            for future in futures:
+                future.cancel()
+        self._waiters.clear()
+
+    async def __watch(self):
+        """Watcher task: check the database for new teams while anyone is subscribed."""
+        instrumentation.detach_request()  # started by a request, but serves all of them
+        while self._waiters:
+            await asyncio.sleep(self.CHECK_INTERVAL)
+            try:
+                await self._poll()
+            except Exception:
+                pass  # e.g. database locked, try again next time
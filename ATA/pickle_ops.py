@@ -1,30 +1,362 @@
+"""Course data persistence.
+
+Despite the module name (kept so existing imports keep working), course data is
+stored in a SQLite database in WAL mode, with one table for students, one for
+teams and one for team assignments. Students can be written or deleted without
+loading the whole course, and derived matrices are never stored.
+
+Every write bumps a generation counter stored in the database, so a process
+holding the course in memory (the API server) can cheaply tell whether another
+process (the CLI) changed the data since it last loaded it.
+
+The default course is stored in DATA_FILEPATH. Other courses each have their own
+database in COURSES_DIR (see course_path), every function takes the database path.
+"""
+
+import json
+import os
+import pathlib
 import pickle
+import re
+import sqlite3
+from contextlib import contextmanager
+
+from ATA import instrumentation
+from ATA.models import Course, Student, Team
+
+# Path to the SQLite database storing course data
+DATA_FILEPATH = "data/data.db"
+
+# Path of the pickle file used by older versions, imported once if the database doesn't exist
+LEGACY_PICKLE_FILEPATH = "data/data.pkl"
+
+# Directory of the databases of the other courses, one file per course (see course_path)
+COURSES_DIR = "data/courses"
+
+# Valid course IDs, they are used as file names
+COURSE_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    email TEXT PRIMARY KEY,
+    first_name TEXT NOT NULL,
+    skill_level INTEGER,
+    ambition INTEGER,
+    role INTEGER,
+    teamwork_style INTEGER,
+    pace INTEGER,
+    backgrounds TEXT NOT NULL,
+    backgrounds_preference INTEGER,
+    hobbies TEXT NOT NULL,
+    project_summary TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS teams (
+    team_id TEXT PRIMARY KEY,
+    ai_suggestion TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS assignments (
+    email TEXT PRIMARY KEY REFERENCES students(email) ON DELETE CASCADE,
+    team_id TEXT NOT NULL REFERENCES teams(team_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assignments_team ON assignments(team_id, position);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Version of SCHEMA, stored as PRAGMA user_version once the tables are created
+SCHEMA_VERSION = 1
+
+# Student columns in table order, backgrounds and hobbies are stored as JSON lists
+STUDENT_COLUMNS = ("email", "first_name", "skill_level", "ambition", "role", "teamwork_style", "pace",
+                   "backgrounds", "backgrounds_preference", "hobbies", "project_summary")
+
+UPSERT_STUDENT = (
+    f"INSERT INTO students ({', '.join(STUDENT_COLUMNS)}) VALUES ({', '.join('?' * len(STUDENT_COLUMNS))}) "
+    f"ON CONFLICT(email) DO UPDATE SET "
+    + ", ".join(f"{column} = excluded.{column}" for column in STUDENT_COLUMNS[1:])
+)
+
+SELECT_STUDENTS = (
+    f"SELECT {', '.join('s.' + column for column in STUDENT_COLUMNS)}, a.team_id "
+    f"FROM students s LEFT JOIN assignments a ON a.email = s.email"
+)
+
+
+def connect(path: str = None, readonly: bool = False) -> sqlite3.Connection:
+    """Open the course database, creating the tables on first open.
+
+    The schema is created once per database, PRAGMA user_version records it, so
+    opening an existing database runs no DDL.
+
+    Args:
+        path: Database file path, DATA_FILEPATH when None.
+        readonly: Open the database read-only, e.g. for a frequent poll of the
+                  generation; the database must exist.
+
+    Returns:
+        sqlite3 connection in WAL mode with foreign keys enabled.
+    """
+    path = path or DATA_FILEPATH
+    if readonly:
+        return sqlite3.connect(pathlib.Path(path).absolute().as_uri() + "?mode=ro", uri=True)
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)  # e.g. COURSES_DIR on the first write to a course
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA synchronous=NORMAL")  # safe with WAL, one fsync per checkpoint
+    connection.execute("PRAGMA foreign_keys=ON")
+    if connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        connection.execute("PRAGMA journal_mode=WAL")  # readers don't block the writer, kept by the file
+        connection.executescript(SCHEMA)
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return connection
+
+
+@contextmanager
+def transaction(path: str = None, readonly: bool = False):
+    """Open the course database for one transaction, committed on success and always closed.
 
-from ATA.models import Course
+    Args:
+        path: Database file path, DATA_FILEPATH when None.
+        readonly: Open the database read-only (see connect).
+
+    Yields:
+        sqlite3 connection.
+    """
+    connection = connect(path, readonly)
+    try:
+        with connection:  # commit, or roll back on exception
+            yield connection
+    finally:
+        connection.close()
+
+
+def course_path(course_id: str) -> str:
+    """Return the database file path of a course.
+
+    Every course is stored in its own database, so a course is loaded, written and
+    matched without touching the others.
+
+    Args:
+        course_id: Course ID, letters, digits, "-" and "_" only.
+
+    Returns:
+        Database file path in COURSES_DIR.
+
+    Raises:
+        ValueError: If the course ID is not valid.
+    """
+    if not COURSE_ID_PATTERN.fullmatch(course_id or ""):
+        raise ValueError(f"Invalid course ID: {course_id}")
+    return os.path.join(COURSES_DIR, f"{course_id}.db")
+
+
+def list_courses() -> list[str]:
+    """List the IDs of the courses stored in COURSES_DIR.
+
+    Returns:
+        Sorted course IDs.
+    """
+    if not os.path.isdir(COURSES_DIR):
+        return []
+    return sorted(name[:-len(".db")] for name in os.listdir(COURSES_DIR)
+                  if name.endswith(".db") and COURSE_ID_PATTERN.fullmatch(name[:-len(".db")]))
 
-# Path to the pickle file storing course data
-DATA_FILEPATH = "data/data.pkl"
 
+def _bump_generation(connection: sqlite3.Connection) -> int:
+    """Increment the generation counter, first thing in a write transaction.
+
+    Returns:
+        New generation.
+    """
+    connection.execute("INSERT INTO meta (key, value) VALUES ('generation', 1) "
+                       "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+    return connection.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+
+@instrumentation.timed("pickle_ops.load_generation")
+def load_generation(path: str = None) -> int:
+    """Read the generation counter, incremented by every write.
+
+    Args:
+        path: Database file path, DATA_FILEPATH when None.
+
+    Returns:
+        Current generation, 0 if nothing was ever written.
+    """
+    if not os.path.exists(path or DATA_FILEPATH):
+        return 0
+    with transaction(path, readonly=True) as connection:  # polled often, no DDL and no write lock
+        if connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            return 0  # being created by a first write
+        row = connection.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+    return row[0] if row else 0
+
+
+def _student_row(student: Student) -> tuple:
+    """Convert a student to a row of the students table."""
+    return (student.email, student.first_name, student.skill_level, student.ambition, student.role,
+            student.teamwork_style, student.pace, json.dumps(sorted(student.backgrounds)),
+            student.backgrounds_preference, json.dumps(sorted(student.hobbies)), student.project_summary)
+
+
+def _row_student(row: tuple) -> Student:
+    """Convert a row of SELECT_STUDENTS to a Student object."""
+    (email, first_name, skill_level, ambition, role, teamwork_style, pace,
+     backgrounds, backgrounds_preference, hobbies, project_summary, team_id) = row
+    return Student(
+        first_name=first_name,
+        email=email,
+        skill_level=skill_level,
+        ambition=ambition,
+        role=role,
+        teamwork_style=teamwork_style,
+        pace=pace,
+        backgrounds=set(json.loads(backgrounds)),
+        backgrounds_preference=backgrounds_preference,
+        hobbies=set(json.loads(hobbies)),
+        project_summary=project_summary,
+        team_id=team_id,
+    )
+
+
+@instrumentation.timed("pickle_ops.save_data")
+def save_data(course: Course, path: str = None):
+    """Save course data, replacing everything stored before.
 
-def save_data(course: Course):
-    """Save course data to pickle file.
-    
     Args:
         course: Course object to save.
+        path: Database file path, DATA_FILEPATH when None.
+    """
+    with transaction(path) as connection:  # one transaction
+        _bump_generation(connection)
+        connection.execute("DELETE FROM assignments")
+        connection.execute("DELETE FROM teams")
+        connection.execute("DELETE FROM students")
+        connection.executemany(UPSERT_STUDENT, [_student_row(student) for student in course.students])
+        _write_teams(connection, course)
+
+
+@instrumentation.timed("pickle_ops.save_teams")
+def save_teams(course: Course, path: str = None) -> int:
+    """Save only the teams and team assignments of a course, e.g. after team matching.
+
+    The old assignment is replaced in one transaction, so readers see either the old
+    teams or the new ones.
+
+    Args:
+        course: Course object whose teams are saved.
+        path: Database file path, DATA_FILEPATH when None.
+
+    Returns:
+        Generation after the write.
     """
-    with open(DATA_FILEPATH, "wb") as f:
-        pickle.dump(course, f)
+    with transaction(path) as connection:
+        generation = _bump_generation(connection)
+        connection.execute("DELETE FROM assignments")
+        connection.execute("DELETE FROM teams")
+        _write_teams(connection, course)
+    return generation
 
 
-def load_data() -> Course:
-    """Load course data from pickle file.
-    
+def _write_teams(connection: sqlite3.Connection, course: Course):
+    """Insert the teams and assignments of a course."""
+    connection.executemany(
+        "INSERT INTO teams (team_id, ai_suggestion) VALUES (?, ?)",
+        [(team.team_id, getattr(team, "AI_suggestion", "") or "") for team in course.teams])
+    connection.executemany(
+        "INSERT INTO assignments (email, team_id, position) VALUES (?, ?, ?)",
+        [(student.email, team.team_id, position)
+         for team in course.teams for position, student in enumerate(team.students)])
+
+
+@instrumentation.timed("pickle_ops.load_data")
+def load_data(path: str = None) -> Course:
+    """Load course data.
+
+    Args:
+        path: Database file path, DATA_FILEPATH when None.
+
     Returns:
-        Course object loaded from the pickle file.
-        
+        Course object with all students and teams.
+
     Raises:
-        FileNotFoundError: If the pickle file doesn't exist.
-        pickle.UnpicklingError: If the file is corrupted or not a valid pickle file.
+        FileNotFoundError: If neither the database nor a legacy pickle file exists.
+        sqlite3.DatabaseError: If the file is corrupted or not a valid database.
+    """
+    if path is None or path == DATA_FILEPATH:
+        if not os.path.exists(DATA_FILEPATH):
+            _import_legacy_pickle()  # raises FileNotFoundError when there is nothing to load
+    elif not os.path.exists(path):
+        raise FileNotFoundError(path)  # only the default course has a legacy pickle file
+
+    with transaction(path) as connection:
+        students = [_row_student(row) for row in connection.execute(SELECT_STUDENTS + " ORDER BY s.rowid")]
+        teams = connection.execute("SELECT team_id, ai_suggestion FROM teams ORDER BY rowid").fetchall()
+        members = connection.execute("SELECT team_id, email FROM assignments ORDER BY team_id, position").fetchall()
+
+    course = Course(students)
+    emails_by_team = {}
+    for team_id, email in members:
+        emails_by_team.setdefault(team_id, []).append(email)
+    for team_id, ai_suggestion in teams:
+        team = Team(team_id, [course.get_student_by_email(email) for email in emails_by_team.get(team_id, [])])
+        team.AI_suggestion = ai_suggestion
+        course.add_team(team)
+    return course
+
+
+def _import_legacy_pickle():
+    """Convert the pickle file written by older versions into the database.
+
+    Raises:
+        FileNotFoundError: If the legacy pickle file doesn't exist either.
+    """
+    with open(LEGACY_PICKLE_FILEPATH, "rb") as f:
+        course = pickle.load(f)
+    save_data(course)
+
+
+@instrumentation.timed("pickle_ops.delete_student")
+def delete_student(email: str, path: str = None) -> bool:
+    """Delete a student and its team assignment, without loading the course.
+
+    A team left without members is deleted too, like Course.remove_student_by_email does.
+
+    Args:
+        email: Email address of the student.
+        path: Database file path, DATA_FILEPATH when None.
+
+    Returns:
+        True if the student was deleted, False if no student with this email is stored.
+    """
+    with transaction(path) as connection:
+        team = connection.execute("SELECT team_id FROM assignments WHERE email = ?", (email,)).fetchone()
+        if connection.execute("DELETE FROM students WHERE email = ?", (email,)).rowcount == 0:
+            return False  # nothing changed, the generation is not bumped
+        _bump_generation(connection)
+        if team is not None:
+            connection.execute("DELETE FROM teams WHERE team_id = ? AND NOT EXISTS "
+                               "(SELECT 1 FROM assignments WHERE team_id = ?)", (team[0], team[0]))
+    return True
+
+
+@instrumentation.timed("pickle_ops.write_students")
+def write_students(students: list[Student], path: str = None) -> int:
+    """Insert or update a batch of students in one transaction.
+
+    Team assignments of existing students are kept.
+
+    Args:
+        students: Student objects to save.
+        path: Database file path, DATA_FILEPATH when None.
+
+    Returns:
+        Generation after the write.
     """
-    with open(DATA_FILEPATH, "rb") as f:
-        return pickle.load(f)
\ No newline at end of file
+    with transaction(path) as connection:
+        generation = _bump_generation(connection)
+        connection.executemany(UPSERT_STUDENT, [_student_row(student) for student in students])
+    return generation
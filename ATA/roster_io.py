@@ -0,0 +1,135 @@
+"""Reading student rosters from JSON, JSONL and CSV files.
+
+A roster is a list of student records with the fields of Student.get_json
+(team_id excluded). JSONL and CSV files are parsed one line at a time. Every
+record is validated with Student.from_json and the students are deduplicated by
+email in the same pass, a later record replacing an earlier one.
+"""
+
+import csv
+import json
+import os
+from typing import Iterable, Iterator
+
+from ATA.encoder import CHOICE_COLUMNS, BITMASK_COLUMNS
+from ATA.models import Student
+
+# Supported roster formats
+FORMATS = ("json", "jsonl", "csv")
+
+# Separator of the choice indices of a multiple-choice column in CSV files, e.g. "0;3"
+CSV_LIST_SEPARATOR = ";"
+
+
+def detect_format(filename: str) -> str:
+    """Guess the roster format from a file name.
+
+    Args:
+        filename: Name or path of the roster file.
+
+    Returns:
+        One of FORMATS.
+
+    Raises:
+        ValueError: If the extension is not a supported format.
+    """
+    extension = os.path.splitext(filename)[1].lower().lstrip(".")
+    if extension == "ndjson":
+        extension = "jsonl"
+    if extension not in FORMATS:
+        raise ValueError(f"Unsupported roster format: {filename}")
+    return extension
+
+
+def iter_records(lines: Iterable[str], fmt: str) -> Iterator[tuple[str, dict]]:
+    """Parse roster records.
+
+    JSON rosters are either a list of records, or an object whose "students" key holds
+    a list of records or records keyed by email (the shape of test/test_user.json).
+
+    Args:
+        lines: Text file, or any iterable of lines.
+        fmt: Roster format, one of FORMATS.
+
+    Yields:
+        Tuples of (location used in error messages, record dictionary).
+
+    Raises:
+        ValueError: If the format is unknown, a line is not valid or a JSON roster doesn't
+                    have one of the shapes above.
+    """
+    if fmt == "json":
+        try:
+            data = json.loads("".join(lines))
+        except ValueError as error:
+            raise ValueError(f"Invalid JSON: {error}")
+        if isinstance(data, dict):
+            if "students" not in data:
+                raise ValueError('Invalid JSON roster: object without a "students" key')
+            data = data["students"]
+            data = list(data.values()) if isinstance(data, dict) else data
+        if not isinstance(data, list):
+            raise ValueError(f"Invalid JSON roster: expected a list of student records, got {type(data).__name__}")
+        for index, record in enumerate(data):
+            yield f"Student {index + 1}", record
+    elif fmt == "jsonl":
+        for number, line in enumerate(lines, 1):
+            if line.strip():
+                try:
+                    yield f"Line {number}", json.loads(line)
+                except ValueError as error:
+                    raise ValueError(f"Line {number}: invalid JSON: {error}")
+    elif fmt == "csv":
+        for number, row in enumerate(csv.DictReader(lines), 2):  # line 1 is the header
+            yield f"Line {number}", _csv_record(row)
+    else:
+        raise ValueError(f"Unsupported roster format: {fmt}")
+
+
+def _csv_record(row: dict) -> dict:
+    """Convert a CSV row of strings to a record, empty choices are None and lists are ';'-separated."""
+    record = dict(row)
+    for name in CHOICE_COLUMNS:
+        value = (row.get(name) or "").strip()
+        record[name] = int(value) if value.lstrip("-").isdigit() else (value or None)
+    for name in BITMASK_COLUMNS:
+        values = (row.get(name) or "").split(CSV_LIST_SEPARATOR)
+        record[name] = [int(value) if value.strip().isdigit() else value for value in values if value.strip()]
+    return record
+
+
+def read_roster(lines: Iterable[str], fmt: str) -> list[Student]:
+    """Parse, validate and deduplicate a roster.
+
+    Args:
+        lines: Text file, or any iterable of lines.
+        fmt: Roster format, one of FORMATS.
+
+    Returns:
+        List of Student objects, one per email, in order of first appearance.
+
+    Raises:
+        ValueError: If a record is not valid, with its line or position in the message.
+    """
+    students = {}  # email -> Student, a later record replaces an earlier one
+    for location, record in iter_records(lines, fmt):
+        try:
+            student = Student.from_json(record)
+        except ValueError as error:
+            raise ValueError(f"{location}: {error}")
+        students[student.email] = student
+    return list(students.values())
+
+
+def load_roster(path: str, fmt: str = None) -> list[Student]:
+    """Read a roster file.
+
+    Args:
+        path: Path of the roster file.
+        fmt: Roster format, guessed from the extension when None.
+
+    Returns:
+        List of Student objects, one per email.
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return read_roster(f, fmt or detect_format(path))
@@ -0,0 +1,96 @@
+"""On-disk cache of normalized score matrices, keyed by a roster fingerprint.
+
+The score matrix only depends on the students' have/want vectors (in course
+order) and on the vector layout compiled from CONFIG, so a hash of those is a
+safe key. Matrices are stored as .npy files and opened with np.load(mmap_mode='r'),
+so reusing one costs neither a recomputation nor a full read.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from ATA.encoder import VectorEncoder
+
+# Bumped when the layout of the cache files changes
+CACHE_FORMAT = 2
+
+# Number of cached matrices kept in a directory, the least recently used are deleted
+MAX_ENTRIES = 4
+
+
+def fingerprint(have: np.ndarray, want: np.ndarray, encoder: VectorEncoder) -> str:
+    """Hash a roster's vectors and vector layout.
+
+    Args:
+        have: Have vectors (n x d), in course order.
+        want: Want vectors (n x d), in course order.
+        encoder: Encoder the vectors were built with.
+
+    Returns:
+        Hex digest identifying the score matrix of this roster.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr((CACHE_FORMAT, have.shape, str(have.dtype), encoder.blocks)).encode())
+    digest.update(np.ascontiguousarray(have).tobytes())
+    digest.update(np.ascontiguousarray(want).tobytes())
+    return digest.hexdigest()
+
+
+def _paths(directory: str, key: str) -> tuple[str, str]:
+    """Return the paths of the matrix and metadata files of a cache entry."""
+    return os.path.join(directory, f"{key}.npy"), os.path.join(directory, f"{key}.json")
+
+
+def load(directory: str, key: str) -> tuple[np.ndarray, float]:
+    """Open a cached score matrix, memory-mapped and read-only.
+
+    Args:
+        directory: Cache directory.
+        key: Roster fingerprint.
+
+    Returns:
+        Tuple of (normalized score matrix, largest raw score), or None if not cached.
+    """
+    matrix_path, meta_path = _paths(directory, key)
+    try:
+        with open(meta_path, "r") as f:
+            max_score = json.load(f)["max_score"]
+        matrix = np.load(matrix_path, mmap_mode="r")
+    except (OSError, ValueError, KeyError):
+        return None  # not cached, or a partial or damaged entry
+    os.utime(meta_path)  # mark as recently used
+    return matrix, max_score
+
+
+def save(directory: str, key: str, matrix: np.ndarray, max_score: float):
+    """Store a score matrix, then delete the least recently used entries beyond MAX_ENTRIES.
+
+    The files are written under temporary names and renamed, so a concurrent reader
+    never sees a partial entry.
+
+    Args:
+        directory: Cache directory, created if needed.
+        key: Roster fingerprint.
+        matrix: Normalized score matrix (n x n).
+        max_score: Largest raw score, the normalization factor.
+    """
+    os.makedirs(directory, exist_ok=True)
+    matrix_path, meta_path = _paths(directory, key)
+    with open(matrix_path + ".tmp", "wb") as f:
+        np.save(f, matrix)
+    os.replace(matrix_path + ".tmp", matrix_path)
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump({"max_score": max_score, "n": matrix.shape[0]}, f)
+    os.replace(meta_path + ".tmp", meta_path)  # the metadata marks the entry complete
+
+    entries = sorted((name for name in os.listdir(directory) if name.endswith(".json")),
+                     key=lambda name: os.path.getmtime(os.path.join(directory, name)), reverse=True)
+    for name in entries[MAX_ENTRIES:]:
+        for path in _paths(directory, name[:-len(".json")]):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,296 @@
+"""Vectorized score kernels used by the team matching algorithm.
+
+All functions here work on student indices (row numbers of the have/want arrays)
+instead of Student objects, so they can be run with plain numpy operations.
+"""
+
+import tempfile
+
+import numpy as np
+
+# Number of best pairs ranked in the first chunk by PairRanking.iter_pairs.
+# Later chunks double in size, so a typical matching run only sorts a tiny part of all pairs.
+PAIR_CHUNK_SIZE = 1024
+
+# Number of score matrix rows computed at once by crush_score_matrix and PairRanking,
+# so their temporaries take about SCORE_BLOCK_ROWS x n floats instead of n x n
+SCORE_BLOCK_ROWS = 1024
+
+# Number of students scored against everyone in one block by candidate_pair_ranking,
+# the block's temporaries take about 2 x CANDIDATE_BLOCK_ROWS x n floats
+CANDIDATE_BLOCK_ROWS = 256
+
+
+def mutual_score_matrix(score_matrix: np.ndarray) -> np.ndarray:
+    """Calculate the symmetric mutual compatibility matrix.
+
+    mutual[i, j] is the average of how much i matches what j wants and
+    how much j matches what i wants.
+
+    Args:
+        score_matrix: One-way compatibility matrix (n x n).
+
+    Returns:
+        Symmetric mutual score matrix (n x n).
+    """
+    return (score_matrix + score_matrix.T) / 2
+
+
+def mutual_score_matrix_rows(score_matrix: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """Calculate rows start to stop of the mutual compatibility matrix.
+
+    Args:
+        score_matrix: One-way compatibility matrix (n x n).
+        start: First row.
+        stop: Row after the last one.
+
+    Returns:
+        Rows of the mutual score matrix ((stop - start) x n).
+    """
+    return (score_matrix[start:stop] + score_matrix[:, start:stop].T) / 2
+
+
+def allocate_score_matrix(capacity: int, directory: str = None) -> np.ndarray:
+    """Allocate a zeroed float64 score buffer, in memory or memory-mapped.
+
+    Scores are kept in float64: rounded to float32, pair scores that are exactly
+    tied differ by one ulp, and the matching would break their ties differently.
+
+    Args:
+        capacity: Number of rows and columns.
+        directory: Directory of the anonymous file backing a np.memmap buffer,
+                   None to keep the buffer in memory.
+
+    Returns:
+        capacity x capacity float64 array.
+    """
+    if directory is None or capacity == 0:
+        return np.zeros((capacity, capacity), dtype=np.float64)
+    # the file is deleted at once, its space is freed when the memmap is released
+    with tempfile.TemporaryFile(dir=directory) as f:
+        return np.memmap(f, dtype=np.float64, mode="w+", shape=(capacity, capacity))
+
+
+def crush_score_matrix(have: np.ndarray, want: np.ndarray, out: np.ndarray,
+                       block_rows: int = SCORE_BLOCK_ROWS) -> float:
+    """Compute the normalized one-way score matrix into a preallocated buffer.
+
+    out[i, j] = have_i . want_j / max, how much i matches what j wants, with a 0
+    diagonal. The first pass writes the raw scores one block of rows at a time and
+    tracks the largest one, the second pass divides in place, so besides out only
+    one block of temporaries is ever allocated.
+
+    Args:
+        have: Have vectors (n x d).
+        want: Want vectors (n x d).
+        out: Buffer of at least n x n, its top-left n x n corner is overwritten.
+        block_rows: Number of rows computed at once.
+
+    Returns:
+        Largest raw score, the normalization factor.
+    """
+    n = have.shape[0]
+    max_score = 0.0
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        block = out[start:stop, :n]
+        block[...] = have[start:stop] @ want.T
+        block[np.arange(stop - start), np.arange(start, stop)] = 0  # never match with self
+        max_score = max(max_score, float(block.max()))
+    if max_score > 0:
+        scale_score_matrix(out[:n, :n], max_score, block_rows)
+    return max_score
+
+
+def max_crush_score(have: np.ndarray, want: np.ndarray, block_rows: int = SCORE_BLOCK_ROWS) -> float:
+    """Find the largest one-way score have_i . want_j (i != j), the normalization factor of the score matrix.
+
+    The scores are computed one block of rows at a time and not kept, so only one
+    block of temporaries is allocated.
+
+    Args:
+        have: Have vectors (n x d).
+        want: Want vectors (n x d).
+        block_rows: Number of rows computed at once.
+
+    Returns:
+        Largest raw score, 0 if there are fewer than two students.
+    """
+    n = have.shape[0]
+    max_score = 0.0
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        block = have[start:stop] @ want.T
+        block[np.arange(stop - start), np.arange(start, stop)] = 0  # never match with self
+        max_score = max(max_score, float(block.max()))
+    return max_score
+
+
+def scale_score_matrix(matrix: np.ndarray, factor: float, block_rows: int = SCORE_BLOCK_ROWS):
+    """Divide a score matrix by factor in place, one block of rows at a time.
+
+    Args:
+        matrix: Score matrix, modified in place.
+        factor: Divisor.
+        block_rows: Number of rows divided at once.
+    """
+    for start in range(0, matrix.shape[0], block_rows):
+        matrix[start:start + block_rows] /= factor
+
+
+class PairRanking:
+    """Mutual crush scores of all unique student pairs, ranked on demand.
+
+    Pairs are stored as three flat arrays (rows, cols, scores) taken from the upper
+    triangle of the mutual score matrix, so pair p is (rows[p], cols[p]) with rows[p] < cols[p].
+    The best-first order is built lazily with a partition, chunk by chunk, so the whole
+    pair list never has to be sorted unless the matching actually walks through all of it.
+    """
+
+    def __init__(self, score_matrix: np.ndarray, block_rows: int = SCORE_BLOCK_ROWS):
+        """Initialize a PairRanking instance.
+
+        The pairs are filled in one block of rows at a time, in the order of np.triu_indices,
+        so no n x n temporary is allocated.
+
+        Args:
+            score_matrix: One-way compatibility matrix (n x n) between all students.
+            block_rows: Number of matrix rows processed at once.
+        """
+        n = score_matrix.shape[0]  # number of students
+        count = n * (n - 1) // 2  # every unique pair, no self-pairs
+        index_dtype = np.int32 if n < 2 ** 31 else np.int64
+        self.rows = np.empty(count, dtype=index_dtype)  # first student of every pair
+        self.cols = np.empty(count, dtype=index_dtype)  # second student of every pair
+        self.scores = np.empty(count, dtype=score_matrix.dtype)  # flat array of pair scores
+
+        offset = 0  # position of the first pair of the block
+        for start in range(0, n, block_rows):
+            stop = min(start + block_rows, n)
+            block = np.arange(start, stop, dtype=index_dtype)
+            lengths = n - 1 - block  # row i pairs with i + 1 ... n - 1
+            end = offset + int(lengths.sum())
+            # row-major upper triangle of the block, written straight into the flat arrays
+            self.rows[offset:end] = np.repeat(block, lengths)
+            firsts = np.cumsum(lengths) - lengths  # position of every row's first pair in the block
+            self.cols[offset:end] = np.arange(end - offset, dtype=index_dtype) + np.repeat(block + 1 - firsts, lengths)
+            # (S + S.T) / 2 for the rows of the block, boolean indexing keeps row-major order
+            mutual = mutual_score_matrix_rows(score_matrix, start, stop)
+            self.scores[offset:end] = mutual[np.arange(n) > block[:, None]]
+            offset = end
+
+    @classmethod
+    def from_pairs(cls, rows: np.ndarray, cols: np.ndarray, scores: np.ndarray) -> "PairRanking":
+        """Create a ranking of a subset of pairs, e.g. the candidates of candidate_pair_ranking.
+
+        Args:
+            rows: First student index of every pair.
+            cols: Second student index of every pair (rows[p] < cols[p]).
+            scores: Mutual crush score of every pair.
+
+        Returns:
+            PairRanking of the given pairs.
+        """
+        ranking = cls.__new__(cls)
+        ranking.rows, ranking.cols, ranking.scores = rows, cols, scores
+        return ranking
+
+    def __len__(self):
+        return len(self.scores)
+
+    def iter_chunks(self, chunk_size: int = PAIR_CHUNK_SIZE):
+        """Yield pair indices from best to worst, one sorted chunk at a time.
+
+        Each chunk is selected from the remaining pairs with a partition and only
+        the chunk itself is sorted. Chunk size doubles every time. Ties are broken
+        toward the highest pair index, like popping from the end of a list stable
+        sorted by ascending score, also when the tie straddles a chunk boundary.
+
+        Args:
+            chunk_size: Number of pairs in the first chunk.
+
+        Yields:
+            Numpy array of pair indices, sorted by score (highest first), then by pair
+            index (highest first).
+        """
+        remaining = np.arange(len(self.scores))  # pair indices not yielded yet, ascending
+        while len(remaining) > 0:
+            remaining_scores = self.scores[remaining]
+            if chunk_size >= len(remaining):
+                # last chunk, just sort everything left
+                yield remaining[np.lexsort((-remaining, -remaining_scores))]
+                return
+            # pick the chunk_size best pairs without sorting the rest: every pair above the
+            # threshold score, then the tied pairs with the highest indices
+            threshold = np.partition(remaining_scores, len(remaining) - chunk_size)[len(remaining) - chunk_size]
+            above = np.flatnonzero(remaining_scores > threshold)
+            tied = np.flatnonzero(remaining_scores == threshold)
+            top = np.concatenate([above, tied[len(tied) - (chunk_size - len(above)):]])
+            yield remaining[top[np.lexsort((-remaining[top], -remaining_scores[top]))]]
+
+            # drop the yielded pairs and grow the next chunk
+            keep = np.ones(len(remaining), dtype=bool)
+            keep[top] = False
+            remaining = remaining[keep]
+            chunk_size *= 2
+
+    def iter_pairs(self, chunk_size: int = PAIR_CHUNK_SIZE):
+        """Yield (i, j) student index pairs from best to worst mutual crush score.
+
+        Args:
+            chunk_size: Number of pairs in the first ranked chunk.
+
+        Yields:
+            Tuple of two student indices (i < j).
+        """
+        for chunk in self.iter_chunks(chunk_size):
+            yield from zip(self.rows[chunk].tolist(), self.cols[chunk].tolist())
+
+
+def candidate_pair_ranking(have: np.ndarray, want: np.ndarray, k: int,
+                           block_rows: int = CANDIDATE_BLOCK_ROWS) -> PairRanking:
+    """Rank only the pairs formed by every student and its k best partners.
+
+    The mutual scores of a block of students against everyone are computed with two
+    matrix multiplications, raw[i, j] = (have_i . want_j + have_j . want_i) / 2, and
+    argpartition keeps the k best partners of each row. Only O(n * k) pairs are kept
+    instead of all n^2 / 2, and no n x n matrix is ever built. Scores are normalized
+    like the score matrix, by the largest one-way score.
+
+    Args:
+        have: Have vectors (n x d).
+        want: Want vectors (n x d).
+        k: Number of best partners kept per student, more is closer to the exact ranking.
+        block_rows: Number of students scored in one block.
+
+    Returns:
+        PairRanking of the candidate pairs, each pair once.
+    """
+    n = have.shape[0]
+    k = min(k, n - 1)
+    if k < 1:
+        return PairRanking.from_pairs(np.array([], dtype=int), np.array([], dtype=int), np.array([]))
+
+    students, partners, scores = [], [], []  # one array of k candidates per student, by block
+    max_score = 0.0  # largest one-way score, to normalize like the score matrix
+    for start in range(0, n, block_rows):
+        block = np.arange(start, min(start + block_rows, n))
+        forward = have[block] @ want.T  # how much each student of the block matches what everyone wants
+        forward[block - start, block] = 0  # never match with self
+        max_score = max(max_score, float(forward.max()))
+        mutual = (forward + want[block] @ have.T) / 2
+        mutual[block - start, block] = -np.inf  # never a candidate of itself
+
+        best = np.argpartition(-mutual, k - 1, axis=1)[:, :k]  # k best partners of each row, unordered
+        students.append(np.repeat(block, k))
+        partners.append(best.ravel())
+        scores.append(np.take_along_axis(mutual, best, axis=1).ravel())
+
+    students, partners, scores = np.concatenate(students), np.concatenate(partners), np.concatenate(scores)
+    # (i, j) and (j, i) are the same pair with the same score, keep it once, in upper triangle order
+    rows, cols = np.minimum(students, partners), np.maximum(students, partners)
+    _, unique = np.unique(rows.astype(np.int64) * n + cols, return_index=True)
+    scores = scores[unique]
+    if max_score > 0:
+        scores /= max_score
+    return PairRanking.from_pairs(rows[unique], cols[unique], scores)
@@ -1,16 +1,97 @@
-import pickle
+import asyncio
+import io
+import os
+from contextlib import asynccontextmanager
 from typing import Annotated
 
-from fastapi import FastAPI, Request, Form
+from fastapi import APIRouter, Depends, FastAPI, Form, HTTPException, Request, Response, UploadFile
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
-from ATA import pickle_ops
+from ATA import export, instrumentation, pickle_ops, roster_io
+from ATA.course_cache import CourseCache
+from ATA.http_cache import etag, not_modified
+from ATA.jobs import JobManager
 from starlette.middleware.cors import CORSMiddleware
-from .models import Student, Course
-from .config import VERSION
+from .models import Student
 import json
 
+# Default course held in memory, shared by all requests
+cache = CourseCache()
+
+# Other courses held in memory, course ID -> CourseCache, loaded on first request
+caches = {}
+
+# Team matching jobs of all courses, run in worker processes
+jobs = JobManager()
+
+# Seconds between two keep-alive comments of a result event stream, also how often a closed connection is noticed
+EVENT_KEEPALIVE = 15.0
+
+# Milliseconds a browser waits before reconnecting a dropped result event stream
+EVENT_RETRY_MS = 3000
+
+# Cache-Control of the result endpoints: browsers may keep a copy, but must revalidate it with the ETag
+RESULT_CACHE_CONTROL = "no-cache"
+
+
+async def team_export_stream(teams: list, vectors: bool):
+    """NDJSON chunks of a team export, encoded on the event loop.
+
+    A plain generator would be run in a thread by StreamingResponse, while the course
+    it reads is changed on the event loop.
+
+    Args:
+        teams: Teams to export, in order.
+        vectors: Whether to include the vectors.
+    """
+    for chunk in export.iter_teams_ndjson(teams, vectors):
+        yield chunk
+
+
+async def result_event_stream(email: str, request: Request, cache: CourseCache):
+    """Server-Sent Events of a student's result: one "result" event once the student has a team.
+
+    Args:
+        email: Student's email address.
+        request: FastAPI request object, to notice a closed connection.
+        cache: CourseCache of the student's course.
+
+    Yields:
+        Event stream chunks.
+    """
+    future = cache.notifier.subscribe(email)  # subscribe first, so a result can't be missed in between
+    try:
+        yield f"retry: {EVENT_RETRY_MS}\n\n"
+        course = await cache.get()
+        try:
+            team_id = course.get_student_by_email(email).team_id
+        except ValueError:
+            team_id = None  # not submitted yet, wait anyway
+        while team_id is None:
+            try:
+                team_id = await asyncio.wait_for(asyncio.shield(future), EVENT_KEEPALIVE)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+        data = json.dumps({'status': 'ok', 'has_result': True, 'team_id': team_id})
+        yield f"event: result\ndata: {data}\n\n"
+    finally:
+        cache.notifier.unsubscribe(email, future)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Stop the matching jobs and save the queued submissions of every course when the server stops."""
+    yield
+    await jobs.close()
+    await cache.close()
+    for course in caches.values():
+        await course.close()
+
+
 # FastAPI application instance
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS to allow cross-origin requests
 app.add_middleware(
@@ -21,6 +102,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Time every request and the course stages it runs, when ATA_METRICS is set (see ATA.instrumentation)
+app.add_middleware(instrumentation.MetricsMiddleware)
+
 
 @app.get("/")
 def read_root():
@@ -33,103 +117,305 @@ def read_root():
     return "ATA-Automatic Team Assembler"
 
 
-@app.post("/student_submit")
-async def student_submit(data: Annotated[str, Form()], request: Request):
-    """Submit or update student information.
-    
-    Accepts student data as JSON string in form data. If a student with the same
-    email exists, their information is updated. Otherwise, a new student is added.
-    
+def course_router(get_cache, get_new_cache=None) -> APIRouter:
+    """Build the routes of a course, on the course cache returned by a dependency.
+
+    The same routes serve the default course at the top level and every other course
+    under /courses/{course_id}.
+
     Args:
-        data: JSON string containing student information.
-        request: FastAPI request object.
-        
+        get_cache: FastAPI dependency returning the CourseCache of the request's course.
+        get_new_cache: FastAPI dependency of the routes adding students, which may also
+                       create the course, get_cache when None.
+
     Returns:
-        Dictionary with status "ok" on success.
+        APIRouter with the student and result routes.
+    """
+    router = APIRouter()
+    CacheDependency = Annotated[CourseCache, Depends(get_cache)]
+    NewCacheDependency = Annotated[CourseCache, Depends(get_new_cache or get_cache)]
+
+    @router.post("/student_submit")
+    async def student_submit(data: Annotated[str, Form()], request: Request, cache: NewCacheDependency):
+        """Submit or update student information.
+
+        Accepts student data as JSON string in form data. If a student with the same
+        email exists, their information is updated. Otherwise, a new student is added.
+
+        Args:
+            data: JSON string containing student information.
+            request: FastAPI request object.
+
+        Returns:
+            Dictionary with status "ok" and the submission's sequence number on success,
+            status "error" and a message if the data is invalid.
+        """
+        # Validate before queueing, so a bad submission can't fail the batch it would be written with
+        try:
+            student = Student.from_json(json.loads(data))
+        except ValueError as error:  # json.JSONDecodeError is a ValueError too
+            return {'status': 'error', 'message': str(error)}
+        # Queued and applied by the single writer, returns once saved
+        sequence = await cache.submit(student)
+        return {"status": "ok", "sequence": sequence}
+
+    @router.post("/students/bulk")
+    async def students_bulk(file: UploadFile, cache: NewCacheDependency, format: Annotated[str, Form()] = None):
+        """Import a roster file, adding new students and updating existing ones by email.
+
+        The roster is parsed and validated as a whole before anything is saved, then all
+        students are saved in one transaction. Matching scores are recomputed only once,
+        the next time team matching runs.
+
+        Args:
+            file: Uploaded roster file (JSON, JSONL or CSV).
+            format: Roster format, guessed from the file name when not given.
+
+        Returns:
+            Dictionary with status "ok", the number of imported students and the submission's
+            sequence number on success, status "error" and a message if the roster is invalid.
+        """
+        try:
+            fmt = format or roster_io.detect_format(file.filename or "")
+            lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+            students = await asyncio.to_thread(roster_io.read_roster, lines, fmt)
+        except (ValueError, UnicodeDecodeError) as error:
+            return {'status': 'error', 'message': str(error)}
+        sequence = await cache.submit_many(students)
+        return {"status": "ok", "imported": len(students), "sequence": sequence}
+
+    @router.get("/check_status")
+    async def check_status(email: str, request: Request, response: Response, cache: CacheDependency):
+        """Check if a student has been assigned to a team.
+
+        Sends a strong ETag, a request with a matching If-None-Match gets 304 Not Modified.
+
+        Args:
+            email: Student's email address.
+            request: FastAPI request object.
+            response: FastAPI response object, for the ETag header.
+
+        Returns:
+            Dictionary with status and has_result boolean indicating if student has a team.
+        """
+        course = await cache.get()
+        try:
+            student = course.get_student_by_email(email)
+        except ValueError:
+            # no ETag: adding the student doesn't change the result version
+            return {'status': 'error', 'has_result': False, 'message': 'Student not found'}
+
+        headers = {"ETag": etag(cache.result_version, email), "Cache-Control": RESULT_CACHE_CONTROL}
+        if not_modified(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        has_result = student.team_id is not None and student.team_id != ""
+        return {'status': 'ok', 'has_result': bool(has_result)}
+
+    @router.get("/result/events")
+    async def result_events(email: str, request: Request, cache: CacheDependency):
+        """Wait for a student's team result, pushed as Server-Sent Events.
+
+        Replaces polling /check_status: the connection is held open at no cost until team
+        matching assigns the student a team, then one "result" event is sent (at once if the
+        student already has a team) and the stream ends.
+
+        Args:
+            email: Student's email address.
+            request: FastAPI request object.
+
+        Returns:
+            text/event-stream response.
+        """
+        return StreamingResponse(result_event_stream(email, request, cache), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @router.get("/result")
+    async def result(email: str, request: Request, cache: CacheDependency):
+        """Get team matching results for a student.
+
+        Sends a strong ETag, a request with a matching If-None-Match gets 304 Not Modified.
+        The serialized result is shared by all members of a team, and kept until the teams
+        change (see CourseCache.payloads).
+
+        Args:
+            email: Student's email address.
+            request: FastAPI request object.
+
+        Returns:
+            JSON response containing team information including teammate names, emails,
+            project summaries, and AI suggestions.
+        """
+        course = await cache.get()
+        version = cache.result_version
+        headers = {"ETag": etag(version, email), "Cache-Control": RESULT_CACHE_CONTROL}
+        if not_modified(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+        student = course.get_student_by_email(email)
+        payload = cache.payloads.get(version, student.team_id)
+        if payload is None:
+            payload = export.dumps(export.result_payload(course.get_team_by_team_id(student.team_id)))
+            cache.payloads.put(version, student.team_id, payload)
+        return Response(payload, media_type="application/json", headers=headers)
+
+    @router.get("/teams")
+    async def teams_export(cache: CacheDependency, vectors: bool = False):
+        """Export every team as NDJSON, one team per line (see Team.get_json).
+
+        The teams are encoded and sent a chunk at a time, so the export is never built
+        as one list in memory.
+
+        Args:
+            vectors: Whether to include the team and student vectors.
+
+        Returns:
+            application/x-ndjson response.
+        """
+        course = await cache.get()
+        teams = list(course.teams)  # a new assignment replaces the list, keep the current one
+        return StreamingResponse(team_export_stream(teams, vectors), media_type="application/x-ndjson")
+
+    @router.get("/matching/quality")
+    async def matching_quality(cache: CacheDependency):
+        """Get the quality report of the current team assignment.
+
+        Returns:
+            Dictionary with status "ok", the cohesion of every team and the aggregates over
+            all teams (see Course.evaluate_assignment).
+        """
+        course = await cache.get()
+        # copied on the event loop, where the course is changed, and scored in a thread (O(n^2 d) to normalize)
+        snapshot = course.assignment_snapshot()
+        report = await asyncio.to_thread(course.quality_report, snapshot)
+        return {'status': 'ok', **report}
+
+    @router.post("/matching/jobs")
+    async def start_matching_job(cache: CacheDependency, max_size: Annotated[int, Form()] = 3,
+                                 restarts: Annotated[int, Form()] = 1, refine_ms: Annotated[float, Form()] = None,
+                                 candidates: Annotated[int, Form()] = None):
+        """Start team matching in the background.
+
+        The matching runs in a worker process, on the students saved when it starts, and
+        the teams are committed at once when it finishes. Poll the returned job for progress.
+
+        Args:
+            max_size: Maximum number of students per team.
+            restarts: Number of greedy runs (see Course.team_matching).
+            refine_ms: Time budget of the local search refinement in milliseconds.
+            candidates: Number of best partners per student for large cohorts.
+
+        Returns:
+            Dictionary with status "ok" and the job (see MatchingJob.get_json), status "error"
+            and a message if the options are invalid or a job is already running for the course.
+        """
+        if max_size <= 1 or restarts < 1 or (candidates is not None and candidates < 1) \
+                or (refine_ms is not None and refine_ms < 0):
+            return {'status': 'error', 'message': 'Invalid matching options'}
+        try:
+            job = jobs.submit(cache, {"max_size": max_size, "restarts": restarts, "refine_ms": refine_ms,
+                                      "candidates": candidates})
+        except ValueError as error:
+            return {'status': 'error', 'message': str(error)}
+        return {'status': 'ok', 'job': job.get_json()}
+
+    @router.get("/matching/jobs/{job_id}")
+    async def matching_job(job_id: str, cache: CacheDependency):
+        """Get the status of a matching job.
+
+        Args:
+            job_id: ID returned when the job was started.
+
+        Returns:
+            Dictionary with status "ok" and the job's status, phase, percent done and elapsed
+            seconds, status "error" if the course has no such job.
+        """
+        job = jobs.get(job_id)
+        if job is None or job.path != cache.path:
+            return {'status': 'error', 'message': 'Job not found'}
+        return {'status': 'ok', 'job': job.get_json()}
+
+    return router
+
+
+def get_default_cache() -> CourseCache:
+    """Dependency returning the cache of the default course."""
+    return cache
+
+
+def course_path(course_id: str) -> str:
+    """Database file path of a course (see pickle_ops.course_path).
+
+    Raises:
+        HTTPException: 404 if the course ID is not valid.
     """
-    # Load existing course, or create new one if file doesn't exist
     try:
-        course = pickle_ops.load_data()
-        if not isinstance(course, Course):
-            raise Exception("Loaded data is not a Course instance")
-    except Exception:
-        course = Course([])
-        pickle_ops.save_data(course)
-    
-    student_data = json.loads(data)
-    student = Student(
-        first_name=student_data["first_name"],
-        email=student_data["email"],
-        skill_level=student_data["skill_level"],
-        ambition=student_data["ambition"],
-        role=student_data["role"],
-        teamwork_style=student_data["teamwork_style"],
-        pace=student_data["pace"],
-        backgrounds=set(student_data["backgrounds"]),
-        backgrounds_preference=student_data["backgrounds_preference"],
-        hobbies=set(student_data["hobbies"]),
-        project_summary=student_data["project_summary"],
-    )
-    # Update existing student or add new one
-    course.update_student(student)
-    pickle_ops.save_data(course)
-    return {"status": "ok"}
-
-
-@app.get("/check_status")
-def check_status(email: str, request: Request):
-    """Check if a student has been assigned to a team.
-    
+        return pickle_ops.course_path(course_id)
+    except ValueError as error:
+        raise HTTPException(status_code=404, detail=str(error))
+
+
+def get_course_cache(course_id: str) -> CourseCache:
+    """Dependency returning the cache of a stored course, created on first use.
+
+    Only courses with a database get a cache, so requests to made-up course IDs
+    don't hold anything in memory.
+
     Args:
-        email: Student's email address.
-        request: FastAPI request object.
-        
+        course_id: Course ID from the path.
+
     Returns:
-        Dictionary with status and has_result boolean indicating if student has a team.
+        CourseCache of the course.
+
+    Raises:
+        HTTPException: 404 if the course ID is not valid or the course doesn't exist.
     """
-    try:
-        course = pickle_ops.load_data()
-        if not isinstance(course, Course):
-            raise Exception("Loaded data is not a Course instance")
-    except Exception:
-        return {'status': 'error', 'has_result': False, 'message': 'Student not found'}
+    if course_id not in caches and not os.path.exists(course_path(course_id)):
+        raise HTTPException(status_code=404, detail=f"Course not found: {course_id}")
+    return get_new_course_cache(course_id)
+
+
+def get_new_course_cache(course_id: str) -> CourseCache:
+    """Dependency returning the cache of a course, created on first use even if the course doesn't exist yet.
+
+    Used by the routes adding students, the course's database is created by the first write.
+
+    Args:
+        course_id: Course ID from the path.
+
+    Returns:
+        CourseCache of the course.
+
+    Raises:
+        HTTPException: 404 if the course ID is not valid.
+    """
+    if course_id not in caches:
+        caches[course_id] = CourseCache(course_path(course_id))
+    return caches[course_id]
+
+
+app.include_router(course_router(get_default_cache))
+app.include_router(course_router(get_course_cache, get_new_course_cache), prefix="/courses/{course_id}")
+
+
+@app.get("/courses")
+def courses():
+    """List the stored courses, the default course excluded.
     
-    try:
-        student = course.get_student_by_email(email)
-        has_result = student.team_id is not None and student.team_id != ""
-        return {'status': 'ok', 'has_result': bool(has_result)}
-    except ValueError:
-        return {'status': 'error', 'has_result': False, 'message': 'Student not found'}
+    Returns:
+        Dictionary with status "ok" and the course IDs.
+    """
+    return {"status": "ok", "courses": pickle_ops.list_courses()}
 
 
-@app.get("/result")
-def result(email: str, request: Request):
-    """Get team matching results for a student.
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Metrics endpoint for Prometheus.
     
-    Args:
-        email: Student's email address.
-        request: FastAPI request object.
-        
     Returns:
-        Dictionary containing team information including teammate names, emails,
-        project summaries, and AI suggestions.
+        Time spent per course stage, persistence call and API route, in the Prometheus text format.
     """
-    course = pickle_ops.load_data()
-    student = course.get_student_by_email(email)
-    team_id = student.team_id
-    team = course.get_team_by_team_id(team_id)
-    teammates_name = [teammate.first_name for teammate in team.students]
-    teammates_email = [teammate.email for teammate in team.students]
-    teammates_proj_summary = [teammate.project_summary for teammate in team.students]
-    ai_suggestion = getattr(team, 'AI_suggestion', None) or ""
-    pickle_ops.save_data(course)
-    return {
-        'status': 'ok',
-        'teammates_name': teammates_name,
-        'teammates_email': teammates_email,
-        'teammates_proj_summary': teammates_proj_summary,
-        'ai_suggestion': ai_suggestion
-    }
+    return PlainTextResponse(instrumentation.render_metrics(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/health")
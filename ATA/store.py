@@ -0,0 +1,172 @@
+"""Columnar storage of student vectors and categorical attributes.
+
+A StudentStore keeps one preallocated float64 matrix for the have vectors, one for
+the want vectors, and one integer column per categorical attribute. Students bound
+to a store read their vectors straight from their row, so no per-student numpy
+arrays are kept and the matrices never have to be re-stacked. The vectors keep
+full precision: weights such as 3 / sqrt(3) aren't exact in float32, and the
+rounding would change which pair scores tie, and so the teams.
+"""
+
+import numpy as np
+
+from ATA import instrumentation
+from ATA.encoder import DEFAULT_ENCODER, VectorEncoder, CHOICE_COLUMNS, BITMASK_COLUMNS, NO_CHOICE, \
+    student_columns
+
+
+class StudentStore:
+    """Preallocated, array-backed storage of all students of a course.
+
+    Row i of every column belongs to the student bound to row i. Capacity doubles
+    when it runs out, so appending a student is amortized O(d). Vectors are encoded
+    from the categorical columns by a VectorEncoder, a whole batch at a time.
+    """
+
+    def __init__(self, capacity: int = 0, encoder: VectorEncoder = DEFAULT_ENCODER):
+        """Initialize a StudentStore instance.
+
+        Args:
+            capacity: Number of rows to preallocate.
+            encoder: Encoder used to build the vectors from the attributes.
+        """
+        self.size = 0  # number of rows in use
+        self.encoder = encoder
+        self._have = np.zeros((capacity, encoder.dim), dtype=np.float64)  # have vector of every row
+        self._want = np.zeros((capacity, encoder.dim), dtype=np.float64)  # want vector of every row
+        self._choices = {name: np.full(capacity, NO_CHOICE, dtype=np.int8) for name in CHOICE_COLUMNS}
+        self._bitmasks = {name: np.zeros(capacity, dtype=np.int64) for name in BITMASK_COLUMNS}
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self) -> int:
+        """Number of preallocated rows."""
+        return self._have.shape[0]
+
+    @property
+    def have(self) -> np.ndarray:
+        """Have vectors of all rows in use (view)."""
+        return self._have[:self.size]
+
+    @property
+    def want(self) -> np.ndarray:
+        """Want vectors of all rows in use (view)."""
+        return self._want[:self.size]
+
+    def column(self, name: str) -> np.ndarray:
+        """Return a categorical column of all rows in use (view).
+
+        Args:
+            name: Attribute name, one of CHOICE_COLUMNS or BITMASK_COLUMNS.
+
+        Returns:
+            int8 column of choice indices (-1 for no preference) or int64 column of bitmasks.
+        """
+        if name in self._choices:
+            return self._choices[name][:self.size]
+        return self._bitmasks[name][:self.size]
+
+    def reserve(self, capacity: int):
+        """Grow the store so it holds at least capacity rows, doubling the current capacity.
+
+        Args:
+            capacity: Number of rows needed.
+        """
+        if capacity <= self.capacity:
+            return
+        new_capacity = max(capacity, 2 * self.capacity, 8)
+
+        def grow(column: np.ndarray, fill) -> np.ndarray:
+            new_column = np.full((new_capacity,) + column.shape[1:], fill, dtype=column.dtype)
+            new_column[:self.size] = column[:self.size]
+            return new_column
+
+        self._have, self._want = grow(self._have, 0), grow(self._want, 0)
+        self._choices = {name: grow(column, NO_CHOICE) for name, column in self._choices.items()}
+        self._bitmasks = {name: grow(column, 0) for name, column in self._bitmasks.items()}
+
+    def append(self, student) -> int:
+        """Add a student in a new row and bind it to the row.
+
+        Args:
+            student: Student object to store.
+
+        Returns:
+            Row index of the student.
+        """
+        return self.extend([student]).start
+
+    def extend(self, students: list) -> range:
+        """Add a batch of students in new rows, encoding all their vectors at once.
+
+        Args:
+            students: List of Student objects to store.
+
+        Returns:
+            Range of the new row indices.
+        """
+        rows = range(self.size, self.size + len(students))
+        self.reserve(rows.stop)
+        self.size = rows.stop
+        self.__write(rows.start, students)
+        return rows
+
+    def assign(self, row: int, student):
+        """Write a student's attributes and vectors into a row and bind it to the row.
+
+        Args:
+            row: Row index, must be in use.
+            student: Student object to store.
+        """
+        self.__write(row, [student])
+
+    @instrumentation.timed("store.encode")
+    def __write(self, start: int, students: list):
+        """Write the columns and vectors of consecutive rows and bind the students.
+
+        Args:
+            start: First row index.
+            students: Student objects of rows start, start + 1, ...
+        """
+        rows = slice(start, start + len(students))
+        choices, bitmasks = student_columns(students)
+        for name, column in choices.items():
+            self._choices[name][rows] = column
+        for name, column in bitmasks.items():
+            self._bitmasks[name][rows] = column
+        self.encoder.encode_into(choices, bitmasks, self._have[rows], self._want[rows])
+        for row, student in enumerate(students, start):
+            student._bind(self, row)
+
+    def reencode(self, encoder: VectorEncoder = None):
+        """Rebuild every vector from the categorical columns, e.g. after a CONFIG change.
+
+        Args:
+            encoder: New encoder to use, the current one when None.
+        """
+        if encoder is not None and encoder.dim != self.encoder.dim:
+            self._have = np.zeros((self.capacity, encoder.dim), dtype=np.float64)
+            self._want = np.zeros((self.capacity, encoder.dim), dtype=np.float64)
+        self.encoder = encoder or self.encoder
+        choices = {name: self.column(name) for name in CHOICE_COLUMNS}
+        bitmasks = {name: self.column(name) for name in BITMASK_COLUMNS}
+        self.encoder.encode_into(choices, bitmasks, self.have, self.want)
+
+    def move(self, source: int, target: int, student):
+        """Copy row source into row target and rebind its student.
+
+        Args:
+            source: Row index to copy from.
+            target: Row index to copy to.
+            student: Student object bound to the source row.
+        """
+        self._have[target], self._want[target] = self._have[source], self._want[source]
+        for column in list(self._choices.values()) + list(self._bitmasks.values()):
+            column[target] = column[source]
+        student._bind(self, target)
+
+    def pop(self):
+        """Drop the last row."""
+        self.size -= 1
@@ -0,0 +1,73 @@
+"""Synthetic roster generator for benchmarks.
+
+Students are drawn at random within the choice cardinalities of CONFIG, with a
+share of "no preference" answers, so the vectors look like real submissions
+whatever the configured questions are.
+"""
+
+import numpy as np
+
+from ATA.config import CONFIG
+from ATA.encoder import CHOICE_COLUMNS, BITMASK_COLUMNS
+from ATA.models import Student
+
+# Share of optional single-choice answers left as "no preference" (None)
+NO_PREFERENCE_RATE = 0.1
+
+# Columns that always have an answer
+REQUIRED_COLUMNS = ("skill_level", "backgrounds_preference")
+
+# Maximum number of choices picked in a multiple-choice column
+MAX_BITMASK_CHOICES = 3
+
+
+def choice_count(name: str) -> int:
+    """Number of valid choices of a single-choice column."""
+    return len(CONFIG[name]["choices"]) if name in CONFIG else 2  # backgrounds_preference: same / different
+
+
+def generate_records(n: int, seed: int = 0) -> list[dict]:
+    """Generate random student records, in the format of Student.get_json.
+
+    Args:
+        n: Number of students.
+        seed: Random seed, the same seed gives the same roster.
+
+    Returns:
+        List of n record dictionaries with unique emails.
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name in CHOICE_COLUMNS:
+        values = rng.integers(choice_count(name), size=n).tolist()
+        if name not in REQUIRED_COLUMNS:
+            skipped = rng.random(n) < NO_PREFERENCE_RATE
+            values = [None if skip else value for value, skip in zip(values, skipped)]
+        columns[name] = values
+    for name in BITMASK_COLUMNS:
+        choices = len(CONFIG[name]["choices"])
+        counts = rng.integers(1, MAX_BITMASK_CHOICES + 1, size=n)
+        columns[name] = [sorted(rng.choice(choices, size=min(count, choices), replace=False).tolist())
+                         for count in counts]
+    return [
+        {
+            "first_name": f"Student{i}",
+            "email": f"student{i}@bench.test",
+            **{name: values[i] for name, values in columns.items()},
+            "project_summary": f"Project idea {i}",
+        }
+        for i in range(n)
+    ]
+
+
+def generate_students(n: int, seed: int = 0) -> list[Student]:
+    """Generate random Student objects, validated like real submissions.
+
+    Args:
+        n: Number of students.
+        seed: Random seed.
+
+    Returns:
+        List of n Student objects.
+    """
+    return [Student.from_json(record) for record in generate_records(n, seed)]
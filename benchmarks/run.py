@@ -0,0 +1,245 @@
+"""Benchmark harness for matching, persistence and API latency.
+
+Times every stage of a course's life on synthetic rosters (see benchmarks.roster)
+and prints the results as JSON, so two commits can be compared with a plain diff:
+
+    python -m benchmarks.run --sizes 100 1000 5000 20000 --output bench.json
+
+Rosters larger than --exact-limit are matched with candidate pairs (see
+Course.team_matching), as the n x n score matrix and pair ranking would not fit in
+memory; the exact score matrix stages are skipped for them. The API is called
+in-process through the FastAPI TestClient, on a temporary database.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from ATA import pickle_ops, server
+from ATA.course_cache import CourseCache
+from ATA.encoder import DEFAULT_ENCODER
+from ATA.matching import team_objective
+from ATA.models import Course, Student
+from ATA.scoring import PairRanking, allocate_score_matrix, candidate_pair_ranking, crush_score_matrix
+from benchmarks.roster import generate_records
+
+# Cohort sizes benchmarked by default
+DEFAULT_SIZES = (100, 1000, 5000, 20000)
+
+# Largest roster matched with the exact n x n score matrix
+EXACT_LIMIT = 5000
+
+# Partners per student in candidate pair mode
+CANDIDATES = 32
+
+# Team size used for matching
+TEAM_SIZE = 3
+
+# Number of single-student updates timed
+UPDATES = 20
+
+# Number of requests timed per API endpoint
+REQUESTS = 50
+
+
+def timed(function, repeat: int = 1):
+    """Call a function repeat times.
+
+    Args:
+        function: Function without arguments.
+        repeat: Number of calls.
+
+    Returns:
+        Tuple of (fastest call in seconds, result of the last call).
+    """
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def latency(function, count: int) -> dict:
+    """Call a function count times and summarize the latencies.
+
+    Returns:
+        Dictionary of the median, 95th percentile and mean latency in seconds.
+    """
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return {"p50": float(np.percentile(samples, 50)), "p95": float(np.percentile(samples, 95)),
+            "mean": float(np.mean(samples))}
+
+
+def bench_course(records: list[dict], repeat: int, exact_limit: int) -> dict:
+    """Time vector construction, scoring, matching, updates and persistence of one roster.
+
+    Args:
+        records: Student records of the roster.
+        repeat: Number of runs of the fast stages, the fastest is kept.
+        exact_limit: Largest roster matched with the exact score matrix.
+
+    Returns:
+        Dictionary of "timings" (seconds), "sizes" (bytes) and "quality" of the matching.
+    """
+    n = len(records)
+    exact = n <= exact_limit
+    timings, sizes = {}, {}
+
+    timings["parse"], students = timed(lambda: [Student.from_json(record) for record in records], repeat)
+    timings["encode_vectors"], _ = timed(lambda: DEFAULT_ENCODER.encode(students), repeat)
+    timings["course_build"], course = timed(lambda: Course([Student.from_json(record) for record in records]))
+    have, want = course.array_of_have, course.array_of_want
+
+    if exact:
+        def crush():
+            scores = allocate_score_matrix(n)
+            crush_score_matrix(have, want, scores)
+            return scores
+        timings["crush_matrix"], scores = timed(crush, repeat)
+        timings["pair_ranking"], _ = timed(lambda: PairRanking(scores[:n, :n]), repeat)
+        del scores
+        timings["prepare"], _ = timed(course.prepare)
+        timings["team_matching"], _ = timed(lambda: course.team_matching(TEAM_SIZE))
+    else:
+        timings["candidate_ranking"], _ = timed(lambda: candidate_pair_ranking(have, want, CANDIDATES), repeat)
+        timings["team_matching"], _ = timed(lambda: course.team_matching(TEAM_SIZE, candidates=CANDIDATES))
+
+    members = [[course._slot_by_email[student.email] for student in team.students] for team in course.teams]
+    quality = {"objective": team_objective(have, want, members), "teams": len(course.teams)}
+
+    # a handful of resubmissions, each rescoring only the student's row and column
+    def update(i: int):
+        course.update_student(Student.from_json(dict(records[i], skill_level=(records[i]["skill_level"] + 1) % 3)))
+        if exact:
+            course.prepare()
+    timings["update_student"], _ = timed(lambda: [update(i) for i in range(0, n, max(1, n // UPDATES))])
+    timings["update_student"] /= len(range(0, n, max(1, n // UPDATES)))
+
+    timings["pickle_dumps"], data = timed(lambda: pickle.dumps(course), repeat)
+    timings["pickle_loads"], _ = timed(lambda: pickle.loads(data), repeat)
+    sizes["pickle_bytes"] = len(data)
+
+    timings["save_data"], _ = timed(lambda: pickle_ops.save_data(course), repeat)
+    timings["load_data"], _ = timed(pickle_ops.load_data, repeat)
+    timings["write_students"], _ = timed(lambda: pickle_ops.write_students(course.students), repeat)
+    sizes["database_bytes"] = sum(os.path.getsize(pickle_ops.DATA_FILEPATH + suffix)
+                                  for suffix in ("", "-wal") if os.path.exists(pickle_ops.DATA_FILEPATH + suffix))
+    return {"mode": "exact" if exact else f"candidates={CANDIDATES}", "timings": timings, "sizes": sizes,
+            "quality": quality}
+
+
+def bench_api(records: list[dict]) -> dict:
+    """Time the API endpoints in-process, on the database saved by bench_course.
+
+    Args:
+        records: Student records of the roster, already saved with teams.
+
+    Returns:
+        Dictionary of latency summaries per endpoint, and the bulk import time in seconds.
+    """
+    from fastapi.testclient import TestClient
+
+    default_cache = server.cache
+    server.cache = CourseCache()  # a fresh cache, on the database of this roster
+    results = {}
+    try:
+        with TestClient(server.app) as client:
+            emails = [records[i]["email"] for i in np.linspace(0, len(records) - 1, REQUESTS).astype(int)]
+            calls = iter(emails * 3)
+            results["check_status"] = latency(lambda: client.get("/check_status", params={"email": next(calls)}),
+                                              REQUESTS)
+            results["result"] = latency(lambda: client.get("/result", params={"email": next(calls)}), REQUESTS)
+            results["teams_export"] = latency(lambda: client.get("/teams"), max(1, REQUESTS // 10))
+            submissions = iter(records)
+            results["student_submit"] = latency(
+                lambda: client.post("/student_submit", data={"data": json.dumps(next(submissions))}),
+                min(REQUESTS, len(records)))
+
+            roster = "\n".join(json.dumps(record) for record in records)
+            results["students_bulk"], response = timed(
+                lambda: client.post("/students/bulk", files={"file": ("roster.jsonl", roster)}))
+            assert response.json()["status"] == "ok", response.json()
+    finally:
+        server.cache = default_cache
+    return results
+
+
+def environment() -> dict:
+    """Describe the machine and code the benchmarks ran on."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+
+def run(sizes: list[int], repeat: int = 3, exact_limit: int = EXACT_LIMIT, api: bool = True, seed: int = 0) -> dict:
+    """Benchmark every roster size on a temporary database.
+
+    Args:
+        sizes: Cohort sizes.
+        repeat: Number of runs of the fast stages.
+        exact_limit: Largest roster matched with the exact score matrix.
+        api: Whether to time the API endpoints too.
+        seed: Seed of the synthetic rosters.
+
+    Returns:
+        Dictionary with the "environment" and one entry of "results" per size.
+    """
+    paths = pickle_ops.DATA_FILEPATH, pickle_ops.LEGACY_PICKLE_FILEPATH
+    results = []
+    try:
+        for n in sizes:
+            with tempfile.TemporaryDirectory() as directory:
+                pickle_ops.DATA_FILEPATH = os.path.join(directory, "data.db")
+                pickle_ops.LEGACY_PICKLE_FILEPATH = os.path.join(directory, "data.pkl")
+                records = generate_records(n, seed)
+                result = {"n": n, **bench_course(records, repeat, exact_limit)}
+                if api:
+                    result["api"] = bench_api(records)
+                results.append(result)
+                print(f"n={n} done", file=sys.stderr)
+    finally:
+        pickle_ops.DATA_FILEPATH, pickle_ops.LEGACY_PICKLE_FILEPATH = paths
+    return {"environment": environment(), "results": results}
+
+
+def main():
+    """Parse the command line, run the benchmarks and write the JSON results."""
+    parser = argparse.ArgumentParser(description="Benchmark ATA matching, persistence and API latency.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="cohort sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of the fast stages, the fastest is kept")
+    parser.add_argument("--exact-limit", type=int, default=EXACT_LIMIT,
+                        help="largest cohort matched with the exact score matrix")
+    parser.add_argument("--no-api", action="store_true", help="skip the API endpoints")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic rosters")
+    parser.add_argument("--output", help="JSON file to write, standard output when omitted")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.repeat, args.exact_limit, not args.no_api, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,5 +6,50 @@ set -e
 # Run vector construction and team matching tests
 python3 -m unittest test.test_construct_vector -v
 
+# Run vectorized score kernel tests
+python3 -m unittest test.test_scoring -v
+
+# Run team matching core tests
+python3 -m unittest test.test_matching -v
+
+# Run course student management tests
+python3 -m unittest test.test_course -v
+
+# Run score matrix cache tests
+python3 -m unittest test.test_score_cache -v
+
+# Run student store tests
+python3 -m unittest test.test_store -v
+
+# Run data persistence tests
+python3 -m unittest test.test_pickle_ops -v
+
+# Run roster import tests
+python3 -m unittest test.test_roster_io -v
+
+# Run in-memory server course tests
+python3 -m unittest test.test_course_cache -v
+
+# Run result notification tests
+python3 -m unittest test.test_notifications -v
+
+# Run conditional GET and result payload cache tests
+python3 -m unittest test.test_http_cache -v
+
+# Run result export tests
+python3 -m unittest test.test_export -v
+
+# Run background matching job tests
+python3 -m unittest test.test_jobs -v
+
+# Run multi-course tenancy tests
+python3 -m unittest test.test_tenancy -v
+
+# Run instrumentation tests
+python3 -m unittest test.test_instrumentation -v
+
+# Run benchmark harness tests
+python3 -m unittest test.test_benchmarks -v
+
 # Run backend API server tests
 python3 -m unittest test.test_backend_server_local -v
\ No newline at end of file
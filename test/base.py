@@ -0,0 +1,45 @@
+"""Base test cases shared by the persistence and API server test suites.
+
+DataTestCase points every data file path to a temporary directory, so tests
+never touch data/. ServerTestCase also gives the server fresh course caches and
+job manager, and starts the app with the FastAPI TestClient.
+"""
+
+import os
+import tempfile
+import unittest
+from fastapi.testclient import TestClient
+from ATA import pickle_ops, server
+from ATA.course_cache import CourseCache
+from ATA.jobs import JobManager
+
+
+class DataTestCase(unittest.TestCase):
+    """Test case whose database and course files live in a temporary directory."""
+
+    def setUp(self):
+        """Point the data file paths to a temporary directory."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = pickle_ops.DATA_FILEPATH, pickle_ops.LEGACY_PICKLE_FILEPATH, pickle_ops.COURSES_DIR
+        pickle_ops.DATA_FILEPATH = os.path.join(self.tmp.name, "data.db")
+        pickle_ops.LEGACY_PICKLE_FILEPATH = os.path.join(self.tmp.name, "data.pkl")
+        pickle_ops.COURSES_DIR = os.path.join(self.tmp.name, "courses")
+
+    def tearDown(self):
+        pickle_ops.DATA_FILEPATH, pickle_ops.LEGACY_PICKLE_FILEPATH, pickle_ops.COURSES_DIR = self.paths
+        self.tmp.cleanup()
+
+
+class ServerTestCase(DataTestCase):
+    """Test case running the app on a temporary database, with self.client started."""
+
+    def setUp(self):
+        """Point the data file paths to a temporary directory and start the app with fresh caches."""
+        super().setUp()
+        server.cache, server.caches, server.jobs = CourseCache(), {}, JobManager()
+        self.client = TestClient(server.app)
+        self.client.__enter__()
+
+    def tearDown(self):
+        self.client.__exit__(None, None, None)
+        super().tearDown()
@@ -0,0 +1,44 @@
+"""Test suite for the benchmark harness.
+
+Tests that synthetic rosters stay within the CONFIG choices and that a tiny
+benchmark run reports every stage, so the harness doesn't rot between runs.
+"""
+
+import json
+import unittest
+from ATA import server
+from ATA.config import CONFIG
+from benchmarks import roster
+from benchmarks.run import run
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Test the synthetic roster generator and the benchmark run."""
+
+    def test_roster_respects_config(self):
+        """Test generated records are valid submissions, reproducible from the seed."""
+        records = roster.generate_records(200, seed=1)
+        self.assertEqual(records, roster.generate_records(200, seed=1))
+        self.assertEqual(len({record["email"] for record in records}), 200)
+        for record in records:
+            self.assertIn(record["skill_level"], range(len(CONFIG["skill_level"]["choices"])))
+            self.assertTrue(set(record["hobbies"]) <= set(range(len(CONFIG["hobbies"]["choices"]))))
+        self.assertEqual(len(roster.generate_students(200, seed=1)), 200)  # validated by Student.from_json
+
+    def test_run(self):
+        """Test a run reports timings, sizes, quality and API latencies for every size, as JSON."""
+        cache = server.cache
+        report = json.loads(json.dumps(run([30, 60], repeat=1, exact_limit=40)))
+        self.assertIs(server.cache, cache)  # the server module is left as it was
+        self.assertEqual([result["n"] for result in report["results"]], [30, 60])
+        exact, sparse = report["results"]
+        self.assertEqual(exact["mode"], "exact")
+        self.assertIn("crush_matrix", exact["timings"])
+        self.assertIn("candidate_ranking", sparse["timings"])
+        self.assertEqual(exact["quality"]["teams"], 10)
+        self.assertGreater(sparse["sizes"]["database_bytes"], 0)
+        self.assertIn("p95", sparse["api"]["student_submit"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,6 +8,7 @@ import unittest
 import numpy as np
 from ATA.models import Student, Course
 from ATA.config import CONFIG
+from ATA.encoder import VectorEncoder, DEFAULT_ENCODER
 import json
 import math
 
@@ -192,6 +193,39 @@ class TestMoreStudents(unittest.TestCase):
                 self.fail(f"Failed to construct vector for {email}: {e}")
 
 
+class TestBatchEncoder(unittest.TestCase):
+    """Test the compiled batch encoder."""
+
+    def test_batch_matches_single(self):
+        """Test encoding a batch gives the same rows as encoding each student."""
+        students = load_all_test_students_helper("test/test_user.json")
+        have, want = DEFAULT_ENCODER.encode(students)
+        for row, student in enumerate(students):
+            vector_have, vector_want = student.construct_vector()
+            np.testing.assert_allclose(have[row], vector_have, atol=1e-6)
+            np.testing.assert_allclose(want[row], vector_want, atol=1e-6)
+
+    def test_layout_follows_config(self):
+        """Test block offsets and weights are compiled from CONFIG."""
+        encoder = VectorEncoder(CONFIG)
+        self.assertEqual(encoder.dim, sum(len(attribute["choices"]) for attribute in CONFIG.values()))
+        name, offset, width, weight = encoder.blocks[1]
+        self.assertEqual((name, offset, width), ("ambition", 3, 2))
+        self.assertAlmostEqual(weight, CONFIG["ambition"]["weight"] / math.sqrt(2))
+
+    def test_reencode_after_config_change(self):
+        """Test a course rebuilds every vector with a new encoder."""
+        students = load_all_test_students_helper("test/test_user.json")
+        course = Course(students)
+        config = {name: dict(attribute) for name, attribute in CONFIG.items()}
+        config["hobbies"]["weight"] = 5
+        encoder = VectorEncoder(config)
+        course.reencode_vectors(encoder)
+        have, want = encoder.encode(students)
+        np.testing.assert_allclose(course.array_of_have, have, atol=1e-6)
+        np.testing.assert_allclose(course.array_of_want, want, atol=1e-6)
+
+
 class TestTeamMatching(unittest.TestCase):
     """Test team matching functionality."""
     
@@ -0,0 +1,286 @@
+"""Test suite for Course student management.
+
+Tests that adding, updating and removing students keeps the incrementally
+maintained vectors and score matrix equal to a full recalculation.
+"""
+
+import pickle
+import unittest
+import numpy as np
+from ATA.config import CONFIG
+from ATA.encoder import VectorEncoder
+from ATA.models import Student, Course
+from benchmarks.roster import generate_students
+from test.test_construct_vector import load_all_test_students_helper
+
+
+def make_student(email: str, skill_level: int = 0, hobbies: set[int] = None) -> Student:
+    """Create a Student with simple default attributes.
+
+    Args:
+        email: Email address of the student.
+        skill_level: Skill level index.
+        hobbies: Set of hobby indices.
+
+    Returns:
+        Student object.
+    """
+    return Student(
+        first_name=email.split("@")[0],
+        email=email,
+        skill_level=skill_level,
+        ambition=0,
+        role=skill_level % 2,
+        teamwork_style=None,
+        pace=1,
+        backgrounds={skill_level},
+        backgrounds_preference=1,
+        hobbies=hobbies if hobbies is not None else {0},
+        project_summary="test"
+    )
+
+
+def expected_score_matrix(course: Course) -> np.ndarray:
+    """Recalculate the normalized score matrix from scratch.
+
+    Args:
+        course: Course whose students are scored.
+
+    Returns:
+        Normalized score matrix (n x n).
+    """
+    have = np.array([student.vector_have for student in course.students])
+    want = np.array([student.vector_want for student in course.students])
+    score_matrix = have @ want.T
+    np.fill_diagonal(score_matrix, 0)
+    return score_matrix / score_matrix.max()
+
+
+class TestIncrementalScores(unittest.TestCase):
+    """Test incremental score updates against a full recalculation."""
+
+    def setUp(self):
+        self.course = Course(load_all_test_students_helper("test/test_user.json"))
+
+    def assert_scores_consistent(self):
+        """Assert buffers and scores match the current students."""
+        course = self.course
+        np.testing.assert_allclose(course.array_of_have, [s.vector_have for s in course.students], atol=1e-6)
+        np.testing.assert_allclose(course.array_of_want, [s.vector_want for s in course.students], atol=1e-6)
+        course.team_matching(max_size=3)
+        np.testing.assert_allclose(course.score_matrix, expected_score_matrix(course), atol=1e-6)
+
+    def test_add_students(self):
+        """Test adding students after construction."""
+        self.course.add_students([make_student(f"new{i}@test.com", i % 3) for i in range(20)])
+        self.assert_scores_consistent()
+
+    def test_update_student(self):
+        """Test replacing a student keeps one entry and rescoring is correct."""
+        email = self.course.students[2].email
+        self.course.update_student(make_student(email, 2, {3, 4}))
+        self.assertEqual(len([s for s in self.course.students if s.email == email]), 1)
+        self.assert_scores_consistent()
+
+    def test_update_student_in_team(self):
+        """Test updating a student who is already in a team keeps the team."""
+        self.course.team_matching(max_size=3)
+        old = self.course.students[0]
+        self.course.update_student(make_student(old.email, 1))
+        new = self.course.get_student_by_email(old.email)
+        self.assertEqual(new.team_id, old.team_id)
+        self.assertIn(new, self.course.get_team_by_team_id(new.team_id).students)
+        self.assertNotIn(old, self.course.get_team_by_team_id(new.team_id).students)
+
+    def test_update_student_in_team_uses_course_encoder(self):
+        """Test the team of an updated student is recalculated from the vectors of the course's encoder."""
+        config = {name: dict(attribute) for name, attribute in CONFIG.items()}
+        config["hobbies"]["weight"] = 5
+        self.course.reencode_vectors(VectorEncoder(config))
+        self.course.team_matching(max_size=3)
+        email = self.course.students[0].email
+        self.course.update_student(make_student(email, 1, {2}))
+
+        team = self.course.get_team_by_team_id(self.course.get_student_by_email(email).team_id)
+        slots = [self.course.students.index(student) for student in team.students]
+        np.testing.assert_allclose(team.vector_have, self.course.array_of_have[slots].mean(axis=0), atol=1e-6)
+        np.testing.assert_allclose(team.vector_want, self.course.array_of_want[slots].mean(axis=0), atol=1e-6)
+
+    def test_matching_generation(self):
+        """Test the matching generation changes with the teams, not with unassigned students."""
+        course = self.course
+        start = course.matching_generation
+        course.update_student(make_student(course.students[0].email, 1))
+        course.add_students([make_student("new@test.com", 0)])
+        self.assertEqual(course.matching_generation, start)
+        course.team_matching(max_size=3)
+        matched = course.matching_generation
+        self.assertGreater(matched, start)
+        course.update_student(make_student(course.students[0].email, 2))  # shown in the team's result
+        self.assertGreater(course.matching_generation, matched)
+
+    def test_remove_student(self):
+        """Test removing students from the middle and the end."""
+        count = len(self.course.students)
+        self.course.remove_student_by_email(self.course.students[1].email)
+        self.course.remove_student_by_email(self.course.students[-1].email)
+        self.assertEqual(len(self.course.students), count - 2)
+        self.assert_scores_consistent()
+
+    def test_remove_unknown_student(self):
+        """Test removing an unknown email raises ValueError."""
+        with self.assertRaises(ValueError):
+            self.course.remove_student_by_email("nobody@test.com")
+
+    def test_every_student_is_matched(self):
+        """Test every student ends up in exactly one team."""
+        self.course.team_matching(max_size=3)
+        members = [student.email for team in self.course.teams for student in team.students]
+        self.assertEqual(sorted(members), sorted(student.email for student in self.course.students))
+        self.assertFalse(self.course.student_not_in_team)
+
+    def test_team_sizes(self):
+        """Test the number of teams and their sizes for several cohort sizes."""
+        for count in (1, 2, 5, 7, 30):
+            course = Course([make_student(f"s{i}@test.com", i % 3, {i % 7}) for i in range(count)])
+            course.team_matching(max_size=3)
+            sizes = [len(team.students) for team in course.teams]
+            self.assertEqual(len(sizes), -(-count // 3))
+            self.assertEqual(sum(sizes), count)
+            self.assertLessEqual(max(sizes), 3)
+
+    def test_candidate_matching(self):
+        """Test matching on top-k candidate pairs, exact with k = n - 1 and valid teams for small k."""
+        self.course.team_matching(max_size=3)
+        exact = sorted(sorted(student.email for student in team.students) for team in self.course.teams)
+        self.course.team_matching(max_size=3, candidates=len(self.course.students) - 1)
+        self.assertEqual(sorted(sorted(student.email for student in team.students) for team in self.course.teams),
+                         exact)
+
+        course = Course([make_student(f"s{i}@test.com", i % 3, {i % 7}) for i in range(100)])
+        for k in (1, 3):
+            course.team_matching(max_size=4, candidates=k)
+            sizes = [len(team.students) for team in course.teams]
+            self.assertEqual((len(sizes), sum(sizes)), (25, 100))
+            self.assertLessEqual(max(sizes), 4)
+        self.assertFalse(course._prepared)  # the n x n matching state was never built
+
+
+class TestLazyMatchingState(unittest.TestCase):
+    """Test the lazily built, dirty-flagged matching state."""
+
+    def setUp(self):
+        self.course = Course(load_all_test_students_helper("test/test_user.json"))
+
+    def test_prepare_is_cached(self):
+        """Test prepare() builds once and mutations mark the state stale."""
+        self.course.prepare()
+        ranking = self.course.pair_ranking
+        self.course.prepare()
+        self.assertIs(self.course.pair_ranking, ranking)
+
+        self.course.add_students([make_student("late@test.com", 2)])
+        self.assertIsNot(self.course.pair_ranking, ranking)
+        np.testing.assert_allclose(self.course.score_matrix, expected_score_matrix(self.course), atol=1e-6)
+
+    def test_incremental_rescore_after_prepare(self):
+        """Test a few changes after prepare() are rescored correctly."""
+        self.course.add_students([make_student(f"new{i}@test.com", i % 3) for i in range(40)])
+        self.course.prepare()
+        self.course.update_student(make_student("new3@test.com", 1, {5}))
+        self.course.remove_student_by_email("new7@test.com")
+        self.course.add_students([make_student("late@test.com", 2)])
+        np.testing.assert_allclose(self.course.score_matrix, expected_score_matrix(self.course), atol=1e-6)
+
+    def test_rescale_when_max_changes(self):
+        """Test the scores are renormalized when the student holding the largest score leaves."""
+        self.course.SCORE_BLOCK_ROWS = 3  # several blocks even for a small course
+        self.course.add_students([make_student(f"new{i}@test.com", i % 3) for i in range(40)])
+        self.course.prepare()
+        best = int(np.argmax(self.course.score_matrix.max(axis=1)))
+        self.course.remove_student_by_email(self.course.students[best].email)
+        np.testing.assert_allclose(self.course.score_matrix, expected_score_matrix(self.course), atol=1e-6)
+        self.assertAlmostEqual(float(self.course.score_matrix.max()), 1.0, places=6)
+
+    def test_ranking_matches_sorted_pop_order(self):
+        """Test the pairs of random rosters come in the order of popping from the original sorted list.
+
+        Scores that are equal on paper can differ in the last bit, depending on which vector
+        slots they add up: the float64 scores must round exactly like the original calculation
+        for these near-ties to be ranked the same way.
+        """
+        for seed in range(5):
+            course = Course(generate_students(80, seed))
+            have = np.array([student.construct_vector()[0] for student in course.students])
+            want = np.array([student.construct_vector()[1] for student in course.students])
+            score_matrix = have @ want.T  # the original calculation, in one product
+            np.fill_diagonal(score_matrix, 0)
+            score_matrix = score_matrix / score_matrix.max()
+            n = len(course.students)
+            pair_list = [(i, j, (score_matrix[i, j] + score_matrix[j, i]) / 2)
+                         for i in range(n) for j in range(i + 1, n)]
+            pair_list.sort(key=lambda pair: pair[2])
+            expected = [(i, j) for i, j, _ in reversed(pair_list)]  # order of pop()
+            self.assertEqual(list(course.pair_ranking.iter_pairs(chunk_size=16)), expected)
+
+    def test_pickle_skips_derived_state(self):
+        """Test the pickle carries no matrices and the state is rebuilt after loading."""
+        self.course.team_matching(max_size=3)
+        state = self.course.__getstate__()
+        self.assertNotIn("_score_buffer", state)
+        self.assertNotIn("_pair_ranking", state)
+
+        loaded = pickle.loads(pickle.dumps(self.course))
+        self.assertEqual([s.email for s in loaded.students], [s.email for s in self.course.students])
+        np.testing.assert_allclose(loaded.score_matrix, self.course.score_matrix, atol=1e-6)
+
+
+class TestIndexes(unittest.TestCase):
+    """Test the email, team_id and not-in-team indexes stay consistent."""
+
+    def setUp(self):
+        self.course = Course(load_all_test_students_helper("test/test_user.json"))
+
+    def assert_indexes_consistent(self, course: Course):
+        """Assert every index agrees with the students and teams lists."""
+        for student in course.students:
+            self.assertIs(course.get_student_by_email(student.email), student)
+        for team in course.teams:
+            self.assertIs(course.get_team_by_team_id(team.team_id), team)
+        self.assertEqual(course.student_not_in_team, [s for s in course.students if s.team_id is None])
+
+    def test_mutations_keep_indexes(self):
+        """Test indexes after matching, updates, removals and clearing."""
+        course = self.course
+        course.team_matching(max_size=3)
+        self.assert_indexes_consistent(course)
+
+        course.update_student(make_student(course.students[0].email, 2))
+        course.remove_student_by_email(course.students[1].email)
+        course.add_students([make_student("late@test.com", 1)])
+        self.assert_indexes_consistent(course)
+        with self.assertRaises(ValueError):
+            course.get_student_by_email(course.students[1].email + ".removed")
+
+        course.clear_team_assignments()
+        self.assert_indexes_consistent(course)
+        with self.assertRaises(ValueError):
+            course.get_team_by_team_id("1")
+
+    def test_add_existing_email_updates(self):
+        """Test adding a student with an existing email replaces it."""
+        count = len(self.course.students)
+        email = self.course.students[0].email
+        self.course.add_students([make_student(email, 2)])
+        self.assertEqual(len(self.course.students), count)
+        self.assertEqual(self.course.get_student_by_email(email).skill_level, 2)
+
+    def test_indexes_rebuilt_on_unpickle(self):
+        """Test the indexes are rebuilt after loading a pickle."""
+        self.course.team_matching(max_size=3)
+        loaded = pickle.loads(pickle.dumps(self.course))
+        self.assert_indexes_consistent(loaded)
+
+
+if __name__ == '__main__':
+    unittest.main()
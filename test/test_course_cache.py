@@ -0,0 +1,126 @@
+"""Test suite for the in-memory course of the API server.
+
+Tests that submissions are saved by the single writer in batches and served
+from memory, and that changes written by another process (the CLI) are picked up. Uses a
+temporary database and the FastAPI TestClient.
+"""
+
+import asyncio
+import json
+import unittest
+from ATA import pickle_ops, server
+from ATA.models import Course
+from test.base import ServerTestCase
+from test.test_construct_vector import load_all_test_students_helper
+from test.test_course import make_student
+
+
+class TestCourseCache(ServerTestCase):
+    """Test the server's CourseCache through the API endpoints."""
+
+    def submit(self, email: str):
+        """Submit a student of test_user.json, returning the sequence number."""
+        with open("test/test_user.json", "r") as f:
+            data = json.load(f)["students"][email]
+        response = self.client.post("/student_submit", data={"data": json.dumps(data)})
+        self.assertEqual(response.json()["status"], "ok")
+        return response.json()["sequence"]
+
+    def test_submit_saved_before_ack(self):
+        """Test a submission is in the database and in memory once acked."""
+        self.assertEqual(self.submit("alice@test.com"), 1)
+        self.assertEqual(pickle_ops.load_data().get_student_by_email("alice@test.com").first_name, "Alice")
+        self.assertEqual(server.cache.generation, pickle_ops.load_generation())
+        self.assertEqual(self.client.get("/check_status", params={"email": "alice@test.com"}).json(),
+                         {"status": "ok", "has_result": False})
+
+    def test_concurrent_submissions_batched(self):
+        """Test concurrent submissions are all saved, in fewer transactions than submissions."""
+        students = [make_student(f"s{i}@test.com", i % 3) for i in range(200)]
+
+        async def submit_all():
+            return await asyncio.gather(*(server.cache.submit(student) for student in students))
+
+        sequences = self.client.portal.call(submit_all)
+        self.assertEqual(sorted(sequences), list(range(1, 201)))
+        self.assertEqual(len(pickle_ops.load_data().students), 200)
+        self.assertEqual(len(server.cache.course.students), 200)
+        self.assertLess(pickle_ops.load_generation(), 200)
+
+    def test_invalid_submission(self):
+        """Test invalid data is rejected before it is queued."""
+        response = self.client.post("/student_submit", data={"data": json.dumps({"email": "x@test.com"})})
+        self.assertEqual(response.json()["status"], "error")
+        data = make_student("x@test.com").get_json()
+        data["skill_level"] = 7
+        response = self.client.post("/student_submit", data={"data": json.dumps(data)})
+        self.assertEqual(response.json(), {"status": "error", "message": "Invalid skill_level: 7"})
+        data["skill_level"] = None  # the only required choice
+        response = self.client.post("/student_submit", data={"data": json.dumps(data)})
+        self.assertEqual(response.json(), {"status": "error", "message": "Invalid skill_level: None"})
+        response = self.client.post("/student_submit", data={"data": json.dumps([data])})
+        self.assertEqual(response.json(), {"status": "error",
+                                           "message": "Invalid student data: expected an object, got list"})
+        self.assertEqual(server.cache.sequence, 0)
+
+    def test_bulk_import(self):
+        """Test a 5,000 student JSONL roster is imported in one submission."""
+        server.cache.RELOAD_CHECK_INTERVAL = 0
+        self.submit("alice@test.com")
+        records = [make_student(f"s{i}@test.com", i % 3, {i % 7}).get_json() for i in range(5000)]
+        records.append(dict(make_student("alice@test.com", 2).get_json(), first_name="Alicia"))
+        roster = "\n".join(json.dumps(record) for record in records)
+
+        response = self.client.post("/students/bulk", files={"file": ("roster.jsonl", roster)}).json()
+        self.assertEqual(response, {"status": "ok", "imported": 5001, "sequence": 2})
+        self.assertEqual(len(server.cache.course.students), 5001)
+        self.assertEqual(pickle_ops.load_data().get_student_by_email("alice@test.com").first_name, "Alicia")
+        self.assertEqual(pickle_ops.load_generation(), 2)
+
+        response = self.client.post("/students/bulk", files={"file": ("roster.txt", roster)}).json()
+        self.assertEqual(response["status"], "error")
+        for roster in ("5", '{"roster": []}'):  # nothing saved, the generation doesn't change
+            response = self.client.post("/students/bulk", files={"file": ("roster.json", roster)}).json()
+            self.assertEqual(response["status"], "error")
+        self.assertEqual(pickle_ops.load_generation(), 2)
+
+    def test_reload_after_external_write(self):
+        """Test teams saved by another process are served once the generation changes."""
+        self.submit("alice@test.com")
+        loaded = server.cache.course
+
+        # the CLI saves a matched course
+        course = Course(load_all_test_students_helper("test/test_user.json"))
+        course.team_matching(max_size=3)
+        pickle_ops.save_data(course)
+
+        # not checked again before RELOAD_CHECK_INTERVAL
+        self.assertIs(self.client.portal.call(server.cache.get), loaded)
+        server.cache.RELOAD_CHECK_INTERVAL = 0
+        response = self.client.get("/result", params={"email": "alice@test.com"}).json()
+        self.assertIn("alice@test.com", response["teammates_email"])
+        self.assertIsNot(server.cache.course, loaded)
+
+    def test_matching_quality(self):
+        """Test the quality report covers every team once teams are saved by the CLI."""
+        course = Course(load_all_test_students_helper("test/test_user.json"))
+        course.team_matching(max_size=3)
+        pickle_ops.save_data(course)
+        response = self.client.get("/matching/quality").json()
+        self.assertEqual(response["status"], "ok")
+        self.assertEqual(len(response["teams"]), 6)
+        self.assertEqual(response["summary"]["students"], 18)
+        self.assertEqual(response["summary"]["max_size"], 3)
+        self.assertLessEqual(response["summary"]["worst_pair_score"], response["summary"]["min_team_score"])
+
+    def test_no_reload_without_changes(self):
+        """Test the course is kept in memory while the database is unchanged."""
+        server.cache.RELOAD_CHECK_INTERVAL = 0
+        self.submit("alice@test.com")
+        loaded = server.cache.course
+        self.client.get("/check_status", params={"email": "alice@test.com"})
+        self.assertIs(server.cache.course, loaded)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""Test suite for the JSON export of team results.
+
+Tests that team payloads are lean and serializable, that both encoders give the
+same JSON, and that GET /teams streams every team as NDJSON. Uses a temporary
+database and the FastAPI TestClient.
+"""
+
+import json
+import unittest
+from unittest import mock
+from ATA import export, pickle_ops
+from ATA.models import Course
+from test.base import ServerTestCase
+from test.test_construct_vector import load_all_test_students_helper
+
+
+class TestExport(unittest.TestCase):
+    """Test payload schemas and encoding."""
+
+    def setUp(self):
+        """Match the test students."""
+        self.course = Course(load_all_test_students_helper("test/test_user.json"))
+        self.course.team_matching(max_size=3)
+
+    def test_team_json_is_serializable(self):
+        """Test Team.get_json encodes with the standard json module, vectors only on request."""
+        team = self.course.teams[0]
+        lean = json.loads(json.dumps(team.get_json()))
+        self.assertEqual(lean["size"], len(team.students))
+        self.assertNotIn("vector_have", lean)
+        self.assertNotIn("vector_have", lean["students"][0])
+        full = json.loads(json.dumps(team.get_json(vectors=True)))
+        self.assertEqual(len(full["vector_have"]), len(team.vector_have))
+        self.assertEqual(len(full["students"][0]["vector_want"]), len(team.students[0].vector_want))
+
+    def test_result_payload(self):
+        """Test the result lists follow the team order."""
+        team = self.course.teams[0]
+        payload = export.result_payload(team)
+        self.assertEqual(payload["teammates_email"], [student.email for student in team.students])
+        self.assertEqual(payload["teammates_name"], [student.first_name for student in team.students])
+
+    def test_fallback_encoder_matches(self):
+        """Test the standard json fallback decodes to the same payload."""
+        payload = self.course.teams[0].get_json(vectors=True)
+        encoded = export.dumps(payload)
+        with mock.patch.object(export, "orjson", None):
+            fallback = export.dumps(payload)
+        self.assertEqual(json.loads(encoded), json.loads(fallback))
+
+    def test_ndjson_chunks(self):
+        """Test every team is one line, split across chunks."""
+        with mock.patch.object(export, "EXPORT_CHUNK_TEAMS", 2):
+            chunks = list(export.iter_teams_ndjson(self.course.teams))
+        self.assertEqual(len(chunks), (len(self.course.teams) + 1) // 2)
+        lines = b"".join(chunks).splitlines()
+        self.assertEqual([json.loads(line)["team_id"] for line in lines],
+                         [team.team_id for team in self.course.teams])
+
+
+class TestTeamsEndpoint(ServerTestCase):
+    """Test the GET /teams export."""
+
+    def setUp(self):
+        """Start the app on a temporary database holding a matched course."""
+        super().setUp()
+        self.course = Course(load_all_test_students_helper("test/test_user.json"))
+        self.course.team_matching(max_size=3)
+        pickle_ops.save_data(self.course)
+
+    def test_streams_every_team(self):
+        """Test every student appears once in the NDJSON export."""
+        response = self.client.get("/teams")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        teams = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(len(teams), len(self.course.teams))
+        emails = [student["email"] for team in teams for student in team["students"]]
+        self.assertEqual(sorted(emails), sorted(student.email for student in self.course.students))
+        self.assertNotIn("vector_have", teams[0])
+
+    def test_vectors_on_request(self):
+        """Test ?vectors=true adds the vectors."""
+        line = self.client.get("/teams", params={"vectors": "true"}).text.splitlines()[0]
+        self.assertIn("vector_have", json.loads(line))
+
+
+if __name__ == "__main__":
+    unittest.main()
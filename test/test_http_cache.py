@@ -0,0 +1,95 @@
+"""Test suite for conditional GET and cached result payloads.
+
+Tests the payload LRU, and that /result and /check_status send ETags, answer
+304 Not Modified to a matching If-None-Match, and change their ETag once the
+teams change. Uses a temporary database and the FastAPI TestClient.
+"""
+
+import unittest
+from ATA import pickle_ops, server
+from ATA.http_cache import PayloadCache, etag
+from ATA.models import Course
+from test.base import ServerTestCase
+from test.test_construct_vector import load_all_test_students_helper
+
+
+class TestPayloadCache(unittest.TestCase):
+    """Test the least recently used payloads."""
+
+    def test_least_recently_used_dropped(self):
+        """Test the least recently used payload is dropped when full."""
+        payloads = PayloadCache(max_entries=2)
+        payloads.put("1.1", "a", b"A")
+        payloads.put("1.1", "b", b"B")
+        self.assertEqual(payloads.get("1.1", "a"), b"A")  # a is now the most recent
+        payloads.put("1.1", "c", b"C")
+        self.assertIsNone(payloads.get("1.1", "b"))
+        self.assertEqual(payloads.get("1.1", "a"), b"A")
+
+    def test_new_version_invalidates(self):
+        """Test asking for a newer version forgets every payload."""
+        payloads = PayloadCache()
+        payloads.put("1.1", "a", b"A")
+        self.assertIsNone(payloads.get("1.2", "a"))
+        self.assertEqual(len(payloads), 0)
+
+    def test_etag_is_strong_and_per_email(self):
+        """Test ETags are quoted, strong, and differ by email and version."""
+        tag = etag("1.1", "alice@test.com")
+        self.assertTrue(tag.startswith('"') and tag.endswith('"'))
+        self.assertNotIn("alice", tag)
+        self.assertNotEqual(tag, etag("1.1", "bob@test.com"))
+        self.assertNotEqual(tag, etag("1.2", "alice@test.com"))
+
+
+class TestConditionalResults(ServerTestCase):
+    """Test ETags and 304 Not Modified on the result endpoints."""
+
+    def setUp(self):
+        """Start the app on a temporary database holding a matched course."""
+        super().setUp()
+        server.cache.RELOAD_CHECK_INTERVAL = 0
+        course = Course(load_all_test_students_helper("test/test_user.json"))
+        course.team_matching(max_size=3)
+        pickle_ops.save_data(course)
+        self.email = course.students[0].email
+
+    def test_not_modified(self):
+        """Test a repeat request with the ETag gets 304 without a body, on both endpoints."""
+        for route in ("/result", "/check_status"):
+            first = self.client.get(route, params={"email": self.email})
+            self.assertEqual(first.status_code, 200)
+            tag = first.headers["etag"]
+            repeat = self.client.get(route, params={"email": self.email}, headers={"If-None-Match": tag})
+            self.assertEqual(repeat.status_code, 304)
+            self.assertEqual(repeat.content, b"")
+            self.assertEqual(repeat.headers["etag"], tag)
+
+    def test_payload_shared_by_team(self):
+        """Test the result of a team is serialized once for all its members."""
+        first = self.client.get("/result", params={"email": self.email}).json()
+        self.assertEqual(len(server.cache.payloads), 1)
+        for teammate in first["teammates_email"]:
+            self.assertEqual(self.client.get("/result", params={"email": teammate}).json(), first)
+        self.assertEqual(len(server.cache.payloads), 1)
+
+    def test_etag_changes_with_new_teams(self):
+        """Test new teams saved by the CLI change the ETag and the cached payload."""
+        tag = self.client.get("/result", params={"email": self.email}).headers["etag"]
+        course = pickle_ops.load_data()
+        course.team_matching(max_size=2)
+        pickle_ops.save_teams(course)
+        response = self.client.get("/result", params={"email": self.email}, headers={"If-None-Match": tag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["etag"], tag)
+        self.assertLessEqual(len(response.json()["teammates_email"]), 2)
+
+    def test_unknown_student_has_no_etag(self):
+        """Test an error response can't be revalidated."""
+        response = self.client.get("/check_status", params={"email": "nobody@test.com"})
+        self.assertEqual(response.json()["status"], "error")
+        self.assertNotIn("etag", response.headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""Test suite for the timing instrumentation.
+
+Tests that nothing is recorded while instrumentation is off, that course stages,
+persistence calls and API requests are recorded when on, and that one request
+can be profiled. Uses a temporary database and the FastAPI TestClient.
+"""
+
+import json
+import os
+import unittest
+from fastapi.testclient import TestClient
+from ATA import instrumentation, pickle_ops, server
+from ATA.course_cache import CourseCache
+from ATA.models import Course
+from test.base import DataTestCase
+from test.test_construct_vector import load_all_test_students_helper
+
+
+class TestInstrumentation(DataTestCase):
+    """Test spans, the metrics middleware and the /metrics endpoint."""
+
+    def setUp(self):
+        """Point the data file paths to a temporary directory and give the app a fresh cache."""
+        super().setUp()
+        server.cache = CourseCache()
+        instrumentation.reset()
+        self.course = Course(load_all_test_students_helper("test/test_user.json"))
+
+    def tearDown(self):
+        instrumentation.enable(False)
+        instrumentation.profile_next(None)
+        instrumentation.reset()
+        super().tearDown()
+
+    def test_disabled_records_nothing(self):
+        """Test spans cost nothing and record nothing while off."""
+        instrumentation.enable(False)
+        self.course.team_matching(max_size=3)
+        pickle_ops.save_data(self.course)
+        with instrumentation.span("block"):
+            pass
+        self.assertEqual(instrumentation.snapshot(), {})
+
+    def test_course_and_persistence_spans(self):
+        """Test every stage of a matching run and of a save and load is recorded."""
+        instrumentation.enable()
+        self.course.team_matching(max_size=3)
+        pickle_ops.save_data(self.course)
+        pickle_ops.load_data()
+        spans = instrumentation.snapshot()
+        for name in ("course.prepare", "course.crush_matrix", "course.pair_ranking", "course.team_matching",
+                     "course.team_matching.greedy", "pickle_ops.save_data", "pickle_ops.load_data",
+                     "store.encode"):
+            self.assertIn(name, spans)
+        count, seconds = spans["course.team_matching"]
+        self.assertEqual(count, 1)
+        self.assertGreaterEqual(seconds, spans["course.prepare"][1])  # spans nest
+
+    def test_request_metrics(self):
+        """Test a request returns its stage timings and is counted by route in /metrics."""
+        instrumentation.enable()
+        with open("test/test_user.json", "r") as f:
+            data = json.load(f)["students"]["alice@test.com"]
+        server.cache.RELOAD_CHECK_INTERVAL = 0
+        with TestClient(server.app) as client:
+            client.post("/student_submit", data={"data": json.dumps(data)})  # written by the writer task
+            response = client.get("/check_status", params={"email": "alice@test.com"})
+            self.assertIn("pickle_ops.load_generation;dur=", response.headers["server-timing"])
+            text = client.get("/metrics").text
+        self.assertIn('ata_http_request_seconds_count{method="GET",route="/check_status",status="200"} 1', text)
+        self.assertIn('ata_span_seconds_count{span="pickle_ops.write_students"} 1', text)
+
+    def test_profile_one_request(self):
+        """Test the next request to the profiled route is dumped as cProfile stats, and only that one."""
+        directory = instrumentation.PROFILE_DIR
+        instrumentation.PROFILE_DIR = os.path.join(self.tmp.name, "profiles")
+        try:
+            instrumentation.profile_next("/health")
+            with TestClient(server.app) as client:
+                client.get("/health")
+                client.get("/health")
+            self.assertEqual(len(os.listdir(instrumentation.PROFILE_DIR)), 1)
+            self.assertEqual(instrumentation.snapshot(), {})  # profiling alone records no spans
+        finally:
+            instrumentation.PROFILE_DIR = directory
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Test suite for background team matching jobs.
+
+Tests that a job started from the API runs in a worker process while the API
+keeps answering, reports its progress, and commits its teams at once. Uses a
+temporary database and the FastAPI TestClient.
+"""
+
+import time
+import unittest
+from ATA import pickle_ops, server
+from ATA.jobs import JobManager
+from ATA.models import Course
+from test.base import ServerTestCase
+from test.test_construct_vector import load_all_test_students_helper
+
+
+class TestMatchingJobs(ServerTestCase):
+    """Test the /matching/jobs routes."""
+
+    def setUp(self):
+        """Start the app on a temporary database, with a job manager of two workers."""
+        super().setUp()
+        server.jobs = JobManager(workers=2)  # closed by the app's shutdown
+
+    def wait(self, prefix: str, job_id: str) -> dict:
+        """Poll a job until it is finished, returning its last state."""
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            job = self.client.get(f"{prefix}/matching/jobs/{job_id}").json()["job"]
+            if job["status"] in ("done", "failed"):
+                return job
+            self.assertEqual(self.client.get("/health").json(), {"status": "ok"})  # still responsive
+            time.sleep(0.05)
+        self.fail("matching job did not finish")
+
+    def test_job_commits_teams(self):
+        """Test a job forms the same teams as the CLI, committed in memory and in the database."""
+        students = load_all_test_students_helper("test/test_user.json")
+        pickle_ops.save_data(Course(students))
+        response = self.client.post("/matching/jobs", data={"max_size": 3, "refine_ms": 20}).json()
+        self.assertEqual(response["status"], "ok")
+        self.assertIn(response["job"]["phase"], ("queued", "loading"))
+
+        job = self.wait("", response["job"]["job_id"])
+        self.assertEqual((job["status"], job["phase"], job["percent"], job["teams"]), ("done", "done", 100, 6))
+        self.assertEqual(len(pickle_ops.load_data().teams), 6)
+        email = students[0].email
+        self.assertIn(email, self.client.get("/result", params={"email": email}).json()["teammates_email"])
+        pickle_ops.save_data(Course([]), pickle_ops.course_path("x"))
+        self.assertEqual(self.client.get("/courses/x/matching/jobs/" + job["job_id"]).json()["status"], "error")
+
+    def test_one_job_per_course(self):
+        """Test a second job for a course is refused while the first runs, other courses run at the same time."""
+        students = load_all_test_students_helper("test/test_user.json")
+        pickle_ops.save_data(Course(students[:9]), pickle_ops.course_path("a"))
+        pickle_ops.save_data(Course(students[9:]), pickle_ops.course_path("b"))
+        first = self.client.post("/courses/a/matching/jobs", data={"max_size": 3}).json()
+        second = self.client.post("/courses/a/matching/jobs", data={"max_size": 3}).json()
+        other = self.client.post("/courses/b/matching/jobs", data={"max_size": 3}).json()
+        self.assertEqual(second["status"], "error")
+        self.assertEqual(self.wait("/courses/a", first["job"]["job_id"])["teams"], 3)
+        self.assertEqual(self.wait("/courses/b", other["job"]["job_id"])["teams"], 3)
+
+    def test_failed_job(self):
+        """Test invalid options are refused and a course without students fails the job."""
+        self.assertEqual(self.client.post("/matching/jobs", data={"max_size": 1}).json()["status"], "error")
+        pickle_ops.save_data(Course([]), pickle_ops.course_path("empty"))
+        response = self.client.post("/courses/empty/matching/jobs", data={"max_size": 3}).json()
+        job = self.wait("/courses/empty", response["job"]["job_id"])
+        self.assertEqual((job["status"], job["error"]), ("failed", "No students to match"))
+
+
+if __name__ == '__main__':
+    unittest.main()
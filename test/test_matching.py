@@ -0,0 +1,202 @@
+"""Test suite for the team matching core.
+
+Tests the team objective and quality report against nested loops, that restarts, in this
+process or in worker processes, keep the best assignment, and that the local
+search refinement improves an assignment.
+"""
+
+import math
+import unittest
+import numpy as np
+from ATA import matching
+from ATA.models import Course
+from ATA.scoring import PairRanking, max_crush_score
+from test.test_course import make_student
+
+
+def nested_loop_matching(have: np.ndarray, want: np.ndarray, score_matrix: np.ndarray, max_size: int) -> list:
+    """Reference greedy matching with the nested loops, sorts and pops of the original Course.team_matching."""
+    n = len(have)
+    pairs = [(i, j, (score_matrix[i, j] + score_matrix[j, i]) / 2) for i in range(n) for j in range(i + 1, n)]
+    pairs.sort(key=lambda pair: pair[2])
+    num_of_group = math.ceil(n / max_size)
+    rest, teams = list(range(n)), []
+    while len(teams) < num_of_group:
+        if len(rest) + len(teams) == num_of_group:
+            while rest:
+                teams.append([rest.pop()])
+            break
+        i, j, _ = pairs.pop()
+        if i in rest and j in rest:
+            rest.remove(i)
+            rest.remove(j)
+            teams.append([i, j])
+    while rest:
+        for team in teams:
+            if not rest:
+                break
+            team_have, team_want = have[team].mean(axis=0), want[team].mean(axis=0)
+            like = sorted(((slot, (team_have @ want[slot] + team_want @ have[slot]) / 2) for slot in rest),
+                          key=lambda item: item[1])
+            team.append(like.pop()[0])
+            rest.remove(team[-1])
+    return teams
+
+
+class TestMatching(unittest.TestCase):
+    """Test team_objective, assignment_quality, best_of_restarts and refine_teams."""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.course = Course([make_student(f"s{i}@test.com", int(rng.integers(3)), {int(rng.integers(7))})
+                              for i in range(60)])
+        self.have, self.want = self.course.array_of_have, self.course.array_of_want
+
+    def test_greedy_matches_nested_loops(self):
+        """Test the greedy breaks ties like the original nested loops, on rosters with many ties.
+
+        Vectors are small integers and teams grow from one or two members, so every score is
+        exact and equal scores are true ties in both implementations.
+        """
+        for seed in range(20):
+            rng = np.random.default_rng(seed)
+            n = int(rng.integers(10, 40))
+            have = rng.integers(0, 2, (n, 6)).astype(np.float32)
+            want = rng.integers(0, 2, (n, 6)).astype(np.float32)
+            score_matrix = have @ want.T
+            np.fill_diagonal(score_matrix, 0)
+            expected = nested_loop_matching(have.astype(float), want.astype(float), score_matrix.astype(float), 3)
+            self.assertEqual(matching.match_teams(have, want, PairRanking(score_matrix), 3, block_teams=4), expected)
+
+    def test_growth_picks_best_on_rosters(self):
+        """Test every student added to a team of a real roster is a best candidate of the original loop.
+
+        Team averages and scores are recalculated per student with np.dot, like the original Team.
+        Matrix products can round the last bit differently, so a pick may be any candidate
+        scoring the best up to rounding.
+        """
+        for seed in range(10):
+            rng = np.random.default_rng(seed)
+            n = int(rng.integers(20, 70))
+            course = Course([make_student(f"s{i}@test.com", int(rng.integers(3)),
+                                          set(rng.choice(7, int(rng.integers(1, 4)), replace=False).tolist()))
+                             for i in range(n)])
+            have, want = course.array_of_have, course.array_of_want
+            unassigned = np.ones(n, dtype=bool)
+            cores = matching.seed_team_cores(course.pair_ranking, math.ceil(n / 3), unassigned)
+            teams = matching.grow_teams(have, want, [list(core) for core in cores], unassigned.copy(), 3)
+
+            rest = np.flatnonzero(unassigned).tolist()
+            for round_ in range(3):
+                for core, team in zip(cores, teams):
+                    if not rest or len(core) + round_ >= len(team):
+                        continue  # drained out or full
+                    members, pick = team[:len(core) + round_], team[len(core) + round_]
+                    team_have = np.add.reduce([have[slot] for slot in members]) / len(members)
+                    team_want = np.add.reduce([want[slot] for slot in members]) / len(members)
+                    scores = {slot: (np.dot(team_have, want[slot]) + np.dot(team_want, have[slot])) / 2
+                              for slot in rest}
+                    self.assertAlmostEqual(scores[pick], max(scores.values()), places=12)
+                    rest.remove(pick)
+            self.assertEqual(rest, [])
+
+    def test_team_objective(self):
+        """Test the objective is the sum of have_i . want_j over ordered pairs of teammates."""
+        teams = [[0, 5, 9], [1, 2], [3, 4, 6, 7]]
+        expected = sum(float(self.have[i] @ self.want[j]) for team in teams for i in team for j in team if i != j)
+        self.assertAlmostEqual(matching.team_objective(self.have, self.want, teams), expected, places=3)
+
+    def test_assignment_quality(self):
+        """Test per-team mean and worst pair scores against nested loops, a team of one has none."""
+        teams = [[0, 5, 9], [1], [3, 4, 6, 7], [2, 8]]
+        S = self.course.score_matrix
+        quality = matching.assignment_quality(self.have, self.want, teams, max_crush_score(self.have, self.want))
+        self.assertEqual(quality["sizes"].tolist(), [3, 1, 4, 2])
+        self.assertEqual(quality["pairs"].tolist(), [3, 0, 6, 1])
+        for k, team in enumerate(teams):
+            pairs = {(i, j): (S[i, j] + S[j, i]) / 2 for a, i in enumerate(team) for j in team[a + 1:]}
+            if not pairs:
+                self.assertTrue(np.isnan(quality["mean"][k]))
+                self.assertEqual(quality["worst_pair"][k].tolist(), [-1, -1])
+                continue
+            self.assertAlmostEqual(quality["mean"][k], np.mean(list(pairs.values())), places=5)
+            self.assertAlmostEqual(quality["worst"][k], min(pairs.values()), places=5)
+            self.assertEqual(tuple(quality["worst_pair"][k]), min(pairs, key=pairs.get))
+
+    def test_quality_without_prepare(self):
+        """Test the quality report of an unprepared course equals the one read from the score matrix."""
+        self.course.team_matching(max_size=3)
+        self.course.update_student(make_student("s0@test.com", 2, {6}))  # score matrix now stale
+        report = self.course.evaluate_assignment()
+        self.assertFalse(self.course._prepared)
+        self.course.prepare()
+        for team, prepared in zip(report["teams"], self.course.evaluate_assignment()["teams"]):
+            self.assertAlmostEqual(team["mean_score"], prepared["mean_score"], places=5)
+
+    def test_quality_of_snapshot(self):
+        """Test a snapshot is reported on as taken, whatever the course does in the meantime."""
+        self.course.team_matching(max_size=3)
+        report = self.course.evaluate_assignment()
+        snapshot = self.course.assignment_snapshot()
+        self.course.update_student(make_student("s0@test.com", 2, {6}))
+        self.course.team_matching(max_size=4)
+        self.assertEqual(self.course.quality_report(snapshot), report)
+
+    def test_restarts_keep_best(self):
+        """Test restarts never do worse than the greedy and every student is assigned once."""
+        ranking = self.course.pair_ranking
+        greedy = matching.match_teams(self.have, self.want, ranking, 3)
+        best = matching.best_of_restarts(self.have, self.want, ranking, 3, restarts=6, seed=1)
+        self.assertGreaterEqual(matching.team_objective(self.have, self.want, best),
+                                matching.team_objective(self.have, self.want, greedy))
+        self.assertEqual(sorted(slot for team in best for slot in team), list(range(60)))
+
+    def test_workers_same_result(self):
+        """Test worker processes on shared memory give the same result as one process."""
+        ranking = self.course.pair_ranking
+        local = matching.best_of_restarts(self.have, self.want, ranking, 3, restarts=4, seed=2)
+        shared = matching.best_of_restarts(self.have, self.want, ranking, 3, restarts=4, workers=2, seed=2)
+        self.assertEqual(local, shared)
+
+    def test_refine_improves(self):
+        """Test refinement of a random assignment raises the objective and keeps the sizes valid."""
+        rng = np.random.default_rng(3)
+        teams = [team.tolist() for team in np.array_split(rng.permutation(60), 20)]  # 20 teams of 3
+        before = matching.team_objective(self.have, self.want, teams)
+        refined = matching.refine_teams(self.have, self.want, [list(team) for team in teams], 3, budget_ms=2000)
+        self.assertGreater(matching.team_objective(self.have, self.want, refined), before)
+        self.assertEqual(sorted(slot for team in refined for slot in team), list(range(60)))
+        self.assertEqual({len(team) for team in refined}, {3})
+
+    def test_refine_swap_gain(self):
+        """Test one refinement step changes the objective by the best single swap or move found by brute force."""
+        teams = [[0, 1, 2], [3, 4, 5], [6, 7]]
+        objective = matching.team_objective(self.have, self.want, teams)
+        best = 0.0
+        for a in range(8):
+            for b in range(8):
+                team_a = next(t for t, team in enumerate(teams) if a in team)
+                team_b = next(t for t, team in enumerate(teams) if b in team)
+                if team_a != team_b:
+                    swapped = [[b if s == a else a if s == b else s for s in team] for team in teams]
+                    best = max(best, matching.team_objective(self.have, self.want, swapped) - objective)
+        refined = matching.refine_teams(self.have, self.want, [list(team) for team in teams], 3, budget_ms=1000)
+        self.assertGreaterEqual(matching.team_objective(self.have, self.want, refined) - objective, best - 1e-6)
+
+    def test_course_restarts(self):
+        """Test Course.team_matching with restarts forms valid teams."""
+        self.course.team_matching(max_size=4, restarts=3, seed=0)
+        self.assertEqual(len(self.course.teams), 15)
+        self.assertEqual(sum(len(team.students) for team in self.course.teams), 60)
+        with self.assertRaises(ValueError):
+            self.course.team_matching(max_size=4, restarts=0)
+
+        phases = []
+        self.course.team_matching(max_size=4, refine_ms=50, progress=lambda phase, fraction: phases.append(phase))
+        self.assertEqual(list(dict.fromkeys(phases)), ["scoring", "seeding", "growth", "refinement"])
+        self.assertEqual(sum(len(team.students) for team in self.course.teams), 60)
+        self.assertLessEqual(max(len(team.students) for team in self.course.teams), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""Test suite for result notifications.
+
+Tests that subscriptions are resolved in one pass when students get a team,
+and that the result event stream pushes the result for teams saved by the CLI.
+Uses a temporary database and the FastAPI TestClient.
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+from ATA import pickle_ops, server
+from ATA.models import Course
+from ATA.notifications import ResultNotifier
+from test.base import ServerTestCase
+from test.test_construct_vector import load_all_test_students_helper
+
+
+class TestResultNotifier(unittest.TestCase):
+    """Test subscriptions and fan-out."""
+
+    def test_publish_fans_out(self):
+        """Test every subscription of a matched student is resolved, the others keep waiting."""
+        course = Course(load_all_test_students_helper("test/test_user.json"))
+
+        async def scenario():
+            notifier = ResultNotifier(lambda: asyncio.sleep(0))
+            alice = [notifier.subscribe("alice@test.com") for _ in range(2)]
+            unknown = notifier.subscribe("nobody@test.com")
+            notifier.publish(course)  # no teams yet
+            self.assertEqual(len(notifier), 3)
+            course.team_matching(max_size=3)
+            notifier.publish(course)
+            self.assertEqual({future.result() for future in alice},
+                             {course.get_student_by_email("alice@test.com").team_id})
+            self.assertFalse(unknown.done())
+            notifier.unsubscribe("nobody@test.com", unknown)
+            self.assertEqual(len(notifier), 0)
+            await notifier.close()
+
+        asyncio.run(scenario())
+
+
+class TestResultEvents(ServerTestCase):
+    """Test the /result/events stream."""
+
+    def setUp(self):
+        """Start the app on a temporary database holding the test students, checked for changes often."""
+        super().setUp()
+        server.cache.RELOAD_CHECK_INTERVAL = 0
+        server.cache.notifier.CHECK_INTERVAL = 0.05
+        self.course = Course(load_all_test_students_helper("test/test_user.json"))
+        pickle_ops.save_data(self.course)
+
+    def test_pushed_when_matched(self):
+        """Test a waiting student is pushed its result once the CLI saves the teams."""
+        responses = []
+        waiting = threading.Thread(target=lambda: responses.append(
+            self.client.get("/result/events", params={"email": "alice@test.com"})))
+        waiting.start()
+        deadline = time.monotonic() + 10
+        while len(server.cache.notifier) == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(waiting.is_alive())  # held open, no result yet
+
+        self.course.team_matching(max_size=3)
+        pickle_ops.save_teams(self.course)  # another process saves the teams
+        waiting.join(10)
+        self.assertFalse(waiting.is_alive())
+        response = responses[0]
+        self.assertEqual(response.headers["content-type"], "text/event-stream; charset=utf-8")
+        self.assertIn("event: result\ndata: ", response.text)
+        self.assertIn('"team_id": "%s"' % self.course.get_student_by_email("alice@test.com").team_id, response.text)
+        self.assertEqual(len(server.cache.notifier), 0)
+
+    def test_already_matched(self):
+        """Test a student who already has a team gets the result at once."""
+        self.course.team_matching(max_size=3)
+        pickle_ops.save_teams(self.course)
+        response = self.client.get("/result/events", params={"email": "bob@test.com"})
+        self.assertTrue(response.text.startswith("retry: "))
+        self.assertIn("event: result", response.text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""Test suite for course data persistence.
+
+Tests saving and loading a course, writing and deleting students without
+loading the course, and importing a pickle file written by older versions. Uses a temporary database.
+"""
+
+import os
+import pickle
+import sqlite3
+import unittest
+from unittest import mock
+from ATA import pickle_ops
+from ATA.models import Course
+from test.base import DataTestCase
+from test.test_construct_vector import load_all_test_students_helper
+from test.test_course import make_student
+
+
+class TestSQLiteStore(DataTestCase):
+    """Test the SQLite-backed load_data/save_data and the student writes and deletes."""
+
+    def test_missing_file(self):
+        """Test loading without any data file raises FileNotFoundError."""
+        with self.assertRaises(FileNotFoundError):
+            pickle_ops.load_data()
+
+    def test_round_trip(self):
+        """Test students, teams and assignments survive save and load."""
+        course = Course(load_all_test_students_helper("test/test_user.json"))
+        course.team_matching(max_size=3)
+        course.teams[0].AI_suggestion = "work together"
+        pickle_ops.save_data(course)
+
+        loaded = pickle_ops.load_data()
+        self.assertEqual([s.email for s in loaded.students], [s.email for s in course.students])
+        self.assertEqual([[s.email for s in t.students] for t in loaded.teams],
+                         [[s.email for s in t.students] for t in course.teams])
+        self.assertEqual(loaded.teams[0].AI_suggestion, "work together")
+        student = course.students[4]
+        self.assertEqual(loaded.get_student_by_email(student.email).hobbies, student.hobbies)
+        self.assertEqual(loaded.get_student_by_email(student.email).team_id, student.team_id)
+
+    def test_write_keeps_assignment(self):
+        """Test writing a student updates its row and keeps its team."""
+        course = Course(load_all_test_students_helper("test/test_user.json"))
+        course.team_matching(max_size=3)
+        pickle_ops.save_data(course)
+        email = course.students[0].email
+
+        updated = make_student(email, 2)
+        updated.first_name = "Updated"
+        pickle_ops.write_students([updated, make_student("new@test.com", 1)])
+
+        loaded = pickle_ops.load_data()
+        self.assertEqual(loaded.get_student_by_email(email).first_name, "Updated")
+        self.assertEqual(loaded.get_student_by_email(email).team_id, course.students[0].team_id)
+        self.assertIsNone(loaded.get_student_by_email("new@test.com").team_id)
+        self.assertEqual(len(loaded.students), len(course.students) + 1)
+
+    def test_delete_student(self):
+        """Test deleting a student with its assignment, and its team with its last member."""
+        course = Course(load_all_test_students_helper("test/test_user.json"))
+        course.team_matching(max_size=3)
+        pickle_ops.save_data(course)
+        team = course.teams[0]
+
+        self.assertTrue(pickle_ops.delete_student(team.students[0].email))
+        loaded = pickle_ops.load_data()
+        self.assertEqual(len(loaded.get_team_by_team_id(team.team_id).students), len(team.students) - 1)
+        for student in team.students[1:]:
+            pickle_ops.delete_student(student.email)
+        loaded = pickle_ops.load_data()
+        self.assertNotIn(team.team_id, [stored.team_id for stored in loaded.teams])
+        self.assertEqual(len(loaded.teams), len(course.teams) - 1)
+
+        generation = pickle_ops.load_generation()
+        self.assertFalse(pickle_ops.delete_student("nobody@test.com"))
+        self.assertEqual(pickle_ops.load_generation(), generation)
+
+    def test_import_legacy_pickle(self):
+        """Test a pickle file is imported when no database exists yet."""
+        course = Course(load_all_test_students_helper("test/test_user.json"))
+        with open(pickle_ops.LEGACY_PICKLE_FILEPATH, "wb") as f:
+            pickle.dump(course, f)
+        loaded = pickle_ops.load_data()
+        self.assertEqual(len(loaded.students), len(course.students))
+        self.assertTrue(os.path.exists(pickle_ops.DATA_FILEPATH))
+
+    def test_generation_counter(self):
+        """Test every write bumps the generation counter."""
+        self.assertEqual(pickle_ops.load_generation(), 0)
+        course = Course(load_all_test_students_helper("test/test_user.json"))
+        pickle_ops.save_data(course)
+        self.assertEqual(pickle_ops.load_generation(), 1)
+        self.assertEqual(pickle_ops.write_students([make_student("new@test.com", 1)]), 2)
+        pickle_ops.save_teams(course)
+        self.assertEqual(pickle_ops.load_generation(), 3)
+        self.assertEqual(pickle_ops.load_data().get_student_by_email("new@test.com").skill_level, 1)
+
+    def test_schema_created_once(self):
+        """Test the schema is created by the first write only and generation reads are read-only."""
+        pickle_ops.save_data(Course([make_student("a@test.com", 0)]))
+        with pickle_ops.transaction() as connection:
+            self.assertEqual(connection.execute("PRAGMA user_version").fetchone()[0], pickle_ops.SCHEMA_VERSION)
+        with mock.patch.object(pickle_ops, "SCHEMA", "not sql"):  # would fail if run again
+            self.assertEqual(pickle_ops.write_students([make_student("b@test.com", 1)]), 2)
+            self.assertEqual(pickle_ops.load_generation(), 2)
+        with pickle_ops.transaction(readonly=True) as connection, self.assertRaises(sqlite3.OperationalError):
+            connection.execute("UPDATE meta SET value = 0")
+
+
+if __name__ == '__main__':
+    unittest.main()
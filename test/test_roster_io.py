@@ -0,0 +1,63 @@
+"""Test suite for reading student rosters.
+
+Tests parsing JSON, JSONL and CSV rosters, deduplicating students by email and
+reporting the line of an invalid record.
+"""
+
+import io
+import json
+import unittest
+from ATA import roster_io
+from test.test_course import make_student
+
+
+class TestRosterIO(unittest.TestCase):
+    """Test read_roster for every supported format."""
+
+    def test_json_test_users(self):
+        """Test the test_user.json shape, students keyed by email."""
+        students = roster_io.load_roster("test/test_user.json")
+        with open("test/test_user.json", "r") as f:
+            self.assertEqual([student.email for student in students], list(json.load(f)["students"]))
+        self.assertIsInstance(students[0].hobbies, set)
+
+    def test_jsonl_dedupes_by_email(self):
+        """Test a later record of the same email replaces the earlier one."""
+        records = [make_student("a@test.com", 0).get_json(), make_student("b@test.com", 1).get_json(),
+                   make_student("a@test.com", 2).get_json()]
+        lines = io.StringIO("\n".join(json.dumps(record) for record in records) + "\n\n")
+        students = roster_io.read_roster(lines, "jsonl")
+        self.assertEqual([student.email for student in students], ["a@test.com", "b@test.com"])
+        self.assertEqual(students[0].skill_level, 2)
+
+    def test_csv(self):
+        """Test CSV cells: empty choices are None, lists are ';'-separated."""
+        header = "first_name,email,skill_level,ambition,role,teamwork_style,pace,backgrounds," \
+                 "backgrounds_preference,hobbies,project_summary"
+        lines = io.StringIO(f'{header}\nAna,ana@test.com,2,1,,0,,0;3,1,,"A, B"\n')
+        student, = roster_io.read_roster(lines, "csv")
+        self.assertEqual((student.skill_level, student.role, student.pace), (2, None, None))
+        self.assertEqual((student.backgrounds, student.hobbies), ({0, 3}, set()))
+        self.assertEqual(student.project_summary, "A, B")
+
+    def test_invalid_record_location(self):
+        """Test an invalid record is reported with its line."""
+        record = make_student("a@test.com").get_json()
+        lines = io.StringIO(json.dumps(record) + "\n" + json.dumps(dict(record, hobbies=[42])) + "\n")
+        with self.assertRaisesRegex(ValueError, "Line 2: Invalid hobbies"):
+            roster_io.read_roster(lines, "jsonl")
+        with self.assertRaises(ValueError):
+            roster_io.detect_format("roster.xlsx")
+        self.assertEqual(roster_io.detect_format("roster.ndjson"), "jsonl")
+
+    def test_invalid_json_shape(self):
+        """Test a JSON roster that isn't a list of records, or an object without students, is a ValueError."""
+        for text in ("5", '"roster"', "null", '{"students": 5}'):
+            with self.assertRaisesRegex(ValueError, "expected a list"):
+                roster_io.read_roster(io.StringIO(text), "json")
+        with self.assertRaisesRegex(ValueError, '"students" key'):
+            roster_io.read_roster(io.StringIO('{"roster": []}'), "json")
+
+
+if __name__ == '__main__':
+    unittest.main()
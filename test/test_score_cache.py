@@ -0,0 +1,71 @@
+"""Test suite for the on-disk score matrix cache.
+
+Tests that a course reuses a matrix cached for the same students, memory-mapped,
+and that a changed roster gets a new entry. Uses a temporary cache directory.
+"""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from ATA import score_cache
+from ATA.models import Course
+from test.test_construct_vector import load_all_test_students_helper
+from test.test_course import make_student, expected_score_matrix
+
+
+class TestScoreCache(unittest.TestCase):
+    """Test Course.SCORE_CACHE_DIR and the score_cache entries."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def course(self) -> Course:
+        """Create a course of the test users using the temporary cache."""
+        course = Course(load_all_test_students_helper("test/test_user.json"))
+        course.SCORE_CACHE_DIR = self.tmp.name
+        return course
+
+    def test_reuse_same_roster(self):
+        """Test a second course with the same students opens the cached matrix."""
+        first = self.course()
+        first.team_matching(max_size=3)
+        self.assertEqual(len([name for name in os.listdir(self.tmp.name) if name.endswith(".npy")]), 1)
+
+        second = self.course()
+        second.team_matching(max_size=4)
+        self.assertIsInstance(second._score_buffer, np.memmap)
+        self.assertFalse(second._score_buffer.flags.writeable)
+        np.testing.assert_allclose(second.score_matrix, first.score_matrix)
+
+        # changes copy the read-only matrix before rescoring
+        second.update_student(make_student("alice@test.com", 2, {5}))
+        second.remove_student_by_email("bob@test.com")
+        np.testing.assert_allclose(second.score_matrix, expected_score_matrix(second), atol=1e-6)
+
+    def test_fingerprint_changes_with_vectors(self):
+        """Test the key depends on the vectors and their order."""
+        course = self.course()
+        have, want, encoder = course.array_of_have, course.array_of_want, course._store.encoder
+        key = score_cache.fingerprint(have, want, encoder)
+        self.assertEqual(key, score_cache.fingerprint(have.copy(), want.copy(), encoder))
+        self.assertNotEqual(key, score_cache.fingerprint(have[::-1], want[::-1], encoder))
+        self.assertIsNone(score_cache.load(self.tmp.name, key))
+
+    def test_least_recently_used_entries_deleted(self):
+        """Test only MAX_ENTRIES matrices are kept."""
+        for i in range(score_cache.MAX_ENTRIES + 2):
+            score_cache.save(self.tmp.name, f"key{i}", np.eye(3, dtype=np.float32), 1.0)
+            os.utime(os.path.join(self.tmp.name, f"key{i}.json"), (i, i))
+        names = sorted(os.listdir(self.tmp.name))
+        self.assertEqual(len(names), 2 * score_cache.MAX_ENTRIES)
+        self.assertNotIn("key0.npy", names)
+        matrix, max_score = score_cache.load(self.tmp.name, f"key{score_cache.MAX_ENTRIES + 1}")
+        np.testing.assert_array_equal(matrix, np.eye(3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+"""Test suite for the vectorized score kernels.
+
+Tests that PairRanking produces the same pairs and ordering as the
+plain nested-loop mutual crush score calculation.
+"""
+
+import tempfile
+import unittest
+import numpy as np
+from ATA.scoring import PairRanking, mutual_score_matrix, candidate_pair_ranking, allocate_score_matrix, \
+    crush_score_matrix, max_crush_score
+
+
+class TestPairRanking(unittest.TestCase):
+    """Test PairRanking against the nested-loop reference."""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.score_matrix = rng.random((40, 40))
+        np.fill_diagonal(self.score_matrix, 0)
+
+    def test_mutual_matrix_is_symmetric(self):
+        """Test the mutual matrix is the average of both directions."""
+        mutual = mutual_score_matrix(self.score_matrix)
+        np.testing.assert_allclose(mutual, mutual.T)
+        self.assertAlmostEqual(mutual[1, 2], (self.score_matrix[1, 2] + self.score_matrix[2, 1]) / 2)
+
+    def test_pairs_match_nested_loop(self):
+        """Test every unique pair is ranked once, best first."""
+        n = self.score_matrix.shape[0]
+        expected = {}
+        for i in range(n):
+            for j in range(i + 1, n):
+                expected[(i, j)] = (self.score_matrix[i, j] + self.score_matrix[j, i]) / 2
+
+        ranking = PairRanking(self.score_matrix)
+        pairs = list(ranking.iter_pairs(chunk_size=7))  # small chunk to go through several chunks
+
+        self.assertEqual(len(ranking), len(expected))
+        self.assertEqual(sorted(pairs), sorted(expected))
+        scores = [expected[pair] for pair in pairs]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_ties_match_sorted_pop_order(self):
+        """Test tied pairs come in the order of popping from the stable sorted nested-loop list."""
+        rng = np.random.default_rng(1)
+        score_matrix = rng.integers(0, 3, (40, 40)).astype(float)  # few distinct scores, many ties
+        np.fill_diagonal(score_matrix, 0)
+        n = score_matrix.shape[0]
+        pair_list = [(i, j, (score_matrix[i, j] + score_matrix[j, i]) / 2) for i in range(n) for j in range(i + 1, n)]
+        pair_list.sort(key=lambda pair: pair[2])
+        expected = [(i, j) for i, j, _ in reversed(pair_list)]  # order of pop()
+
+        for chunk_size in (1, 7, 64, len(pair_list)):
+            self.assertEqual(list(PairRanking(score_matrix).iter_pairs(chunk_size=chunk_size)), expected)
+
+    def test_empty_and_single(self):
+        """Test no pairs are yielded for fewer than two students."""
+        self.assertEqual(list(PairRanking(np.zeros((0, 0))).iter_pairs()), [])
+        self.assertEqual(list(PairRanking(np.zeros((1, 1))).iter_pairs()), [])
+
+    def test_blocks_match_triu_order(self):
+        """Test building the pairs block by block gives the np.triu_indices order."""
+        ranking = PairRanking(self.score_matrix, block_rows=7)
+        rows, cols = np.triu_indices(40, k=1)
+        np.testing.assert_array_equal(ranking.rows, rows)
+        np.testing.assert_array_equal(ranking.cols, cols)
+        np.testing.assert_allclose(ranking.scores, mutual_score_matrix(self.score_matrix)[rows, cols])
+
+
+class TestCrushScoreMatrix(unittest.TestCase):
+    """Test the blocked score matrix kernel against the one-shot calculation."""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.have, self.want = rng.random((30, 5)), rng.random((30, 5))
+        expected = self.have @ self.want.T
+        np.fill_diagonal(expected, 0)
+        self.max_score = expected.max()
+        self.expected = expected / self.max_score
+
+    def test_blocks_in_larger_buffer(self):
+        """Test small blocks written into the corner of a larger preallocated buffer."""
+        out = allocate_score_matrix(45)
+        self.assertEqual(out.dtype, np.float64)
+        max_score = crush_score_matrix(self.have, self.want, out, block_rows=4)
+        self.assertAlmostEqual(max_score, self.max_score, places=5)
+        np.testing.assert_allclose(out[:30, :30], self.expected, atol=1e-6)
+
+    def test_memmap_buffer(self):
+        """Test the buffer can be a np.memmap backed by an anonymous file."""
+        with tempfile.TemporaryDirectory() as directory:
+            out = allocate_score_matrix(30, directory)
+            self.assertIsInstance(out, np.memmap)
+            crush_score_matrix(self.have, self.want, out, block_rows=8)
+            np.testing.assert_allclose(out, self.expected, atol=1e-6)
+            del out
+
+    def test_max_score_without_matrix(self):
+        """Test the normalization factor found block by block, without a buffer."""
+        self.assertAlmostEqual(max_crush_score(self.have, self.want, block_rows=7), self.max_score)
+        self.assertEqual(max_crush_score(self.have[:1], self.want[:1]), 0.0)
+
+
+class TestCandidatePairRanking(unittest.TestCase):
+    """Test the top-k candidate pairs against the full pair ranking."""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.have, self.want = rng.random((50, 6)), rng.random((50, 6))
+        score_matrix = self.have @ self.want.T
+        np.fill_diagonal(score_matrix, 0)
+        self.score_matrix = score_matrix / score_matrix.max()
+
+    def test_all_partners_is_exact(self):
+        """Test k = n - 1 keeps every pair with the same normalized scores."""
+        exact = PairRanking(self.score_matrix)
+        candidates = candidate_pair_ranking(self.have, self.want, k=49, block_rows=16)
+        np.testing.assert_array_equal(candidates.rows, exact.rows)
+        np.testing.assert_array_equal(candidates.cols, exact.cols)
+        np.testing.assert_allclose(candidates.scores, exact.scores)
+
+    def test_best_partners_kept(self):
+        """Test every student's best partners are candidates, and nothing more than n * k pairs."""
+        k = 3
+        candidates = candidate_pair_ranking(self.have, self.want, k=k, block_rows=16)
+        self.assertLessEqual(len(candidates), 50 * k)
+        pairs = set(zip(candidates.rows.tolist(), candidates.cols.tolist()))
+        mutual = mutual_score_matrix(self.score_matrix)
+        np.fill_diagonal(mutual, -np.inf)
+        for i in range(50):
+            for j in np.argsort(-mutual[i])[:k].tolist():
+                self.assertIn((min(i, j), max(i, j)), pairs)
+        self.assertEqual(len(candidate_pair_ranking(self.have[:1], self.want[:1], k=k)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Test suite for the columnar StudentStore.
+
+Tests that students bound to a store read their vectors from its rows, and
+that the categorical columns hold the students' attributes.
+"""
+
+import pickle
+import unittest
+import numpy as np
+from ATA.encoder import to_bitmask
+from ATA.store import StudentStore, NO_CHOICE
+from test.test_course import make_student
+
+
+class TestStudentStore(unittest.TestCase):
+    """Test StudentStore rows and Student views."""
+
+    def test_append_binds_student(self):
+        """Test appended students read their vectors from the store."""
+        store = StudentStore()
+        students = [make_student(f"s{i}@test.com", i % 3, {i % 7}) for i in range(20)]
+        expected = [student.construct_vector() for student in students]
+        for student in students:
+            store.append(student)
+
+        self.assertEqual(len(store), 20)
+        self.assertGreaterEqual(store.capacity, 20)
+        for student, (have, want) in zip(students, expected):
+            np.testing.assert_array_equal(student.vector_have, have)  # full precision, not rounded
+            np.testing.assert_array_equal(student.vector_want, want)
+        self.assertTrue(np.shares_memory(students[3].vector_have, store.have))
+
+    def test_categorical_columns(self):
+        """Test choice and bitmask columns."""
+        store = StudentStore()
+        student = make_student("a@test.com", 2, {1, 4})
+        store.append(student)
+        self.assertEqual(store.column("skill_level")[0], 2)
+        self.assertEqual(store.column("teamwork_style")[0], NO_CHOICE)
+        self.assertEqual(store.column("hobbies")[0], to_bitmask({1, 4}))
+        self.assertEqual(to_bitmask({1, 4}), 0b10010)
+
+    def test_move_and_detach(self):
+        """Test moving a row rebinds the student, detaching keeps a copy."""
+        store = StudentStore()
+        first, second = make_student("a@test.com", 0), make_student("b@test.com", 2)
+        store.append(first)
+        store.append(second)
+        have = second.vector_have.copy()
+
+        first._detach()
+        store.move(1, 0, second)
+        store.pop()
+        np.testing.assert_allclose(second.vector_have, have)
+        self.assertFalse(np.shares_memory(first.vector_have, store.have))
+
+    def test_pickle_student_without_store(self):
+        """Test a pickled student does not carry the store."""
+        store = StudentStore()
+        student = make_student("a@test.com", 1)
+        store.append(student)
+        loaded = pickle.loads(pickle.dumps(student))
+        self.assertEqual(loaded.email, "a@test.com")
+        self.assertIsNone(loaded._store)
+        np.testing.assert_allclose(loaded.vector_have, student.vector_have, atol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
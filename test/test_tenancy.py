@@ -0,0 +1,90 @@
+"""Test suite for multi-course tenancy.
+
+Tests that every course is stored in its own database and served by its own
+cache under /courses/{course_id}, and that several courses are matched at once
+in worker processes. Uses temporary databases and the FastAPI TestClient.
+"""
+
+import json
+import os
+import unittest
+from ATA import main, pickle_ops, server
+from ATA.models import Course
+from test.base import ServerTestCase
+from test.test_construct_vector import load_all_test_students_helper
+from test.test_course import make_student
+
+
+class TestTenancy(ServerTestCase):
+    """Test course-scoped storage, routes and matching."""
+
+    def setUp(self):
+        """Start the app on temporary databases, with the CLI's score cache in the temporary directory too."""
+        super().setUp()
+        self.score_cache_dir = main.SCORE_CACHE_DIR
+        main.SCORE_CACHE_DIR = os.path.join(self.tmp.name, "score_cache")
+
+    def tearDown(self):
+        main.SCORE_CACHE_DIR = self.score_cache_dir
+        super().tearDown()
+
+    def submit(self, prefix: str, email: str):
+        """Submit a student through the routes of a course, returning the response."""
+        data = json.dumps(make_student(email).get_json())
+        return self.client.post(f"{prefix}/student_submit", data={"data": data}).json()
+
+    def test_course_path(self):
+        """Test course IDs map to their own files, and IDs that aren't safe file names are rejected."""
+        self.assertEqual(pickle_ops.course_path("cs-101_a"), os.path.join(pickle_ops.COURSES_DIR, "cs-101_a.db"))
+        for course_id in ("", "../data", "a/b", "x" * 65):
+            with self.assertRaises(ValueError):
+                pickle_ops.course_path(course_id)
+
+    def test_courses_isolated(self):
+        """Test submissions to one course are invisible to the others and to the default course."""
+        self.assertEqual(self.submit("/courses/a", "alice@test.com")["status"], "ok")
+        self.assertEqual(self.submit("/courses/b", "bob@test.com")["sequence"], 1)  # own writer and sequence
+        self.submit("", "carol@test.com")
+
+        self.assertEqual([s.email for s in pickle_ops.load_data(pickle_ops.course_path("a")).students],
+                         ["alice@test.com"])
+        self.assertEqual([s.email for s in pickle_ops.load_data().students], ["carol@test.com"])
+        self.assertEqual(self.client.get("/courses/b/check_status", params={"email": "alice@test.com"}).json()
+                         ["status"], "error")
+        self.assertEqual(self.client.get("/courses").json(), {"status": "ok", "courses": ["a", "b"]})
+        self.assertEqual(self.client.get("/courses/a.b/check_status", params={"email": "x"}).status_code, 404)
+
+    def test_unknown_course(self):
+        """Test routes reading a course that doesn't exist answer 404 without creating a cache for it."""
+        for route in ("/check_status", "/result", "/teams", "/matching/quality"):
+            self.assertEqual(self.client.get(f"/courses/nope{route}", params={"email": "x"}).status_code, 404)
+        self.assertEqual(self.client.post("/courses/nope/matching/jobs", data={"max_size": 3}).status_code, 404)
+        self.assertNotIn("nope", server.caches)
+
+        self.assertEqual(self.submit("/courses/nope", "alice@test.com")["status"], "ok")  # created by a write
+        self.assertEqual(self.client.get("/courses/nope/check_status", params={"email": "alice@test.com"})
+                         .json()["status"], "ok")
+
+    def test_match_courses(self):
+        """Test courses are matched in parallel worker processes and their teams served by their routes."""
+        students = load_all_test_students_helper("test/test_user.json")
+        pickle_ops.save_data(Course(students[:9]), pickle_ops.course_path("a"))
+        pickle_ops.save_data(Course(students[9:]), pickle_ops.course_path("b"))
+        pickle_ops.save_data(Course([]), pickle_ops.course_path("empty"))
+        with open(pickle_ops.course_path("broken"), "w") as f:
+            f.write("not a database")
+
+        results = main.match_courses(["a", "broken", "b", "empty"], 3, workers=2)
+        self.assertEqual(results["a"], 3)
+        self.assertEqual(results["b"], 3)
+        self.assertEqual(results["empty"], "No students to match")
+        self.assertIn("not a database", results["broken"])  # reported, the other courses still matched
+
+        email = students[0].email
+        response = self.client.get("/courses/a/result", params={"email": email}).json()
+        self.assertIn(email, response["teammates_email"])
+        self.assertFalse(os.path.exists(pickle_ops.DATA_FILEPATH))  # the default course is untouched
+
+
+if __name__ == '__main__':
+    unittest.main()